@@ -0,0 +1,5 @@
+"""
+AgrovisãoTech - Núcleo de processamento
+Módulos de dados e cálculo usados pelo app Streamlit (app_simples.py),
+importáveis sem Streamlit.
+"""
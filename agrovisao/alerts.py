@@ -0,0 +1,206 @@
+"""
+AgrovisãoTech - Motor de alertas
+Regras de NDVI, tendência e clima avaliadas de forma vetorizada sobre a série
+temporal, com histerese e reavaliação apenas das fazendas com dados novos
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from agrovisao.data import FarmTable, farm_codes
+
+NORMAL, ATENCAO, CRITICO = 0, 1, 2
+NIVEIS = ["Normal", "Atenção", "Crítico"]
+
+REGRAS_PADRAO = {
+    "ndvi_critico": 0.3,       # NDVI recente abaixo disso: crítico
+    "ndvi_atencao": 0.5,       # NDVI recente abaixo disso: atenção
+    "histerese": 0.03,         # para sair de um nível o NDVI precisa superar limiar + histerese
+    "janela_dias": 3,          # observações usadas no NDVI e clima recentes
+    "queda_dias": 7,           # horizonte da regra de tendência
+    "queda_ndvi": 0.10,        # queda mínima de NDVI no horizonte para alertar
+    "temperatura_max": 34.0,   # média recente acima disso: estresse térmico
+    "umidade_min": 45.0,       # média recente abaixo disso: baixa umidade
+    "seca_dias": 10            # dias seguidos sem chuva para alertar estiagem
+}
+
+# Regras disparadas, guardadas como bits
+MOTIVOS = {
+    1: "NDVI crítico",
+    2: "NDVI abaixo do ideal",
+    4: "Queda de NDVI",
+    8: "Estresse térmico",
+    16: "Baixa umidade",
+    32: "Estiagem"
+}
+
+SERIES = ["ndvi", "temperatura", "umidade", "precipitacao"]
+
+
+def _window_mean(values, n):
+    """Média ignorando NaN das últimas n colunas, sem aviso para linhas vazias"""
+    window = values[:, -n:]
+    valid = ~np.isnan(window)
+    total = np.where(valid, window, 0).sum(axis=1)
+    count = valid.sum(axis=1)
+    out = np.full(len(values), np.nan)
+    np.divide(total, count, out=out, where=count > 0)
+    return out
+
+
+def describe_reasons(mask):
+    """Texto das regras disparadas a partir da máscara de bits"""
+    return ", ".join(nome for bit, nome in MOTIVOS.items() if mask & bit)
+
+
+# Texto de todas as combinações de regras, indexado pela máscara
+MOTIVOS_TEXTO = np.array([describe_reasons(m) for m in range(2 ** len(MOTIVOS))], dtype=object)
+
+
+class AlertEngine:
+    """
+    Estado de alertas de todas as fazendas.
+
+    Para cada fazenda guarda as últimas K observações (K cobre a maior janela
+    das regras) em matrizes (F, K) alinhadas à direita. Novas linhas entram
+    apenas nas fazendas afetadas e só essas são reavaliadas, o que mantém a
+    latência após a ingestão em milissegundos mesmo com dezenas de milhares
+    de fazendas.
+    """
+
+    def __init__(self, fazendas, regras=None):
+        if not isinstance(fazendas, FarmTable):
+            fazendas = FarmTable.from_records(fazendas)
+        self.fazendas = fazendas
+        self.regras = dict(REGRAS_PADRAO, **(regras or {}))
+
+        r = self.regras
+        self.k = max(r["queda_dias"] + r["janela_dias"], r["seca_dias"])
+        n = len(fazendas)
+        self.buffers = {s: np.full((n, self.k), np.nan) for s in SERIES}
+        self.ultima_data = np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")
+
+        self.nivel = np.zeros(n, dtype=np.int8)
+        self.ndvi = np.full(n, np.nan)
+        self.queda = np.full(n, np.nan)
+        self.motivos = np.zeros(n, dtype=np.int16)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # A trava não é serializável; cada cópia carregada ganha a sua
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def ingest(self, ndvi_df):
+        """
+        Acrescenta observações e reavalia só as fazendas que as receberam.
+
+        Linhas com data igual ou anterior à última já vista da fazenda são
+        ignoradas. Retorna os códigos das fazendas cujo nível mudou.
+        """
+        if len(ndvi_df) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        codes = farm_codes(self.fazendas, ndvi_df["fazenda"]).astype(np.intp)
+        datas = ndvi_df["data"].values.astype("datetime64[D]")
+
+        with self._lock:
+            ultima = self.ultima_data[codes]
+            novas = np.isnat(ultima) | (datas > ultima)
+            codes, datas = codes[novas], datas[novas]
+            if len(codes) == 0:
+                return np.empty(0, dtype=np.intp)
+            valores = {s: ndvi_df[s].values[novas].astype(np.float64) for s in SERIES}
+
+            order = np.lexsort((datas, codes))
+            codes, datas = codes[order], datas[order]
+            afetadas, inicio, contagem = np.unique(codes, return_index=True, return_counts=True)
+            posicao = np.arange(len(codes)) - np.repeat(inicio, contagem)
+
+            # Junta buffer antigo e linhas novas e mantém as últimas K de cada fazenda
+            largura = self.k + contagem.max()
+            linha = np.repeat(np.arange(len(afetadas)), contagem)
+            pega = contagem[:, None] + np.arange(self.k)[None, :]
+            for s in SERIES:
+                combinado = np.full((len(afetadas), largura), np.nan)
+                combinado[:, :self.k] = self.buffers[s][afetadas]
+                combinado[linha, self.k + posicao] = valores[s][order]
+                self.buffers[s][afetadas] = np.take_along_axis(combinado, pega, axis=1)
+            self.ultima_data[afetadas] = datas[inicio + contagem - 1]
+
+            anterior = self.nivel[afetadas].copy()
+            self._evaluate(afetadas)
+            return afetadas[self.nivel[afetadas] != anterior]
+
+    def _evaluate(self, codes):
+        """Aplica todas as regras às fazendas `codes` de uma vez"""
+        r = self.regras
+        w, n = r["janela_dias"], r["queda_dias"]
+        ndvi_buf = self.buffers["ndvi"][codes]
+
+        ndvi = _window_mean(ndvi_buf, w)
+        passado = _window_mean(ndvi_buf[:, :self.k - n], w)
+        queda = passado - ndvi
+        temperatura = _window_mean(self.buffers["temperatura"][codes], w)
+        umidade = _window_mean(self.buffers["umidade"][codes], w)
+        chuva = self.buffers["precipitacao"][codes][:, -r["seca_dias"]:]
+        seca = (np.nan_to_num(chuva, nan=1.0) == 0).all(axis=1)
+
+        # Histerese: quem já está num nível só sai acima de limiar + histerese
+        anterior = self.nivel[codes]
+        lim_critico = r["ndvi_critico"] + np.where(anterior >= CRITICO, r["histerese"], 0)
+        lim_atencao = r["ndvi_atencao"] + np.where(anterior >= ATENCAO, r["histerese"], 0)
+        abaixo_critico = ndvi < lim_critico
+        abaixo_atencao = ~abaixo_critico & (ndvi < lim_atencao)
+
+        motivos = (
+            abaixo_critico * 1
+            | abaixo_atencao * 2
+            | (queda >= r["queda_ndvi"]) * 4
+            | (temperatura > r["temperatura_max"]) * 8
+            | (umidade < r["umidade_min"]) * 16
+            | seca * 32
+        ).astype(np.int16)
+
+        nivel = np.where(abaixo_critico, CRITICO, np.where(motivos != 0, ATENCAO, NORMAL))
+
+        self.nivel[codes] = nivel
+        self.ndvi[codes] = ndvi
+        self.queda[codes] = queda
+        self.motivos[codes] = motivos
+
+    def alerts(self, fazendas=None):
+        """
+        Tabela de alertas das fazendas (todas ou as da FarmTable informada),
+        ordenada por nível e NDVI.
+        """
+        if fazendas is None:
+            codes = np.arange(len(self.fazendas))
+        else:
+            codes = farm_codes(self.fazendas, pd.Series(fazendas.nome)).astype(np.intp)
+
+        tabela = pd.DataFrame({
+            "codigo": codes,
+            "fazenda": self.fazendas.nome[codes],
+            "proprietario": self.fazendas.proprietario[codes],
+            "nivel": self.nivel[codes],
+            "severidade": np.asarray(NIVEIS, dtype=object)[self.nivel[codes]],
+            "ndvi": self.ndvi[codes],
+            "queda": self.queda[codes],
+            "motivos": MOTIVOS_TEXTO[self.motivos[codes]]
+        })
+        return tabela.sort_values(["nivel", "ndvi"], ascending=[False, True], kind="stable")
+
+    def counts(self, fazendas=None):
+        """Quantidade de fazendas por nível"""
+        niveis = self.nivel if fazendas is None else \
+            self.nivel[farm_codes(self.fazendas, pd.Series(fazendas.nome))]
+        contagem = np.bincount(niveis, minlength=len(NIVEIS))
+        return dict(zip(NIVEIS, contagem.tolist()))
@@ -0,0 +1,258 @@
+"""
+AgrovisãoTech - Análise das séries de NDVI
+Suavização, anomalias e estimativa de produtividade de todas as fazendas de
+uma vez, sobre a matriz fazenda × dia (sem laço Python por fazenda)
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from agrovisao.data import CULTURAS, farm_codes
+from agrovisao.rollups import PRODUTIVIDADE_T_HA
+
+JANELA_DIAS = 7        # janela da suavização (ímpar)
+ORDEM_POLINOMIO = 2    # grau do polinômio do Savitzky-Golay
+Z_LIMIAR = 3.0         # |z| do resíduo a partir do qual a leitura é anômala
+SAFRA_DIAS = 120       # últimos dias considerados na estimativa de produtividade
+
+# Estimativa de produtividade: uma lavoura que passe a safra com NDVI_REF
+# produz PRODUTIVIDADE_REF t/ha; abaixo de NDVI_SOLO não há biomassa.
+NDVI_SOLO = 0.2
+NDVI_REF = 0.75
+PRODUTIVIDADE_REF = {"Soja": 3.5, "Milho": 6.0}
+
+
+def series_matrix(ndvi_df, fazendas, coluna="ndvi"):
+    """
+    Reorganiza a série longa em uma matriz (fazendas, dias) float32.
+
+    Linhas seguem a ordem da FarmTable e colunas são dias consecutivos desde
+    a primeira data; dias sem leitura ficam NaN. Retorna também as datas, os
+    códigos de fazenda e a coluna (dia) de cada linha do quadro.
+    """
+    codigos = farm_codes(fazendas, ndvi_df["fazenda"])
+    datas = ndvi_df["data"].values.astype('datetime64[D]')
+    if len(datas) == 0:
+        return (np.full((len(fazendas), 0), np.nan, dtype=np.float32),
+                pd.DatetimeIndex([]), codigos, np.empty(0, dtype=np.intp))
+
+    inicio = datas.min()
+    dias = (datas - inicio).astype(np.intp)
+    matriz = np.full((len(fazendas), int(dias.max()) + 1), np.nan, dtype=np.float32)
+    matriz[codigos, dias] = ndvi_df[coluna].values
+    datas = pd.date_range(pd.Timestamp(inicio), periods=matriz.shape[1], freq="D")
+    return matriz, datas, codigos, dias
+
+
+def fill_gaps(m):
+    """Preenche NaN por interpolação linear ao longo dos dias (extremidades: vizinho mais próximo)"""
+    validos = ~np.isnan(m)
+    com_lacuna = np.flatnonzero(~validos.all(axis=1))
+    if len(com_lacuna) == 0:
+        return m
+    out = m.copy()
+    out[com_lacuna] = _interpolate(m[com_lacuna], validos[com_lacuna])
+    return out
+
+
+def _interpolate(m, validos):
+    n_fazendas, n_dias = m.shape
+    idx = np.arange(n_dias, dtype=np.int32)
+
+    anterior = np.where(validos, idx, -1)
+    np.maximum.accumulate(anterior, axis=1, out=anterior)
+    proximo = np.where(validos, idx, n_dias)[:, ::-1]
+    proximo = np.minimum.accumulate(proximo, axis=1)[:, ::-1]
+
+    anterior = np.where(anterior < 0, proximo, anterior)
+    proximo = np.where(proximo >= n_dias, anterior, proximo)
+    np.clip(anterior, 0, n_dias - 1, out=anterior)
+    np.clip(proximo, 0, n_dias - 1, out=proximo)
+
+    linhas = np.arange(n_fazendas)[:, None]
+    va, vp = m[linhas, anterior], m[linhas, proximo]
+    span = proximo - anterior
+    peso = np.divide(idx - anterior, span, out=np.zeros(m.shape, dtype=np.float32), where=span > 0)
+    return va + (vp - va) * peso
+
+
+def _row_median(x):
+    """Mediana de cada linha ignorando NaN; nanmedian só nas linhas que têm NaN"""
+    incompletas = np.isnan(x).any(axis=1)
+    out = np.empty((len(x), 1), dtype=x.dtype)
+    out[~incompletas, 0] = np.median(x[~incompletas], axis=1)
+    if incompletas.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # fazendas sem leitura
+            out[incompletas, 0] = np.nanmedian(x[incompletas], axis=1)
+    return out
+
+
+def rolling_mean(m, janela=JANELA_DIAS):
+    """Média móvel centrada ao longo dos dias, ignorando NaN (via soma acumulada)"""
+    meia = janela // 2
+    validos = ~np.isnan(m)
+    pad = ((0, 0), (meia + 1, meia))
+    soma = np.cumsum(np.pad(np.where(validos, m, 0).astype(np.float64), pad), axis=1)
+    conta = np.cumsum(np.pad(validos.astype(np.int32), pad), axis=1)
+    soma = soma[:, janela:] - soma[:, :-janela]
+    conta = conta[:, janela:] - conta[:, :-janela]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (soma / conta).astype(np.float32)
+
+
+def savgol_coeffs(janela=JANELA_DIAS, ordem=ORDEM_POLINOMIO):
+    """
+    Pesos do filtro Savitzky-Golay por mínimos quadrados.
+
+    Retorna a matriz (janela, janela) cuja linha i estima o valor na posição i
+    da janela; a linha central é o filtro usado no interior da série e as
+    demais tratam as extremidades (ajuste do polinômio à primeira e à última
+    janela).
+    """
+    x = np.arange(janela) - janela // 2
+    vander = np.vander(x, ordem + 1, increasing=True)
+    return vander @ np.linalg.pinv(vander)
+
+
+def savgol(m, janela=JANELA_DIAS, ordem=ORDEM_POLINOMIO):
+    """Suavização Savitzky-Golay ao longo dos dias; lacunas são interpoladas antes"""
+    n_dias = m.shape[1]
+    janela = min(janela, n_dias - (n_dias % 2 == 0))
+    if janela <= ordem:
+        return fill_gaps(m) if n_dias else m.copy()
+
+    y = fill_gaps(m)
+    pesos = savgol_coeffs(janela, ordem).astype(np.float32)
+    meia = janela // 2
+
+    # Interior: um termo por posição da janela, cada um sobre todas as fazendas
+    out = np.empty_like(y)
+    interior = out[:, meia:n_dias - meia]
+    interior[:] = 0
+    for k, c in enumerate(pesos[meia]):
+        interior += c * y[:, k:k + n_dias - janela + 1]
+    out[:, :meia] = y[:, :janela] @ pesos[:meia].T
+    out[:, n_dias - meia:] = y[:, -janela:] @ pesos[meia + 1:].T
+    return out
+
+
+def anomaly_scores(m, suave):
+    """
+    z robusto do resíduo (leitura - série suavizada) de cada fazenda.
+
+    Centro e escala saem da mediana e do desvio absoluto mediano da própria
+    fazenda, para que as anomalias não inflem a escala; leituras ausentes e
+    fazendas sem variação ficam com z NaN e 0, respectivamente.
+    """
+    residuo = m - suave
+    if residuo.size == 0:
+        return residuo
+    residuo -= _row_median(residuo)
+    escala = 1.4826 * _row_median(np.abs(residuo))
+    np.divide(residuo, escala, out=residuo, where=escala > 0)
+    residuo[(escala == 0)[:, 0]] = 0
+    residuo[np.isnan(m)] = np.nan
+    return residuo
+
+
+def yield_estimate(suave, cultura_codes, safra_dias=SAFRA_DIAS):
+    """
+    Produtividade (t/ha) pela integral do NDVI acima do solo nos últimos `safra_dias`.
+
+    A integral (regra do trapézio, NDVI·dia) é comparada à de uma lavoura
+    com NDVI_REF constante no mesmo período, escalando a produtividade de
+    referência da cultura. Retorna (integral, produtividade); fazendas sem
+    leitura ficam NaN.
+    """
+    janela = suave[:, -safra_dias:]
+    n_dias = janela.shape[1]
+    if n_dias == 0:
+        vazio = np.full(len(suave), np.nan)
+        return vazio, vazio.copy()
+
+    acima = np.clip(janela.astype(np.float64) - NDVI_SOLO, 0, None)
+    if n_dias == 1:
+        integral = acima[:, 0]
+    else:
+        integral = acima.sum(axis=1) - 0.5 * (acima[:, 0] + acima[:, -1])
+    referencia = (NDVI_REF - NDVI_SOLO) * max(n_dias - 1, 1)
+
+    produtividade_ref = np.array([PRODUTIVIDADE_REF.get(c, PRODUTIVIDADE_T_HA) for c in CULTURAS])
+    return integral, produtividade_ref[cultura_codes] * integral / referencia
+
+
+def analyze_series(ndvi_df, fazendas, janela=JANELA_DIAS, ordem=ORDEM_POLINOMIO,
+                   metodo="savgol", z_limiar=Z_LIMIAR, safra_dias=SAFRA_DIAS):
+    """
+    Suaviza, marca anomalias e estima a produção de todas as fazendas.
+
+    `metodo` é "savgol" ou "media" (média móvel). Retorna {"fazendas":
+    quadro por fazenda (NDVI atual suavizado, anomalias, integral,
+    produtividade e produção), "ndvi_suave" e "anomalia": valores alinhados
+    às linhas de `ndvi_df`, "datas", "producao_estimada", "anomalias" e
+    "fazendas_anomalas": fazendas com anomalia na última janela}.
+    Fazendas sem leitura no período entram na produção com PRODUTIVIDADE_T_HA.
+    """
+    if metodo not in ("savgol", "media"):
+        raise ValueError(f"Método de suavização desconhecido: {metodo}")
+
+    matriz, datas, codigos, dias = series_matrix(ndvi_df, fazendas)
+    n_fazendas = len(fazendas)
+    if matriz.shape[1] == 0:
+        # Nenhuma leitura no período: só a produção pela produtividade média
+        vazio = np.full(n_fazendas, np.nan)
+        return _result(fazendas, datas, atual=vazio, n_anomalias=np.zeros(n_fazendas, dtype=np.int64),
+                       ultima_data=np.full(n_fazendas, np.datetime64("NaT"), dtype='datetime64[ns]'),
+                       integral=vazio, produtividade=vazio, recente=np.zeros(n_fazendas, dtype=bool),
+                       ndvi_suave=np.empty(0, dtype=np.float32), anomalia=np.empty(0, dtype=bool))
+
+    if metodo == "savgol":
+        suave = savgol(matriz, janela, ordem)
+    else:
+        suave = rolling_mean(matriz, janela)
+
+    z = anomaly_scores(matriz, suave)
+    with np.errstate(invalid="ignore"):
+        anomalia = np.abs(z) > z_limiar
+    n_anomalias = anomalia.sum(axis=1)
+    recente = anomalia[:, -janela:].any(axis=1)
+
+    # Data da última anomalia: maior coluna marcada de cada linha
+    ultima = np.where(n_anomalias > 0, matriz.shape[1] - 1 - np.argmax(anomalia[:, ::-1], axis=1), -1)
+    ultima_data = np.full(n_fazendas, np.datetime64("NaT"), dtype='datetime64[ns]')
+    ultima_data[ultima >= 0] = datas.values[ultima[ultima >= 0]]
+
+    integral, produtividade = yield_estimate(suave, fazendas.cultura.codes, safra_dias)
+    return _result(fazendas, datas, atual=suave[:, -1], n_anomalias=n_anomalias,
+                   ultima_data=ultima_data, integral=integral, produtividade=produtividade,
+                   recente=recente, ndvi_suave=suave[codigos, dias], anomalia=anomalia[codigos, dias])
+
+
+def _result(fazendas, datas, atual, n_anomalias, ultima_data, integral, produtividade,
+            recente, ndvi_suave, anomalia):
+    area = np.asarray(fazendas.area, dtype=np.float64)
+    producao = area * np.where(np.isnan(produtividade), PRODUTIVIDADE_T_HA, produtividade)
+    por_fazenda = pd.DataFrame({
+        "fazenda": fazendas.nome,
+        "cultura": fazendas.cultura,
+        "area": area,
+        "ndvi_atual": atual,
+        "anomalias": n_anomalias,
+        "ultima_anomalia": ultima_data,
+        "ndvi_integral": integral,
+        "produtividade_t_ha": produtividade,
+        "producao_t": producao
+    })
+
+    return {
+        "fazendas": por_fazenda,
+        "ndvi_suave": ndvi_suave,
+        "anomalia": anomalia,
+        "datas": datas,
+        "producao_estimada": float(producao.sum()),
+        "anomalias": int(n_anomalias.sum()),
+        "fazendas_anomalas": int(recente.sum())
+    }
@@ -0,0 +1,299 @@
+"""
+AgrovisãoTech - Benchmarks
+Tempo e pico de memória dos caminhos críticos, sem Streamlit, em tamanhos
+parametrizados; os resultados são gravados em JSON para comparar execuções.
+O caso app_import mede a partida a frio: os imports do topo do app_simples
+em um interpretador novo, contra o orçamento ORCAMENTOS_S.
+
+Uso:
+    python -m agrovisao.bench --tamanhos pequeno,medio
+    python -m agrovisao.bench --comparar bench_results/20240101-120000.json
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from agrovisao.alerts import AlertEngine
+from agrovisao.analytics import analyze_series
+from agrovisao.data import demo_data, generate_bulk_data
+from agrovisao.ndvi import compute_ndvi, sample_bands, sample_ndvi
+from agrovisao.render import encode_png, render_ndvi_panels
+from agrovisao.rollups import KpiRollup
+from agrovisao.timeline import timeline_figure
+
+PASTA_RESULTADOS = "bench_results"
+
+TAMANHOS = {
+    "pequeno": {"fazendas": 100, "dias": 90, "lado": 256},
+    "medio": {"fazendas": 1000, "dias": 365, "lado": 1024},
+    "grande": {"fazendas": 5000, "dias": 3 * 365, "lado": 4096},
+}
+
+TOLERANCIA = 0.25  # aumento relativo da mediana considerado regressão
+RUIDO_S = 1e-3     # diferenças menores que estas não contam como regressão
+RUIDO_MB = 1.0
+
+# Tempo máximo (mediana) por caso; acima dele a execução falha mesmo sem --comparar
+ORCAMENTOS_S = {"app_import": float(os.environ.get("AGROVISAO_ORCAMENTO_IMPORT_S", 1.0))}
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "app_simples.py")
+
+
+def _farms(p):
+    return generate_bulk_data(p["fazendas"], p["dias"], seed=0)
+
+
+def _bands(p):
+    return sample_bands(p["lado"], seed=0)
+
+
+def _scene(p):
+    red, nir = sample_bands(p["lado"], seed=0)
+    return red, nir, compute_ndvi(red, nir)
+
+
+def _panels(p):
+    return (render_ndvi_panels(*_scene(p), cache=None),)
+
+
+def _encode_panels(paineis):
+    return {nome: encode_png(rgb) for nome, rgb in paineis.items()}
+
+
+def _figure(p):
+    fazendas, ndvi_df = _farms(p)
+    return (timeline_figure(ndvi_df, title="NDVI"),)
+
+
+def _dashboard(fazendas, ndvi_df):
+    rollup = KpiRollup.from_farms(fazendas)
+    return rollup.summary(), rollup.summary(cultura="Soja"), rollup.colors()
+
+
+def _alerts(fazendas, ndvi_df):
+    engine = AlertEngine(fazendas)
+    engine.ingest(ndvi_df)
+    return engine.alerts(fazendas), engine.counts(fazendas)
+
+
+def app_imports(path=APP):
+    """Módulos importados no nível de topo do script (os que pesam na partida a frio)"""
+    with open(path, encoding="utf-8") as fh:
+        arvore = ast.parse(fh.read())
+    modulos = []
+    for node in arvore.body:
+        if isinstance(node, ast.Import):
+            modulos.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modulos.append(node.module)
+    return list(dict.fromkeys(modulos))
+
+
+def cold_start(modulos, memoria=False):
+    """
+    Importa `modulos` em um interpretador novo e devolve (segundos, pico MB).
+
+    A medição é feita no processo filho; o pico (tracemalloc) só com
+    `memoria`, que deixa os imports mais lentos e por isso fica em uma
+    execução separada.
+    """
+    codigo = "import time, tracemalloc\n"
+    if memoria:
+        codigo += "tracemalloc.start()\n"
+    codigo += "t0 = time.perf_counter()\n"
+    codigo += "".join(f"import {m}\n" for m in modulos)
+    codigo += "print(time.perf_counter() - t0, tracemalloc.get_traced_memory()[1])\n"
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True,
+                           cwd=RAIZ, check=True).stdout.split()
+    return float(saida[-2]), int(saida[-1]) / 2 ** 20
+
+
+def measure_cold_start(repeticoes=5, modulos=None):
+    """Como measure(), para a partida a frio: cada repetição é um processo novo"""
+    modulos = app_imports() if modulos is None else modulos
+    tempos = [cold_start(modulos)[0] for _ in range(repeticoes)]
+    _, pico = cold_start(modulos, memoria=True)
+    return {
+        "mediana_s": float(np.median(tempos)),
+        "min_s": min(tempos),
+        "pico_mb": pico,
+        "repeticoes": repeticoes
+    }
+
+
+# nome: (preparo fora da medição, função medida, parâmetros usados); os casos
+# "app_*" medem as funções que o app chama, no tamanho que ele usa. Preparo
+# None: a função faz a própria medição, em outro processo
+CASOS = {
+    "app_import": (None, measure_cold_start, ()),
+    "app_dados": (lambda p: (), demo_data, ()),
+    "app_ndvi": (lambda p: (), sample_ndvi, ()),
+    "dados": (lambda p: (p["fazendas"], p["dias"]),
+              lambda n, d: generate_bulk_data(n, d, seed=0), ("fazendas", "dias")),
+    "ndvi": (_bands, compute_ndvi, ("lado",)),
+    "render": (_scene, lambda r, n, v: render_ndvi_panels(r, n, v, cache=None), ("lado",)),
+    "png": (_panels, _encode_panels, ("lado",)),
+    "timeline": (_farms, lambda f, df: timeline_figure(df, title="NDVI"), ("fazendas", "dias")),
+    "figura": (_figure, lambda fig: fig.to_json(), ("fazendas", "dias")),
+    "dashboard": (_farms, _dashboard, ("fazendas", "dias")),
+    "alertas": (_farms, _alerts, ("fazendas", "dias")),
+    "analise": (_farms, lambda f, df: analyze_series(df, f), ("fazendas", "dias")),
+}
+
+
+def measure(fn, args, repeticoes=5):
+    """Tempos de `repeticoes` chamadas e o pico de memória (tracemalloc) de uma chamada extra"""
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn(*args)
+        tempos.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "mediana_s": float(np.median(tempos)),
+        "min_s": min(tempos),
+        "pico_mb": pico / 2 ** 20,
+        "repeticoes": repeticoes
+    }
+
+
+def run(casos=None, tamanhos=("pequeno",), repeticoes=5, log=print):
+    """Executa os casos em cada tamanho e devolve a lista de resultados"""
+    resultados = []
+    for tamanho in tamanhos:
+        params = TAMANHOS[tamanho]
+        for nome in casos or CASOS:
+            preparo, fn, usados = CASOS[nome]
+            r = fn(repeticoes) if preparo is None else measure(fn, preparo(params), repeticoes)
+            r.update(caso=nome, tamanho=tamanho, params={k: params[k] for k in usados})
+            resultados.append(r)
+            if log:
+                log(f"{nome:<10} {tamanho:<8} {r['mediana_s'] * 1e3:10.1f} ms "
+                    f"{r['pico_mb']:9.1f} MB")
+    return resultados
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(resultados, pasta=PASTA_RESULTADOS):
+    """Grava os resultados com a identificação da máquina e do commit"""
+    os.makedirs(pasta, exist_ok=True)
+    agora = datetime.now()
+    path = os.path.join(pasta, f"{agora:%Y%m%d-%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump({
+            "criado_em": agora.isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "maquina": platform.platform(),
+            "cpus": os.cpu_count(),
+            "resultados": resultados
+        }, fh, indent=2, ensure_ascii=False)
+    return path
+
+
+def latest(pasta=PASTA_RESULTADOS, exceto=None):
+    arquivos = sorted(p for p in glob.glob(os.path.join(pasta, "*.json")) if p != exceto)
+    return arquivos[-1] if arquivos else None
+
+
+def compare(resultados, referencia, tolerancia=TOLERANCIA):
+    """
+    Compara com um arquivo salvo, caso a caso (mesmo caso e tamanho).
+
+    Retorna linhas (caso, tamanho, razão do tempo, razão da memória, regressão).
+    """
+    with open(referencia, encoding="utf-8") as fh:
+        anteriores = {(r["caso"], r["tamanho"]): r for r in json.load(fh)["resultados"]}
+
+    linhas = []
+    for r in resultados:
+        ref = anteriores.get((r["caso"], r["tamanho"]))
+        if ref is None:
+            continue
+        tempo = r["mediana_s"] / max(ref["mediana_s"], 1e-9)
+        memoria = r["pico_mb"] / max(ref["pico_mb"], 1e-9)
+        mais_lento = tempo > 1 + tolerancia and r["mediana_s"] - ref["mediana_s"] > RUIDO_S
+        mais_memoria = memoria > 1 + tolerancia and r["pico_mb"] - ref["pico_mb"] > RUIDO_MB
+        linhas.append((r["caso"], r["tamanho"], tempo, memoria, mais_lento or mais_memoria))
+    return linhas
+
+
+def over_budget(resultados, orcamentos=ORCAMENTOS_S):
+    """Resultados cuja mediana passa do orçamento do caso: (caso, tamanho, mediana, orçamento)"""
+    return [(r["caso"], r["tamanho"], r["mediana_s"], orcamentos[r["caso"]])
+            for r in resultados
+            if r["caso"] in orcamentos and r["mediana_s"] > orcamentos[r["caso"]]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do AgrovisãoTech")
+    parser.add_argument("--casos", default=",".join(CASOS),
+                        help=f"lista separada por vírgulas de {', '.join(CASOS)}")
+    parser.add_argument("--tamanhos", default="pequeno",
+                        help=f"lista separada por vírgulas de {', '.join(TAMANHOS)}")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", default=PASTA_RESULTADOS, help="pasta dos resultados")
+    parser.add_argument("--comparar", nargs="?", const="ultimo",
+                        help="arquivo de referência (padrão: o último da pasta de saída)")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args(argv)
+
+    casos = [c for c in args.casos.split(",") if c]
+    tamanhos = [t for t in args.tamanhos.split(",") if t]
+    desconhecidos = [c for c in casos if c not in CASOS] + [t for t in tamanhos if t not in TAMANHOS]
+    if desconhecidos:
+        parser.error(f"desconhecidos: {', '.join(desconhecidos)}")
+
+    resultados = run(casos, tamanhos, args.repeticoes)
+    path = save(resultados, args.saida)
+    print(f"Resultados gravados em {path}")
+
+    regressoes = 0
+    for caso, tamanho, mediana, orcamento in over_budget(resultados):
+        regressoes += 1
+        print(f"{caso:<10} {tamanho:<8} {mediana:.2f} s acima do orçamento de {orcamento:.2f} s")
+
+    if args.comparar:
+        referencia = latest(args.saida, exceto=path) if args.comparar == "ultimo" else args.comparar
+        if referencia is None:
+            print("Nenhum resultado anterior para comparar")
+            return 1 if regressoes else 0
+        print(f"Comparação com {referencia}")
+        for caso, tamanho, tempo, memoria, regressao in compare(resultados, referencia, args.tolerancia):
+            regressoes += regressao
+            print(f"{caso:<10} {tamanho:<8} tempo x{tempo:5.2f}  memória x{memoria:5.2f}"
+                  + ("  <-- regressão" if regressao else ""))
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+AgrovisãoTech - Cache em disco
+Cache local endereçado por conteúdo, compartilhado entre sessões e
+processos, com descarte LRU pelo total de bytes
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos na limpeza
+    fcntl = None
+
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+FORMATO_CACHE = 1  # incrementar ao mudar o layout das entradas em disco
+
+_ARRAY, _ARRAYS, _PICKLE = ".npy", ".arrays", ".pkl"
+
+
+def default_cache_dir():
+    """Pasta de cache do usuário (XDG_CACHE_HOME ou ~/.cache), fora do /tmp compartilhado"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "agrovisao")
+
+
+def code_version(*extras):
+    """
+    Versão das entradas: formato do cache e hash do código-fonte do pacote
+    (e dos arquivos em `extras`). Depois de um deploy que muda geradores ou
+    classes serializadas, as entradas antigas deixam de ser encontradas e
+    saem pelo descarte LRU.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    h.update(str(FORMATO_CACHE).encode())
+    pacote = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py")))
+    for path in pacote + list(extras):
+        h.update(os.path.basename(path).encode())
+        with open(path, "rb") as fh:
+            h.update(fh.read())
+    return h.hexdigest()
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(e.stat().st_size for e in os.scandir(path))
+    return os.path.getsize(path)
+
+
+class DiskCache:
+    """
+    Entradas em <root>/<chave>.<formato>, com a chave vinda de
+    render.content_key:
+
+    - array NumPy: .npy, devolvido como memmap somente leitura (sem cópia);
+    - dicionário de arrays (ex.: painéis renderizados): pasta .arrays com um
+      .npy por item, também mapeados em memória;
+    - outros objetos (KPIs, tabelas): .pkl.
+
+    Escritas vão para um temporário e são renomeadas, então leitores em
+    outros processos nunca veem entradas pela metade. Cada acerto atualiza o
+    mtime da entrada; ao passar de max_bytes as mais antigas são removidas.
+    Toda chave recebe a `versao` do código (padrão: code_version()), e a
+    pasta é criada acessível só ao usuário, já que os .pkl são carregados
+    com pickle.
+    """
+
+    def __init__(self, root=None, max_bytes=CACHE_MAX_BYTES, versao=None):
+        self.root = str(root or default_cache_dir())
+        self.max_bytes = max_bytes
+        self.versao = code_version() if versao is None else versao
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total = self._scan_total()
+
+    def _scan_total(self):
+        return sum(_size(e.path) for e in os.scandir(self.root) if not e.name.startswith("."))
+
+    def _path(self, key, fmt):
+        return os.path.join(self.root, f"{key}-{self.versao}{fmt}")
+
+    def get(self, key, default=None):
+        """Valor da chave ou `default` quando ausente"""
+        found, value = self._lookup(key)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value if found else default
+
+    def _lookup(self, key):
+        for fmt in (_ARRAY, _ARRAYS, _PICKLE):
+            path = self._path(key, fmt)
+            try:
+                value = self._load(path, fmt)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            except (EOFError, pickle.UnpicklingError, ValueError):
+                # Entrada corrompida (processo interrompido): descarta
+                self._remove(path)
+                continue
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return True, value
+        return False, None
+
+    @staticmethod
+    def _load(path, fmt):
+        if fmt == _ARRAY:
+            return np.load(path, mmap_mode='r')
+        if fmt == _ARRAYS:
+            return {name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+                    for name in sorted(os.listdir(path))}
+        with open(path, "rb") as fh:
+            return pickle.load(fh)
+
+    def put(self, key, value):
+        """Grava o valor e devolve a versão lida do disco (memmap para arrays)"""
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            if isinstance(value, np.ndarray):
+                fmt = _ARRAY
+                tmp = os.path.join(tmp_dir, "valor.npy")
+                np.save(tmp, value)
+            elif isinstance(value, dict) and value and \
+                    all(isinstance(v, np.ndarray) for v in value.values()):
+                fmt = _ARRAYS
+                tmp = os.path.join(tmp_dir, "valor")
+                os.mkdir(tmp)
+                for name, arr in value.items():
+                    np.save(os.path.join(tmp, f"{name}.npy"), arr)
+            else:
+                fmt = _PICKLE
+                tmp = os.path.join(tmp_dir, "valor.pkl")
+                with open(tmp, "wb") as fh:
+                    pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+            path = self._path(key, fmt)
+            try:
+                anterior = _size(path)
+            except OSError:
+                anterior = 0
+            try:
+                os.replace(tmp, path)
+                # Só a diferença para a entrada substituída (se havia uma) entra no total
+                acrescimo = _size(path) - anterior
+            except OSError:
+                # Outro processo gravou a mesma chave (pasta já existe): usa a dele
+                acrescimo = 0
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        with self._lock:
+            self._total += acrescimo
+            over = self._total > self.max_bytes
+        if over:
+            self.evict()
+        found, stored = self._lookup(key)
+        return stored if found else value
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def _remove(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Remove as entradas menos usadas até o total caber em max_bytes"""
+        lock_fh = open(os.path.join(self.root, ".lock"), "w")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            entries = []
+            for e in os.scandir(self.root):
+                if e.name.startswith("."):
+                    continue
+                try:
+                    entries.append((e.stat().st_mtime, _size(e.path), e.path))
+                except OSError:
+                    continue
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+            with self._lock:
+                self._total = total
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+            lock_fh.close()
+
+    @property
+    def nbytes(self):
+        return self._total
+
+    def clear(self):
+        for e in os.scandir(self.root):
+            if not e.name.startswith("."):
+                self._remove(e.path)
+        with self._lock:
+            self._total = 0
@@ -0,0 +1,145 @@
+"""
+AgrovisãoTech - Detecção de mudanças
+Diferença de NDVI entre dois voos do mesmo talhão, calculada tile a tile
+sem carregar nenhuma das cenas inteira
+"""
+
+import os
+
+import numpy as np
+
+from agrovisao.ingest import PADRAO_ARQUIVO
+from agrovisao.ndvi import TILE_SIZE, create_output
+from agrovisao.zones import FOCO_MIN_PIXELS, RESOLUCAO_M, analyze_scene
+
+LIMIAR_QUEDA = -0.1  # variação de NDVI a partir da qual o pixel conta como queda
+TOP_REGIOES = 10
+
+
+def flight_history(folder, banda="ndvi"):
+    """Rasters de cada fazenda na pasta de voos processados: {fazenda: [(data, caminho), ...]} por data"""
+    voos = {}
+    if not folder or not os.path.isdir(folder):
+        return voos
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            m = PADRAO_ARQUIVO.match(entry.name)
+            if m and m["banda"] == banda:
+                voos.setdefault(m["fazenda"], []).append((m["data"], entry.path))
+    return {fazenda: sorted(lista) for fazenda, lista in voos.items()}
+
+
+def overlap(shape_antes, shape_depois, offset=(0, 0)):
+    """
+    Janelas da área comum aos dois voos, no grid de cada um.
+
+    `offset` é a posição (linha, coluna) do pixel (0, 0) do voo novo no grid
+    do voo anterior; os dois voos precisam ter a mesma resolução.
+    """
+    dr, dc = offset
+    r0, c0 = max(0, dr), max(0, dc)
+    r1 = min(shape_antes[0], dr + shape_depois[0])
+    c1 = min(shape_antes[1], dc + shape_depois[1])
+    if r1 <= r0 or c1 <= c0:
+        raise ValueError("Voos sem área em comum")
+    return ((slice(r0, r1), slice(c0, c1)),
+            (slice(r0 - dr, r1 - dr), slice(c0 - dc, c1 - dc)))
+
+
+class DeltaRaster:
+    """
+    Visão de `depois - antes` na área comum, calculada sob demanda.
+
+    Cada fatia de linhas lida é montada tile a tile a partir das duas cenas
+    (arrays ou memmaps) e, com `out`, gravada no raster de saída. NaN em
+    qualquer um dos voos resulta em NaN.
+    """
+
+    def __init__(self, antes, depois, offset=(0, 0), out=None, tile_size=TILE_SIZE):
+        self.janela_antes, self.janela_depois = overlap(antes.shape, depois.shape, offset)
+        self.antes = antes
+        self.depois = depois
+        self.out = out
+        self.tile_size = tile_size
+        self.shape = (self.janela_antes[0].stop - self.janela_antes[0].start,
+                      self.janela_antes[1].stop - self.janela_antes[1].start)
+        if out is not None and out.shape != self.shape:
+            raise ValueError(f"Saída com forma {out.shape}, esperado {self.shape}")
+
+    def __getitem__(self, rows):
+        if not isinstance(rows, slice):
+            raise TypeError("DeltaRaster só aceita fatias de linhas")
+        r0, r1, _ = rows.indices(self.shape[0])
+        (ra, ca), (rb, cb) = [(w[0].start, w[1].start) for w in (self.janela_antes, self.janela_depois)]
+
+        strip = np.empty((r1 - r0, self.shape[1]), dtype=np.float32)
+        for c0 in range(0, self.shape[1], self.tile_size):
+            c1 = min(c0 + self.tile_size, self.shape[1])
+            np.subtract(self.depois[rb + r0:rb + r1, cb + c0:cb + c1],
+                        self.antes[ra + r0:ra + r1, ca + c0:ca + c1],
+                        out=strip[:, c0:c1], dtype=np.float32)
+        if self.out is not None:
+            self.out[r0:r1] = strip
+        return strip
+
+
+def detect_change(antes, depois, offset=(0, 0), out=None, zones=None, n_zones=None,
+                  limiar=LIMIAR_QUEDA, min_pixels=FOCO_MIN_PIXELS, pixel_size_m=RESOLUCAO_M,
+                  tile_size=TILE_SIZE, top=TOP_REGIOES):
+    """
+    Compara dois voos em uma única passada pela área comum.
+
+    Retorna {"stats": estatísticas da variação, "regioes": as `top` regiões
+    conexas com maior perda (variação < limiar), "zonas": variação por talhão
+    ou None, "janela": área comum no grid do voo anterior}. `zones` é um
+    raster de rótulos no grid do voo anterior; coordenadas das regiões
+    também. Com `out` (array ou memmap na forma da área comum) grava o
+    raster de variação.
+    """
+    delta = DeltaRaster(antes, depois, offset=offset, out=out, tile_size=tile_size)
+    if zones is not None:
+        zones = zones[delta.janela_antes]
+
+    analise = analyze_scene(delta, limiar=limiar, zones=zones, n_zones=n_zones,
+                            pixel_size_m=pixel_size_m, min_pixels=min_pixels)
+
+    r0, c0 = delta.janela_antes[0].start, delta.janela_antes[1].start
+    regioes = analise["focos"].rename(columns={"foco": "regiao", "ndvi_medio": "delta_medio"})
+    regioes = regioes.astype({"delta_medio": float, "area_ha": float})
+    regioes["perda"] = -regioes["delta_medio"] * regioes["area_ha"]
+    for col in ("linha_min", "linha_max", "centro_linha"):
+        regioes[col] = regioes[col] + r0
+    for col in ("coluna_min", "coluna_max", "centro_coluna"):
+        regioes[col] = regioes[col] + c0
+    regioes = regioes.sort_values("perda", ascending=False, kind="stable").head(top)
+    regioes["regiao"] = np.arange(1, len(regioes) + 1)
+
+    zonas = analise["zonas"]
+    if zonas is not None:
+        zonas = zonas.rename(columns={c: c.replace("ndvi", "delta") for c in zonas.columns})
+
+    return {
+        "stats": analise["stats"],
+        "regioes": regioes.reset_index(drop=True),
+        "zonas": zonas,
+        "janela": delta.janela_antes
+    }
+
+
+def detect_change_files(antes_path, depois_path, out_path=None, offset=(0, 0), **kwargs):
+    """
+    Compara dois rasters NDVI em disco (.npy), mapeados em memória.
+
+    Com `out_path` grava a variação em um .npy (memmap) do tamanho da área comum.
+    """
+    antes = np.load(antes_path, mmap_mode='r')
+    depois = np.load(depois_path, mmap_mode='r')
+    out = None
+    if out_path is not None:
+        janela, _ = overlap(antes.shape, depois.shape, offset)
+        out = create_output(out_path, (janela[0].stop - janela[0].start,
+                                       janela[1].stop - janela[1].start))
+    resultado = detect_change(antes, depois, offset=offset, out=out, **kwargs)
+    if out is not None:
+        out.flush()
+    return resultado
@@ -0,0 +1,247 @@
+"""
+AgrovisãoTech - Geração de dados de exemplo
+Gerador colunar e vetorizado das séries históricas de NDVI
+"""
+
+import numpy as np
+import pandas as pd
+
+# Propriedades de demonstração exibidas no app
+FAZENDAS_DEMO = [
+    {
+        "id": "fazenda_001",
+        "nome": "Fazenda São João",
+        "area": 520.5,
+        "cultura": "Soja",
+        "coordenadas": [-15.7801, -47.9292],
+        "ndvi_medio": 0.78,
+        "status": "Excelente",
+        "ultima_analise": "2024-01-15",
+        "proprietario": "João Silva",
+        "variedade": "Soja BRS 360"
+    },
+    {
+        "id": "fazenda_002",
+        "nome": "Sítio Esperança",
+        "area": 280.3,
+        "cultura": "Milho",
+        "coordenadas": [-15.7901, -47.9392],
+        "ndvi_medio": 0.65,
+        "status": "Muito Boa",
+        "ultima_analise": "2024-01-14",
+        "proprietario": "Maria Santos",
+        "variedade": "Milho AG 7098"
+    },
+    {
+        "id": "fazenda_003",
+        "nome": "Fazenda Vista Verde",
+        "area": 750.0,
+        "cultura": "Soja",
+        "coordenadas": [-15.7701, -47.9192],
+        "ndvi_medio": 0.42,
+        "status": "Regular",
+        "ultima_analise": "2024-01-13",
+        "proprietario": "Carlos Oliveira",
+        "variedade": "Soja TMG 7262"
+    },
+    {
+        "id": "fazenda_004",
+        "nome": "Agro Futuro",
+        "area": 1200.0,
+        "cultura": "Milho",
+        "coordenadas": [-15.7601, -47.9092],
+        "ndvi_medio": 0.25,
+        "status": "Crítica",
+        "ultima_analise": "2024-01-12",
+        "proprietario": "José Ferreira",
+        "variedade": "Milho DKB 390"
+    }
+]
+
+CULTURAS = ["Soja", "Milho"]
+STATUS = ["Excelente", "Muito Boa", "Regular", "Crítica"]
+VARIEDADES = {
+    "Soja": ["Soja BRS 360", "Soja TMG 7262"],
+    "Milho": ["Milho AG 7098", "Milho DKB 390"]
+}
+
+
+def status_codes(ndvi):
+    """
+    Códigos de STATUS para um array de NDVI médio
+    (Excelente >= 0.7 > Muito Boa >= 0.5 > Regular >= 0.3 > Crítica).
+    """
+    return (len(STATUS) - 1 - np.digitize(np.asarray(ndvi), [0.3, 0.5, 0.7])).astype(np.int8)
+
+
+def _as_float(valor):
+    """Converte float32 para float Python sem ruído de precisão (0.65, não 0.6499999)"""
+    return float(str(valor))
+
+
+class FarmTable:
+    """
+    Tabela de propriedades em estrutura de arrays, indexada pelo código da fazenda.
+
+    Cada atributo é um array com uma posição por fazenda; cultura e status são
+    categóricos (códigos inteiros). Iterar sobre a tabela devolve os registros
+    no formato de dicionário usado pelas páginas do app.
+    """
+
+    COLUNAS = [
+        "id", "nome", "area", "cultura", "lat", "lon", "ndvi_medio",
+        "status", "ultima_analise", "proprietario", "variedade"
+    ]
+
+    def __init__(self, id, nome, area, cultura, lat, lon, ndvi_medio,
+                 status, ultima_analise, proprietario, variedade):
+        self.id = np.asarray(id, dtype=object)
+        self.nome = np.asarray(nome, dtype=object)
+        self.area = np.asarray(area, dtype=np.float32)
+        self.cultura = pd.Categorical(cultura, categories=CULTURAS)
+        self.lat = np.asarray(lat, dtype=np.float32)
+        self.lon = np.asarray(lon, dtype=np.float32)
+        self.ndvi_medio = np.asarray(ndvi_medio, dtype=np.float32)
+        self.status = pd.Categorical(status, categories=STATUS)
+        self.ultima_analise = np.asarray(ultima_analise, dtype='datetime64[D]')
+        self.proprietario = np.asarray(proprietario, dtype=object)
+        self.variedade = pd.Categorical(variedade)
+
+    @classmethod
+    def from_records(cls, fazendas):
+        """Monta a tabela a partir de uma lista de dicionários de fazendas"""
+        colunas = {c: [] for c in cls.COLUNAS}
+        for f in fazendas:
+            for c in ("id", "nome", "area", "cultura", "ndvi_medio", "status",
+                      "ultima_analise", "proprietario", "variedade"):
+                colunas[c].append(f[c])
+            colunas["lat"].append(f["coordenadas"][0])
+            colunas["lon"].append(f["coordenadas"][1])
+        return cls(**colunas)
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, i):
+        return {
+            "id": self.id[i],
+            "nome": self.nome[i],
+            "area": _as_float(self.area[i]),
+            "cultura": self.cultura[i],
+            "coordenadas": [_as_float(self.lat[i]), _as_float(self.lon[i])],
+            "ndvi_medio": _as_float(self.ndvi_medio[i]),
+            "status": self.status[i],
+            "ultima_analise": str(self.ultima_analise[i]),
+            "proprietario": self.proprietario[i],
+            "variedade": self.variedade[i]
+        }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def take(self, indices):
+        """Subconjunto da tabela nas posições informadas"""
+        return FarmTable(**{c: getattr(self, c)[indices] for c in self.COLUNAS})
+
+    def index_of(self, nome):
+        """Retorna o código (posição) da fazenda pelo nome"""
+        return int(np.flatnonzero(self.nome == nome)[0])
+
+
+def farm_codes(fazendas, coluna):
+    """Códigos (posições na FarmTable) da coluna `fazenda` de uma série"""
+    if isinstance(coluna.dtype, pd.CategoricalDtype) and \
+            list(coluna.cat.categories) == list(fazendas.nome):
+        return coluna.cat.codes.values.astype(np.int32)
+    codigos = pd.Categorical(coluna, categories=fazendas.nome).codes.astype(np.int32)
+    if (codigos < 0).any():
+        raise KeyError("Linhas com fazenda fora do cadastro")
+    return codigos
+
+
+def generate_farms(n_fazendas, seed=None):
+    """Gera propriedades sintéticas para testes de carga"""
+    rng = np.random.default_rng(seed)
+
+    numeros = [f"{i + 1:05d}" for i in range(n_fazendas)]
+    ndvi_medio = np.round(rng.uniform(0.15, 0.9, n_fazendas), 2)
+    cultura_idx = rng.integers(0, len(CULTURAS), n_fazendas)
+    cultura = np.asarray(CULTURAS, dtype=object)[cultura_idx]
+    variedade_idx = rng.integers(0, 2, n_fazendas)
+    variedade = [VARIEDADES[c][v] for c, v in zip(cultura, variedade_idx)]
+    status = np.asarray(STATUS, dtype=object)[status_codes(ndvi_medio)]
+
+    return FarmTable(
+        id=["fazenda_" + n for n in numeros],
+        nome=["Fazenda " + n for n in numeros],
+        area=np.round(rng.uniform(50, 2000, n_fazendas), 1),
+        cultura=cultura,
+        lat=rng.uniform(-16.5, -15.0, n_fazendas),
+        lon=rng.uniform(-48.5, -47.0, n_fazendas),
+        ndvi_medio=ndvi_medio,
+        status=status,
+        ultima_analise=np.full(n_fazendas, "2024-01-15", dtype='datetime64[D]'),
+        proprietario=["Proprietário " + n for n in numeros],
+        variedade=variedade
+    )
+
+
+def generate_ndvi_timeseries(fazendas, dates, seed=None):
+    """
+    Gera o histórico diário de NDVI e clima de todas as propriedades de uma vez.
+
+    Todas as combinações fazenda × data são sorteadas em matrizes (F, D) com
+    broadcasting do NumPy. As linhas saem na mesma ordem do antigo laço por
+    linha (fazenda, depois data); fazenda e cultura são categóricas cujos
+    códigos são a posição da fazenda na FarmTable, e as medidas são float32.
+    """
+    if not isinstance(fazendas, FarmTable):
+        fazendas = FarmTable.from_records(fazendas)
+
+    rng = np.random.default_rng(seed)
+    dates = pd.DatetimeIndex(dates)
+    n_fazendas, n_dias = len(fazendas), len(dates)
+    shape = (n_fazendas, n_dias)
+
+    seasonal_effect = 0.1 * np.sin(2 * np.pi * np.arange(n_dias) / max(n_dias, 1))
+
+    ndvi = fazendas.ndvi_medio[:, None] + seasonal_effect[None, :].astype(np.float32)
+    ndvi += rng.normal(0, 0.03, shape).astype(np.float32)
+    np.clip(ndvi, 0, 1, out=ndvi)
+
+    temperatura = rng.uniform(20, 35, shape).astype(np.float32)
+    umidade = rng.uniform(40, 80, shape).astype(np.float32)
+    precipitacao = rng.exponential(2, shape).astype(np.float32)
+    precipitacao[rng.random(shape) <= 0.7] = 0
+
+    codigos = np.repeat(np.arange(n_fazendas, dtype=np.int32), n_dias)
+
+    return pd.DataFrame({
+        "fazenda": pd.Categorical.from_codes(codigos, categories=fazendas.nome),
+        "data": np.tile(dates.values, n_fazendas),
+        "ndvi": ndvi.ravel(),
+        "area": np.repeat(fazendas.area, n_dias),
+        "cultura": pd.Categorical.from_codes(
+            np.repeat(fazendas.cultura.codes, n_dias), categories=CULTURAS
+        ),
+        "temperatura": temperatura.ravel(),
+        "umidade": umidade.ravel(),
+        "precipitacao": precipitacao.ravel()
+    })
+
+
+def demo_data(seed=None, inicio="2024-01-01", fim="2024-01-15"):
+    """Propriedades de demonstração e o histórico diário de NDVI do período"""
+    fazendas = FarmTable.from_records(FAZENDAS_DEMO)
+    dates = pd.date_range(start=inicio, end=fim, freq='D')
+    return fazendas, generate_ndvi_timeseries(fazendas, dates, seed=seed)
+
+
+def generate_bulk_data(n_fazendas=5000, n_dias=3 * 365, seed=None, start="2024-01-01"):
+    """Gera propriedades e histórico em escala para testes de carga"""
+    rng = np.random.default_rng(seed)
+    fazendas = generate_farms(n_fazendas, seed=rng.integers(2**32))
+    dates = pd.date_range(start=start, periods=n_dias, freq='D')
+    ndvi_df = generate_ndvi_timeseries(fazendas, dates, seed=rng.integers(2**32))
+    return fazendas, ndvi_df
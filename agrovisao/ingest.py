@@ -0,0 +1,388 @@
+"""
+AgrovisãoTech - Ingestão de voos
+Pipeline em streaming que observa uma pasta local, calcula o NDVI dos voos
+novos tile a tile e acrescenta o resumo por fazenda à série temporal
+"""
+
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from agrovisao.data import farm_codes, status_codes
+from agrovisao.ndvi import (
+    INDICES, TILE_SIZE, TileBuffers, available_indices, compute_indices, create_output, iter_tiles,
+    normalized_difference, open_band
+)
+from agrovisao.zones import LIMIAR_ESTRESSE, RasterStats
+
+# <id da fazenda>_<AAAA-MM-DD>_<banda>.npy
+PADRAO_ARQUIVO = re.compile(r"^(?P<fazenda>.+)_(?P<data>\d{4}-\d{2}-\d{2})_(?P<banda>[a-z_]+)\.npy$")
+BANDAS_OBRIGATORIAS = ("red", "nir")
+PASTA_PROCESSADOS = "processados"
+PASTA_REJEITADOS = "rejeitados"
+PASTA_PARCIAL = ".parcial"  # rasters de voos ainda em processamento
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """Voo pronto para processar: fazenda, data e caminhos das bandas"""
+
+    def __init__(self, farm_id, data, bands, assinatura=None):
+        self.farm_id = farm_id
+        self.data = data
+        self.bands = bands
+        self.assinatura = assinatura  # (banda, mtime) dos arquivos: muda se o voo for reenviado
+
+    @property
+    def key(self):
+        return (self.farm_id, self.data)
+
+    def __repr__(self):
+        return f"Flight({self.farm_id!r}, {self.data!r}, {sorted(self.bands)})"
+
+
+def discover(folder, ignore=(), settle_s=2.0):
+    """
+    Gera os voos completos da pasta: todas as bandas obrigatórias presentes e
+    sem modificação há `settle_s` segundos (upload concluído).
+    """
+    voos = {}
+    agora = time.time()
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            m = PADRAO_ARQUIVO.match(entry.name)
+            if not m or not entry.is_file():
+                continue
+            if agora - entry.stat().st_mtime < settle_s:
+                continue
+            key = (m["fazenda"], m["data"])
+            voos.setdefault(key, {})[m["banda"]] = (entry.path, entry.stat().st_mtime_ns)
+
+    for (farm_id, data), bands in sorted(voos.items(), key=lambda kv: kv[0][1]):
+        if (farm_id, data) in ignore:
+            continue
+        if all(b in bands for b in BANDAS_OBRIGATORIAS):
+            assinatura = tuple(sorted((b, mtime) for b, (_, mtime) in bands.items()))
+            yield Flight(farm_id, data, {b: path for b, (path, _) in bands.items()}, assinatura)
+
+
+def watch(folder, stop, ignore=(), poll_s=5.0, settle_s=2.0):
+    """Observa a pasta indefinidamente, gerando cada voo novo uma vez"""
+    while not stop.is_set():
+        for flight in discover(folder, ignore=ignore, settle_s=settle_s):
+            if stop.is_set():
+                return
+            yield flight
+        stop.wait(poll_s)
+
+
+def summarize_flight(flight, out_dir=None, tile_size=TILE_SIZE, limiar=LIMIAR_ESTRESSE):
+    """
+    Calcula o NDVI do voo tile a tile e resume a cena sem carregá-la inteira.
+
+    Com `out_dir` grava o raster NDVI em <out_dir>/<fazenda>_<data>_ndvi.npy
+    (memmap). Voos com banda red_edge ou green também têm NDRE/GNDVI,
+    calculados na mesma passada (ver _summarize_indices). Retorna o resumo do
+    voo, com a média de cada índice (NaN se faltar a banda).
+    """
+    indices = available_indices(flight.bands)
+    if indices != ["ndvi"]:
+        return _summarize_indices(flight, indices, out_dir, tile_size, limiar)
+
+    red = open_band(flight.bands["red"])
+    nir = open_band(flight.bands["nir"])
+
+    out = None
+    if out_dir is not None:
+        out = create_output(os.path.join(out_dir, f"{flight.farm_id}_{flight.data}_ndvi.npy"), red.shape)
+    buffers = TileBuffers(tile_size)
+    tile_out = np.empty((tile_size, tile_size), dtype=np.float32)
+
+    stats = RasterStats()
+    estresse = 0
+    for window in iter_tiles(red.shape, tile_size):
+        h = window[0].stop - window[0].start
+        w = window[1].stop - window[1].start
+        dst = out[window] if out is not None else tile_out[:h, :w]
+        normalized_difference(nir[window], red[window], dst, buffers)
+        stats.add(dst)
+        estresse += int(np.count_nonzero(dst < limiar))
+
+    if out is not None:
+        out.flush()
+    return _flight_summary(flight, stats.result(), estresse)
+
+
+def _summarize_indices(flight, indices, out_dir, tile_size, limiar):
+    """
+    Resumo de voo multiespectral: todos os índices em uma leitura de cada
+    tile (compute_indices, em threads), gravados em <fazenda>_<data>_<índice>.npy.
+    Sem `out_dir` os rasters ficam em memória.
+    """
+    bands = {name: open_band(path) for name, path in flight.bands.items()}
+    shape = bands["red"].shape
+    if out_dir is not None:
+        prefixo = os.path.join(out_dir, f"{flight.farm_id}_{flight.data}")
+        outputs = {index: create_output(f"{prefixo}_{index}.npy", shape) for index in indices}
+    else:
+        outputs = {index: np.empty(shape, dtype=np.float32) for index in indices}
+    compute_indices(bands, indices, outputs=outputs, tile_size=tile_size)
+
+    stats = {index: RasterStats() for index in indices}
+    estresse = 0
+    for window in iter_tiles(shape, tile_size):
+        for index, out in outputs.items():
+            stats[index].add(out[window])
+        estresse += int(np.count_nonzero(outputs["ndvi"][window] < limiar))
+    for out in outputs.values():
+        if isinstance(out, np.memmap):
+            out.flush()
+
+    medias = {index: stats[index].result()["mean"] for index in indices if index != "ndvi"}
+    return _flight_summary(flight, stats["ndvi"].result(), estresse, **medias)
+
+
+def _flight_summary(flight, resumo, estresse, **medias):
+    return {
+        "farm_id": flight.farm_id,
+        "data": pd.Timestamp(flight.data),
+        "ndvi": resumo["mean"],
+        "ndvi_std": resumo["std"],
+        "fracao_estresse": estresse / resumo["count"] if resumo["count"] else np.nan,
+        **{index: medias.get(index, np.nan) for index in INDICES if index != "ndvi"}
+    }
+
+
+class IngestPipeline:
+    """
+    Pasta de entrada -> fila limitada -> workers de NDVI -> fila limitada ->
+    gravação em lote na série temporal.
+
+    As filas limitadas dão contrapressão: com os workers ocupados o observador
+    para de enfileirar voos (que continuam no disco), então uma rajada de
+    voos não aumenta o uso de memória. Os voos processados são movidos para
+    a subpasta "processados", junto com o raster NDVI; os rejeitados (fazenda
+    fora do cadastro ou sem pixel válido) vão para "rejeitados", fora do
+    alcance do histórico de voos e dos relatórios.
+    """
+
+    def __init__(self, folder, store, workers=2, max_pending=4, batch_size=32,
+                 on_rows=None, tile_size=TILE_SIZE, poll_s=5.0, settle_s=2.0):
+        self.folder = str(folder)
+        self.store = store
+        self.workers = workers
+        self.batch_size = batch_size
+        self.on_rows = on_rows
+        self.tile_size = tile_size
+        self.poll_s = poll_s
+        self.settle_s = settle_s
+
+        self.done_dir = os.path.join(self.folder, PASTA_PROCESSADOS)
+        self.rejected_dir = os.path.join(self.folder, PASTA_REJEITADOS)
+        self.work_dir = os.path.join(self.folder, PASTA_PARCIAL)
+        for pasta in (self.done_dir, self.rejected_dir, self.work_dir):
+            os.makedirs(pasta, exist_ok=True)
+
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._results = queue.Queue(maxsize=max_pending * 2)
+        self._in_flight = set()
+        self._failed = {}  # voo com erro -> assinatura; só é retentado se reenviado
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.processed = 0
+        self.errors = []
+        self.rejected = []  # (fazenda, data, motivo) de voos processados mas não gravados
+        self.last_ingest = None
+
+    # Etapas
+
+    def _process(self, flight):
+        """
+        Calcula o resumo e move bandas e rasters para a pasta de processados
+        ou, se o voo for rejeitado, para a de rejeitados.
+
+        Os rasters são gravados na pasta parcial e só chegam a "processados"
+        depois da validação, então um voo rejeitado nunca aparece lá.
+        """
+        resumo = summarize_flight(flight, out_dir=self.work_dir, tile_size=self.tile_size)
+        resumo["motivo"] = self._rejection(resumo)
+        destino = self.done_dir if resumo["motivo"] is None else self.rejected_dir
+
+        prefixo = f"{flight.farm_id}_{flight.data}_"
+        with os.scandir(self.work_dir) as entries:
+            rasters = [e.path for e in entries if e.name.startswith(prefixo)]
+        for path in rasters + list(flight.bands.values()):
+            shutil.move(path, os.path.join(destino, os.path.basename(path)))
+        return resumo
+
+    def _rejection(self, resumo):
+        """Motivo para não gravar o voo (fazenda fora do cadastro ou sem NDVI válido), ou None"""
+        if resumo["farm_id"] not in self.store.farms().id:
+            return "fazenda desconhecida"
+        if not np.isfinite(resumo["ndvi"]):
+            return "sem pixel válido"
+        return None
+
+    @staticmethod
+    def _validate(resumos):
+        """Separa os resumos gravados dos rejeitados, com o motivo"""
+        aceitos = [r for r in resumos if r["motivo"] is None]
+        rejeitados = [(r, r["motivo"]) for r in resumos if r["motivo"] is not None]
+        return aceitos, rejeitados
+
+    def _to_rows(self, resumos):
+        """Resumos de voos (de fazendas do cadastro) no esquema da série temporal (clima ausente = NaN)"""
+        fazendas = self.store.farms()
+        codes = pd.Categorical([r["farm_id"] for r in resumos], categories=fazendas.id).codes
+        n = len(resumos)
+        return pd.DataFrame({
+            "fazenda": pd.Categorical.from_codes(codes, categories=fazendas.nome),
+            "data": pd.to_datetime([r["data"] for r in resumos]),
+            "ndvi": np.array([r["ndvi"] for r in resumos], dtype=np.float32),
+            "area": fazendas.area[codes],
+            "cultura": fazendas.cultura[codes],
+            "temperatura": np.full(n, np.nan, dtype=np.float32),
+            "umidade": np.full(n, np.nan, dtype=np.float32),
+            "precipitacao": np.full(n, np.nan, dtype=np.float32)
+        })
+
+    def _commit(self, resumos):
+        """Grava um lote na série temporal, avisa os consumidores e retorna as linhas gravadas"""
+        aceitos, rejeitados = self._validate(resumos)
+        for r, motivo in rejeitados:
+            logger.warning("Voo %s de %s rejeitado: %s", r["farm_id"], r["data"].date(), motivo)
+        rows = self._to_rows(aceitos)
+        if len(rows):
+            self.store.append(rows)
+            if self.on_rows is not None:
+                self.on_rows(rows)
+        with self._lock:
+            self.processed += len(aceitos)
+            self.rejected.extend((r["farm_id"], r["data"].strftime("%Y-%m-%d"), motivo)
+                                 for r, motivo in rejeitados)
+            self.last_ingest = pd.Timestamp.now()
+            for r in resumos:
+                key = (r["farm_id"], r["data"].strftime("%Y-%m-%d"))
+                self._in_flight.discard(key)
+                self._failed.pop(key, None)
+        return rows
+
+    # Execução contínua
+
+    def _watcher(self):
+        for flight in watch(self.folder, self._stop, ignore=self._in_flight,
+                            poll_s=self.poll_s, settle_s=self.settle_s):
+            with self._lock:
+                if flight.key in self._in_flight or self._failed.get(flight.key) == flight.assinatura:
+                    continue
+                self._in_flight.add(flight.key)
+            # Bloqueia enquanto a fila estiver cheia (contrapressão)
+            while not self._stop.is_set():
+                try:
+                    self._pending.put(flight, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                flight = self._pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._results.put(self._process(flight))
+            except Exception as exc:  # voo inválido não derruba o pipeline
+                with self._lock:
+                    self.errors.append((flight, repr(exc)))
+                    # Volta a ser observado: é retentado se os arquivos forem substituídos
+                    self._in_flight.discard(flight.key)
+                    self._failed[flight.key] = flight.assinatura
+            finally:
+                self._pending.task_done()
+
+    def _sink(self):
+        lote = []
+        while not (self._stop.is_set() and self._results.empty()):
+            try:
+                lote.append(self._results.get(timeout=0.5))
+                if len(lote) < self.batch_size:
+                    continue
+            except queue.Empty:
+                if not lote:
+                    # Sem voos chegando: grava o cadastro adiado pelas rajadas
+                    self.store.flush()
+                    continue
+            self._commit(lote)
+            lote = []
+        if lote:
+            self._commit(lote)
+        self.store.flush()
+
+    def start(self):
+        """Inicia observador, workers e gravação em threads de fundo"""
+        targets = [self._watcher, self._sink] + [self._worker] * self.workers
+        self._threads = [threading.Thread(target=t, daemon=True, name=f"agrovisao-ingest-{i}")
+                         for i, t in enumerate(targets)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    # Execução única
+
+    def run_once(self):
+        """Processa os voos já presentes na pasta e retorna as linhas gravadas (cadastro incluído)"""
+        resumos = []
+        for flight in discover(self.folder, settle_s=0):
+            try:
+                resumos.append(self._process(flight))
+            except Exception as exc:
+                self.errors.append((flight, repr(exc)))
+        if not resumos:
+            return self._to_rows([])
+        rows = self._commit(resumos)
+        self.store.flush()
+        return rows
+
+
+def apply_to_views(store, engine=None, rollup=None):
+    """
+    Callback para IngestPipeline.on_rows: atualiza cadastro, alertas e KPIs
+    só das fazendas que receberam voos. Leituras com NDVI não finito (voo
+    sem nenhum pixel válido) não são dado: não alteram nenhuma das visões.
+    """
+    def on_rows(rows):
+        rows = rows[np.isfinite(rows["ndvi"].values)]
+        if len(rows) == 0:
+            return
+        fazendas = store.farms()
+        ultimas = rows.sort_values("data").groupby("fazenda", observed=True).tail(1)
+        codes = farm_codes(fazendas, ultimas["fazenda"])
+        ndvi = ultimas["ndvi"].values
+        store.update_farms(
+            codes,
+            ndvi_medio=ndvi,
+            status=np.asarray(fazendas.status.categories)[status_codes(ndvi)],
+            ultima_analise=ultimas["data"].values.astype("datetime64[D]")
+        )
+        if engine is not None:
+            engine.ingest(rows)
+        if rollup is not None:
+            rollup.update(codes, ndvi_medio=ndvi, status=status_codes(ndvi))
+
+    return on_rows
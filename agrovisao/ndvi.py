@@ -0,0 +1,262 @@
+"""
+AgrovisãoTech - Motor NDVI
+Cálculo de NDVI, NDRE e GNDVI por blocos (tiles) sobre bandas mapeadas em memória
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+TILE_SIZE = 1024
+NODATA = np.nan
+
+# Índices multiespectrais: nome -> (banda A, banda B) em (A - B) / (A + B)
+INDICES = {
+    "ndvi": ("nir", "red"),
+    "ndre": ("nir", "red_edge"),
+    "gndvi": ("nir", "green")
+}
+
+
+def open_band(path, shape=None, dtype=np.uint16):
+    """
+    Abre uma banda espectral mapeada em memória, sem carregá-la.
+
+    Arquivos .npy trazem forma e tipo no cabeçalho; arquivos raw exigem
+    `shape` (linhas, colunas) e `dtype`.
+    """
+    path = str(path)
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if shape is None:
+        raise ValueError(f"Arquivo raw {path} exige o parâmetro shape")
+    return np.memmap(path, dtype=dtype, mode='r', shape=tuple(shape))
+
+
+def create_output(path, shape, dtype=np.float32):
+    """Cria o raster de saída .npy mapeado em memória"""
+    return np.lib.format.open_memmap(str(path), mode='w+', dtype=dtype, shape=tuple(shape))
+
+
+def iter_tiles(shape, tile_size=TILE_SIZE):
+    """Percorre a cena em janelas (linhas, colunas) de até tile_size × tile_size"""
+    rows, cols = shape[:2]
+    for r0 in range(0, rows, tile_size):
+        for c0 in range(0, cols, tile_size):
+            yield (slice(r0, min(r0 + tile_size, rows)),
+                   slice(c0, min(c0 + tile_size, cols)))
+
+
+class TileBuffers:
+    """Buffers float32 pré-alocados reaproveitados entre tiles"""
+
+    def __init__(self, tile_size=TILE_SIZE, n=2):
+        self.tile_size = tile_size
+        self._buffers = [np.empty((tile_size, tile_size), dtype=np.float32) for _ in range(n)]
+
+    def views(self, shape):
+        """Retorna visões dos buffers com a forma do tile atual (tiles de borda são menores)"""
+        h, w = shape
+        return [b[:h, :w] for b in self._buffers]
+
+
+def normalized_difference(a, b, out, buffers, nodata=NODATA, band_nodata=None):
+    """
+    Calcula (a - b) / (a + b) em float32 dentro de `out`.
+
+    Pixels com soma zero, ou com `band_nodata` em qualquer banda, recebem
+    `nodata`. Não cria temporários além dos buffers informados.
+    """
+    num, den = buffers.views(out.shape)
+    np.subtract(a, b, out=num, dtype=np.float32)
+    np.add(a, b, out=den, dtype=np.float32)
+
+    invalid = den == 0
+    if band_nodata is not None:
+        invalid |= a == band_nodata
+        invalid |= b == band_nodata
+
+    np.divide(num, den, out=out, where=~invalid)
+    np.clip(out, -1, 1, out=out)
+    out[invalid] = nodata
+    return out
+
+
+def compute_ndvi(red, nir, out=None, tile_size=TILE_SIZE, nodata=NODATA, band_nodata=None):
+    """
+    Calcula o NDVI de uma cena tile a tile.
+
+    `red` e `nir` podem ser arrays ou memmaps; `out` pode ser um memmap de
+    saída (ver create_output). O pico de memória é limitado pelo tamanho do
+    tile, não da cena.
+    """
+    if red.shape != nir.shape:
+        raise ValueError(f"Bandas com formas diferentes: {red.shape} e {nir.shape}")
+    if out is None:
+        out = np.empty(red.shape, dtype=np.float32)
+
+    buffers = TileBuffers(tile_size)
+    for window in iter_tiles(red.shape, tile_size):
+        normalized_difference(
+            nir[window], red[window], out[window], buffers,
+            nodata=nodata, band_nodata=band_nodata
+        )
+    return out
+
+
+def compute_ndvi_file(red_path, nir_path, out_path, shape=None, dtype=np.uint16,
+                      tile_size=TILE_SIZE, nodata=NODATA, band_nodata=None):
+    """Calcula o NDVI de bandas em disco e grava o resultado em um .npy mapeado em memória"""
+    red = open_band(red_path, shape=shape, dtype=dtype)
+    nir = open_band(nir_path, shape=shape, dtype=dtype)
+    out = create_output(out_path, red.shape)
+    compute_ndvi(red, nir, out=out, tile_size=tile_size, nodata=nodata, band_nodata=band_nodata)
+    out.flush()
+    return out
+
+
+def sample_bands(side=50, seed=42, estresse=(0.4, 0.7)):
+    """
+    Bandas Red/NIR simuladas (uint8) com uma área de estresse no centro.
+
+    `estresse` dá o início e o fim da área como frações do lado. Com side=50
+    reproduz a amostra exibida na página de análise NDVI; a mesma semente
+    gera o mesmo fundo, então voos simulados só diferem na área de estresse.
+    """
+    rng = np.random.default_rng(seed)
+    red = rng.integers(40, 100, (side, side), dtype=np.uint8)
+    nir = rng.integers(150, 220, (side, side), dtype=np.uint8)
+
+    a, b = int(side * estresse[0]), int(side * estresse[1])
+    red[a:b, a:b] = rng.integers(100, 140, (b - a, b - a))
+    nir[a:b, a:b] = rng.integers(80, 120, (b - a, b - a))
+    return red, nir
+
+
+def sample_ndvi(seed=42, side=50):
+    """Amostra da página de análise NDVI: bandas Red/NIR simuladas e o NDVI calculado"""
+    red, nir = sample_bands(side, seed=seed)
+    return red, nir, compute_ndvi(red, nir)
+
+
+# Índices multiespectrais em passada única
+
+def available_indices(bands):
+    """Índices calculáveis com as bandas disponíveis (nomes ou dicionário banda -> arquivo)"""
+    return [index for index, par in INDICES.items() if all(band in bands for band in par)]
+
+
+def _bands_for(indices):
+    """Bandas necessárias para calcular os índices pedidos"""
+    needed = []
+    for index in indices:
+        for band in INDICES[index]:
+            if band not in needed:
+                needed.append(band)
+    return needed
+
+
+def _process_windows(bands, outputs, windows, tile_size, nodata, band_nodata):
+    """Calcula todos os índices de uma lista de tiles lendo cada banda uma única vez"""
+    needed = list(bands)
+    band_buffers = TileBuffers(tile_size, n=len(needed))
+    buffers = TileBuffers(tile_size)
+
+    for window in windows:
+        h = window[0].stop - window[0].start
+        w = window[1].stop - window[1].start
+        tiles = dict(zip(needed, band_buffers.views((h, w))))
+        for name, tile in tiles.items():
+            np.copyto(tile, bands[name][window], casting='unsafe')
+        for index, out in outputs.items():
+            a, b = INDICES[index]
+            normalized_difference(
+                tiles[a], tiles[b], out[window], buffers,
+                nodata=nodata, band_nodata=band_nodata
+            )
+
+
+def _process_windows_files(band_specs, out_paths, windows, tile_size, nodata, band_nodata):
+    """Tarefa de processo: reabre bandas e saídas mapeadas em memória e processa os tiles"""
+    bands = {name: open_band(path, shape=shape, dtype=dtype)
+             for name, (path, shape, dtype) in band_specs.items()}
+    outputs = {index: np.load(path, mmap_mode='r+') for index, path in out_paths.items()}
+    _process_windows(bands, outputs, windows, tile_size, nodata, band_nodata)
+    for out in outputs.values():
+        out.flush()
+    return len(windows)
+
+
+def _split_windows(shape, tile_size, n_chunks):
+    """Distribui os tiles em lotes intercalados para equilibrar os workers"""
+    windows = list(iter_tiles(shape, tile_size))
+    n_chunks = max(1, min(n_chunks, len(windows)))
+    return [windows[i::n_chunks] for i in range(n_chunks)]
+
+
+def compute_indices(bands, indices=tuple(INDICES), outputs=None, tile_size=TILE_SIZE,
+                    workers=None, nodata=NODATA, band_nodata=None):
+    """
+    Calcula vários índices em uma única leitura de cada tile, em paralelo.
+
+    `bands` mapeia nome da banda ("red", "green", "red_edge", "nir", ...) para
+    array ou memmap. Os tiles são distribuídos em um pool de threads; as
+    operações do NumPy liberam o GIL, então o ganho escala com os núcleos.
+    Retorna um dicionário índice -> raster float32.
+    """
+    bands = {name: bands[name] for name in _bands_for(indices)}
+    shape = next(iter(bands.values())).shape
+    for name, band in bands.items():
+        if band.shape != shape:
+            raise ValueError(f"Banda {name} com forma {band.shape}, esperado {shape}")
+
+    if outputs is None:
+        outputs = {index: np.empty(shape, dtype=np.float32) for index in indices}
+    workers = workers or os.cpu_count() or 1
+
+    chunks = _split_windows(shape, tile_size, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_process_windows, bands, outputs, chunk, tile_size, nodata, band_nodata)
+            for chunk in chunks
+        ]
+        for future in futures:
+            future.result()
+    return outputs
+
+
+def compute_indices_files(band_paths, out_dir, indices=tuple(INDICES), shape=None,
+                          dtype=np.uint16, tile_size=TILE_SIZE, workers=None,
+                          nodata=NODATA, band_nodata=None):
+    """
+    Calcula vários índices de bandas em disco usando um pool de processos.
+
+    Cada índice é gravado em `out_dir/<indice>.npy` (memmap). Os processos
+    recebem apenas caminhos e janelas; cada um reabre as bandas mapeadas em
+    memória e escreve diretamente na sua parte da saída.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    needed = _bands_for(indices)
+    first = open_band(band_paths[needed[0]], shape=shape, dtype=dtype)
+    shape = first.shape
+    band_specs = {name: (str(band_paths[name]), shape, dtype) for name in needed}
+
+    out_paths = {}
+    for index in indices:
+        out_paths[index] = os.path.join(out_dir, f"{index}.npy")
+        create_output(out_paths[index], shape).flush()
+
+    workers = workers or os.cpu_count() or 1
+    # Mais lotes que workers para equilibrar tiles de custo desigual
+    chunks = _split_windows(shape, tile_size, workers * 4)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_process_windows_files, band_specs, out_paths, chunk,
+                        tile_size, nodata, band_nodata)
+            for chunk in chunks
+        ]
+        for future in futures:
+            future.result()
+
+    return {index: np.load(path, mmap_mode='r') for index, path in out_paths.items()}
@@ -0,0 +1,164 @@
+"""
+AgrovisãoTech - Perfil de execução
+Tempo por seção e pico de memória (tracemalloc) de uma execução da página
+"""
+
+import functools
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_atual = threading.local()
+
+# O tracemalloc é global: perfis com memória o ligam e desligam por contagem
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_usuarios = 0
+_tracemalloc_nosso = False
+
+
+def _start_tracing():
+    global _tracemalloc_usuarios, _tracemalloc_nosso
+    with _tracemalloc_lock:
+        if _tracemalloc_usuarios == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_nosso = True
+        _tracemalloc_usuarios += 1
+
+
+def _stop_tracing():
+    global _tracemalloc_usuarios, _tracemalloc_nosso
+    with _tracemalloc_lock:
+        _tracemalloc_usuarios -= 1
+        if _tracemalloc_usuarios == 0 and _tracemalloc_nosso:
+            tracemalloc.stop()
+            _tracemalloc_nosso = False
+
+
+def _reset_peak():
+    # Com outro perfil medindo ao mesmo tempo, zerar o pico apagaria o dele;
+    # sem zerar, o pico da seção é um limite superior
+    with _tracemalloc_lock:
+        if _tracemalloc_usuarios == 1:
+            tracemalloc.reset_peak()
+
+
+class Profiler:
+    """
+    Acumula tempo e pico de alocação por seção.
+
+    Seções aninhadas recebem nomes com "/" (ex.: "dashboard/cards"). O pico
+    de memória só é medido com `memoria=True`, que liga o tracemalloc
+    enquanto algum perfil com memória estiver ativo (o rastreamento deixa o
+    código mais lento). O tracemalloc é do processo: o pico inclui as
+    alocações de todas as threads e, com outras sessões medindo ao mesmo
+    tempo, é um limite superior.
+    """
+
+    def __init__(self, memoria=False):
+        self.memoria = memoria
+        self.secoes = {}
+        self.inicio = time.perf_counter()
+        self.duracao_s = None
+        self.pico_mb = None
+        self._pilha = []  # [nome, alocado na entrada, maior alocação vista]
+
+    def __enter__(self):
+        if self.memoria:
+            _start_tracing()
+        self._abrir(None)
+        self._anterior = getattr(_atual, "perfil", None)
+        _atual.perfil = self
+        return self
+
+    def __exit__(self, *exc):
+        _atual.perfil = self._anterior
+        self.duracao_s = time.perf_counter() - self.inicio
+        _, inicio, maximo = self._fechar()
+        if self.memoria:
+            self.pico_mb = (maximo - inicio) / 2 ** 20
+            _stop_tracing()
+        return False
+
+    def _abrir(self, nome):
+        atual = 0
+        if self.memoria:
+            atual, pico = tracemalloc.get_traced_memory()
+            if self._pilha:
+                self._pilha[-1][2] = max(self._pilha[-1][2], pico)
+            _reset_peak()
+        self._pilha.append([nome, atual, atual])
+
+    def _fechar(self):
+        entrada = self._pilha.pop()
+        if self.memoria:
+            entrada[2] = max(entrada[2], tracemalloc.get_traced_memory()[1])
+            if self._pilha:
+                self._pilha[-1][2] = max(self._pilha[-1][2], entrada[2])
+            _reset_peak()
+        return entrada
+
+    @contextmanager
+    def section(self, nome):
+        caminho = "/".join([e[0] for e in self._pilha[1:]] + [nome])
+        self._abrir(nome)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - t0
+            _, inicio, maximo = self._fechar()
+            s = self.secoes.setdefault(caminho, {"chamadas": 0, "duracao_s": 0.0, "pico_mb": None})
+            s["chamadas"] += 1
+            s["duracao_s"] += duracao
+            if self.memoria:
+                s["pico_mb"] = max(s["pico_mb"] or 0.0, (maximo - inicio) / 2 ** 20)
+
+    def report(self, **extras):
+        """Métricas da execução como dicionário serializável em JSON"""
+        duracao = self.duracao_s
+        if duracao is None:
+            duracao = time.perf_counter() - self.inicio
+        return {
+            "duracao_s": duracao,
+            "pico_mb": self.pico_mb,
+            "pico_escopo": "processo",
+            "secoes": [{"secao": nome, **valores} for nome, valores in self.secoes.items()],
+            **extras
+        }
+
+
+@contextmanager
+def section(nome):
+    """Seção do perfil ativo na thread; sem perfil ativo não mede nada"""
+    perfil = getattr(_atual, "perfil", None)
+    if perfil is None:
+        yield
+        return
+    with perfil.section(nome):
+        yield
+
+
+def profiled(nome=None):
+    """Decorador que mede a função como uma seção do perfil ativo"""
+    def decorador(fn):
+        rotulo = nome or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_atual, "perfil", None) is None:
+                return fn(*args, **kwargs)
+            with section(rotulo):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def cache_stats(**caches):
+    """Acertos, faltas e taxa de acerto de caches com atributos hits/misses"""
+    stats = {}
+    for nome, cache in caches.items():
+        total = cache.hits + cache.misses
+        stats[nome] = {"hits": cache.hits, "misses": cache.misses,
+                       "taxa_acerto": cache.hits / total if total else None}
+    return stats
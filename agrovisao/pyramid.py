@@ -0,0 +1,152 @@
+"""
+AgrovisãoTech - Pirâmide de visualização
+Níveis de overview em potências de dois para exibir cenas grandes de NDVI
+"""
+
+import os
+
+import numpy as np
+
+from agrovisao.ndvi import TILE_SIZE, create_output, iter_tiles
+
+MIN_OVERVIEW_SIDE = 256
+
+
+def downsample2x(block):
+    """
+    Reduz um bloco pela metade com média 2×2 ignorando NaN.
+
+    Linhas/colunas ímpares na borda viram blocos parciais; blocos sem nenhum
+    valor válido resultam em NaN.
+    """
+    h, w = block.shape
+    ph, pw = h + h % 2, w + w % 2
+    padded = np.full((ph, pw), np.nan, dtype=np.float32)
+    padded[:h, :w] = block
+
+    valid = ~np.isnan(padded)
+    np.copyto(padded, 0, where=~valid)
+    sums = padded.reshape(ph // 2, 2, pw // 2, 2).sum(axis=(1, 3))
+    counts = valid.reshape(ph // 2, 2, pw // 2, 2).sum(axis=(1, 3))
+
+    out = np.full(sums.shape, np.nan, dtype=np.float32)
+    np.divide(sums, counts, out=out, where=counts > 0)
+    return out
+
+
+def overview_path(path, level):
+    """Caminho do overview `level` guardado ao lado do raster completo"""
+    stem = str(path)[:-4] if str(path).endswith('.npy') else str(path)
+    return f"{stem}.ovr{level}.npy"
+
+
+def _overview_shape(shape):
+    return ((shape[0] + 1) // 2, (shape[1] + 1) // 2)
+
+
+def overview_count(shape, min_side=MIN_OVERVIEW_SIDE):
+    """Quantos overviews build_overviews gera para um raster com esta forma"""
+    n = 0
+    while min(shape) >= 2 * min_side:
+        shape = _overview_shape(shape)
+        n += 1
+    return n
+
+
+def up_to_date(path, *sources):
+    """True se `path` existe e foi gravado depois de todos os arquivos `sources`"""
+    if not os.path.exists(path):
+        return False
+    mtime = os.stat(path).st_mtime_ns
+    return all(os.stat(source).st_mtime_ns <= mtime for source in sources)
+
+
+def build_overviews(raster, path=None, min_side=MIN_OVERVIEW_SIDE, tile_size=TILE_SIZE):
+    """
+    Constrói os níveis 1, 2, ... (1/2, 1/4, ...) até o lado menor < min_side.
+
+    Cada nível é gerado a partir do anterior, tile a tile. Com `path` os
+    níveis são gravados como memmaps ao lado do raster completo
+    (ver overview_path); sem ele ficam em memória. Retorna [nível 0, 1, ...].
+    """
+    tile_size += tile_size % 2
+    levels = [raster]
+    level = 1
+    while min(levels[-1].shape) >= 2 * min_side:
+        src = levels[-1]
+        shape = _overview_shape(src.shape)
+        if path is None:
+            dst = np.empty(shape, dtype=np.float32)
+        else:
+            dst = create_output(overview_path(path, level), shape)
+
+        for rows, cols in iter_tiles(src.shape, tile_size):
+            dst[rows.start // 2:(rows.stop + 1) // 2,
+                cols.start // 2:(cols.stop + 1) // 2] = downsample2x(src[rows, cols])
+
+        if path is not None:
+            dst.flush()
+        levels.append(dst)
+        level += 1
+    return levels
+
+
+class Pyramid:
+    """Raster NDVI completo e seus overviews, com leitura por zoom e janela"""
+
+    def __init__(self, levels):
+        self.levels = levels
+
+    @classmethod
+    def open(cls, path):
+        """Abre o raster .npy e os overviews existentes, mapeados em memória"""
+        levels = [np.load(str(path), mmap_mode='r')]
+        level = 1
+        while os.path.exists(overview_path(path, level)):
+            levels.append(np.load(overview_path(path, level), mmap_mode='r'))
+            level += 1
+        return cls(levels)
+
+    @classmethod
+    def build(cls, path, min_side=MIN_OVERVIEW_SIDE, tile_size=TILE_SIZE):
+        """Gera (uma vez por cena) os overviews de um raster .npy e abre a pirâmide"""
+        raster = np.load(str(path), mmap_mode='r')
+        build_overviews(raster, path=path, min_side=min_side, tile_size=tile_size)
+        return cls.open(path)
+
+    @classmethod
+    def open_or_build(cls, path, min_side=MIN_OVERVIEW_SIDE, tile_size=TILE_SIZE):
+        """Abre a pirâmide se todos os overviews forem mais novos que o raster; senão, gera"""
+        shape = np.load(str(path), mmap_mode='r').shape
+        if all(up_to_date(overview_path(path, level), path)
+               for level in range(1, overview_count(shape, min_side) + 1)):
+            return cls.open(path)
+        return cls.build(path, min_side=min_side, tile_size=tile_size)
+
+    @property
+    def shape(self):
+        return self.levels[0].shape
+
+    def level_for(self, window_shape, max_side):
+        """Nível mais detalhado em que a janela cabe em max_side pixels"""
+        side = max(window_shape)
+        for level in range(len(self.levels)):
+            if side / 2 ** level <= max_side:
+                return level
+        return len(self.levels) - 1
+
+    def read(self, window=None, max_side=1024):
+        """
+        Lê uma janela (linhas, colunas em coordenadas do nível 0) no nível de
+        zoom adequado, sem tocar o restante da cena. Retorna (array, nível).
+        """
+        if window is None:
+            window = (slice(0, self.shape[0]), slice(0, self.shape[1]))
+        rows, cols = window
+        r0, r1, _ = rows.indices(self.shape[0])
+        c0, c1, _ = cols.indices(self.shape[1])
+
+        level = self.level_for((r1 - r0, c1 - c0), max_side)
+        f = 2 ** level
+        data = self.levels[level][r0 // f:-(-r1 // f), c0 // f:-(-c1 // f)]
+        return np.asarray(data), level
@@ -0,0 +1,207 @@
+"""
+AgrovisãoTech - Renderização de rasters
+Mapeamento direto de bandas e NDVI para RGB via tabelas de cores (LUT)
+"""
+
+import hashlib
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# Paletas ColorBrewer usadas pelo matplotlib para os mesmos nomes
+PALETAS = {
+    "RdYlGn": ["#a50026", "#d73027", "#f46d43", "#fdae61", "#fee08b", "#ffffbf",
+               "#d9ef8b", "#a6d96a", "#66bd63", "#1a9850", "#006837"],
+    "Reds": ["#fff5f0", "#fee0d2", "#fcbba1", "#fc9272", "#fb6a4a", "#ef3b2c",
+             "#cb181d", "#a50f15", "#67000d"],
+    "Greens": ["#f7fcf5", "#e5f5e0", "#c7e9c0", "#a1d99b", "#74c476", "#41ab5d",
+               "#238b45", "#006d2c", "#00441b"]
+}
+
+NODATA_COLOR = (200, 200, 200)
+
+
+def build_lut(cores, n=256):
+    """Interpola uma paleta de cores hexadecimais em uma LUT uint8 (n, 3)"""
+    rgb = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in cores], dtype=np.float64)
+    pos = np.linspace(0, 1, len(cores))
+    x = np.linspace(0, 1, n)
+    lut = np.stack([np.interp(x, pos, rgb[:, k]) for k in range(3)], axis=1)
+    return np.round(lut).astype(np.uint8)
+
+
+LUTS = {nome: build_lut(cores) for nome, cores in PALETAS.items()}
+
+
+def apply_lut(values, lut, vmin, vmax, nodata_color=NODATA_COLOR):
+    """
+    Converte um raster em imagem RGB uint8 (H, W, 3) pela LUT.
+
+    Bandas uint8 com faixa 0-255 indexam a LUT diretamente; os demais tipos
+    são quantizados para 256 níveis. NaN recebe `nodata_color`.
+    """
+    if isinstance(lut, str):
+        lut = LUTS[lut]
+    values = np.asarray(values)
+
+    if values.dtype == np.uint8 and vmin == 0 and vmax == 255:
+        return lut[values]
+
+    # vmin == vmax (raster constante): faixa mínima em vez de divisão por zero
+    scale = (len(lut) - 1) / max(float(vmax) - float(vmin), 1e-6)
+    idx = np.subtract(values, vmin, dtype=np.float32)
+    idx *= scale
+    nodata = np.isnan(idx)
+    np.clip(idx, 0, len(lut) - 1, out=idx)
+    idx[nodata] = 0
+    rgb = lut[idx.astype(np.uint8)]
+    if nodata.any():
+        rgb[nodata] = nodata_color
+    return rgb
+
+
+def upscale(rgb, min_side=300):
+    """Amplia imagens pequenas por vizinho mais próximo para exibição nítida"""
+    factor = max(1, int(np.ceil(min_side / min(rgb.shape[:2]))))
+    if factor == 1:
+        return rgb
+    return np.repeat(np.repeat(rgb, factor, axis=0), factor, axis=1)
+
+
+def colorbar(lut, width=256, height=12):
+    """Faixa horizontal com a escala de cores da LUT"""
+    if isinstance(lut, str):
+        lut = LUTS[lut]
+    idx = np.linspace(0, len(lut) - 1, width).astype(np.intp)
+    return np.broadcast_to(lut[idx], (height, width, 3)).copy()
+
+
+def encode_png(rgb, level=6):
+    """Codifica uma imagem RGB uint8 (H, W, 3) como PNG, sem dependências externas"""
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+    h, w = rgb.shape[:2]
+    # Cada linha recebe o byte de filtro 0 (nenhum)
+    raw = np.zeros((h, w * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgb.reshape(h, w * 3)
+
+    def chunk(tipo, dados):
+        return (struct.pack(">I", len(dados)) + tipo + dados
+                + struct.pack(">I", zlib.crc32(tipo + dados) & 0xFFFFFFFF))
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), level))
+            + chunk(b"IEND", b""))
+
+
+def content_key(*arrays, **params):
+    """Chave de cache pelo conteúdo (bytes, forma e tipo) dos rasters e parâmetros"""
+    h = hashlib.blake2b(digest_size=20)
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        h.update(str((arr.shape, arr.dtype.str)).encode())
+        h.update(memoryview(arr).cast('B'))
+    h.update(repr(sorted(params.items())).encode())
+    return h.hexdigest()
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    return 64
+
+
+class RenderCache:
+    """
+    Cache LRU de imagens renderizadas, limitado pelo total de bytes.
+
+    Com `disk` (um cache.DiskCache), as faltas em memória são buscadas no
+    disco e cada imagem nova é gravada nele, valendo entre sessões e processos.
+    Um acerto no disco conta como acerto (e também em `disk_hits`); falta é
+    só a imagem que precisa ser renderizada.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk=None):
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self.nbytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key][0]
+        value = self.disk.get(key) if self.disk is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        return self._remember(key, value)
+
+    def put(self, key, value):
+        if self.disk is not None:
+            value = self.disk.put(key, value)
+        return self._remember(key, value)
+
+    def _remember(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._items:
+                self.nbytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self.nbytes -= old_size
+        return value
+
+    def get_or_render(self, key, render):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, render())
+        return value
+
+    def __len__(self):
+        return len(self._items)
+
+
+render_cache = RenderCache()
+
+
+def render_ndvi_panels(red, nir, ndvi, min_side=300, cache=render_cache):
+    """
+    Renderiza os painéis Banda Vermelha, Banda NIR e NDVI como RGB uint8.
+
+    O resultado é guardado em cache pelo hash do conteúdo dos rasters, então
+    reexecuções com os mesmos dados não renderizam de novo.
+    """
+    def render():
+        return {
+            "red": upscale(apply_lut(red, "Reds", 0, 255), min_side),
+            "nir": upscale(apply_lut(nir, "Greens", 0, 255), min_side),
+            "ndvi": upscale(apply_lut(ndvi, "RdYlGn", -1, 1), min_side)
+        }
+
+    if cache is None:
+        return render()
+    key = content_key(red, nir, ndvi, kind="ndvi_panels", min_side=min_side)
+    return cache.get_or_render(key, render)
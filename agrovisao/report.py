@@ -0,0 +1,345 @@
+"""
+AgrovisãoTech - Relatórios em lote
+Relatório por fazenda (imagem NDVI, HTML e CSVs) e resumo da carteira,
+gerados sem Streamlit em um pool de processos.
+
+Uso:
+    python -m agrovisao.report --store /dados/store --voos /dados/entrada/processados \\
+        --saida relatorios --prazo-min 60
+"""
+
+import argparse
+import html
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from agrovisao.alerts import AlertEngine
+from agrovisao.change import flight_history
+from agrovisao.ndvi import compute_ndvi, sample_bands
+from agrovisao.pyramid import Pyramid, overview_path
+from agrovisao.render import apply_lut, encode_png
+from agrovisao.rollups import KpiRollup
+from agrovisao.store import TimeSeriesStore
+from agrovisao.zones import FOCO_MIN_PIXELS, LIMIAR_ESTRESSE, analyze_scene
+
+IMAGEM_MAX_SIDE = 1024
+FOCOS_NO_HTML = 20
+
+CORES_SEVERIDADE = {"Crítico": "#F44336", "Atenção": "#FF9800", "Normal": "#2E7D32"}
+
+_stores = {}  # armazém aberto uma vez por processo
+
+
+def _store(root):
+    if root not in _stores:
+        _stores[root] = TimeSeriesStore(root)
+    return _stores[root]
+
+
+def _plain(value):
+    """Valor serializável em JSON (NaN vira None)"""
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else float(value)
+    return value
+
+
+def latest_scenes(folder):
+    """Raster NDVI mais recente de cada fazenda na pasta de voos processados"""
+    return {fazenda: voos[-1] for fazenda, voos in flight_history(folder).items()}
+
+
+def scene_image(ndvi, path=None, max_side=IMAGEM_MAX_SIDE):
+    """
+    Imagem RGB do NDVI com no máximo `max_side` pixels de lado.
+
+    Cenas em disco são reduzidas pela pirâmide de overviews (gerada na
+    primeira vez), sem carregar a resolução completa. Cenas pequenas não são
+    ampliadas: o HTML escala a imagem sem suavização.
+    """
+    if path is not None and max(ndvi.shape) > max_side:
+        pyramid = Pyramid.open(path) if os.path.exists(overview_path(path, 1)) else Pyramid.build(path)
+        ndvi, _ = pyramid.read((slice(None), slice(None)), max_side=max_side)
+    return apply_lut(ndvi, "RdYlGn", -1, 1)
+
+
+def _write_atomic(path, data, mode="w"):
+    with open(path + ".tmp", mode, **({} if "b" in mode else {"encoding": "utf-8"})) as fh:
+        fh.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def farm_report(store_root, code, alerta, cena, saida, versao, simular=False, forcar=False):
+    """
+    Gera o relatório de uma fazenda em <saida>/<id>/ e devolve a linha do resumo.
+
+    O relatório é reaproveitado quando já foi gerado para a mesma versão do
+    armazém, o mesmo voo e o mesmo `simular` (execuções noturnas só refazem
+    o que mudou).
+    """
+    fazenda = _store(store_root).farms()[code]
+    pasta = os.path.join(saida, fazenda["id"])
+    resumo_path = os.path.join(pasta, "resumo.json")
+    data_voo, cena_path = cena if cena else (None, None)
+
+    if not forcar and os.path.exists(resumo_path):
+        with open(resumo_path, encoding="utf-8") as fh:
+            anterior = json.load(fh)
+        if anterior.get("versao") == versao and anterior.get("voo") == data_voo \
+                and anterior.get("simular") == simular:
+            return {**anterior, "reaproveitado": True}
+
+    os.makedirs(pasta, exist_ok=True)
+    t0 = time.perf_counter()
+
+    # Série histórica
+    historico = _store(store_root).read(fazenda=fazenda["nome"])
+    historico.drop(columns=["fazenda", "area", "cultura"]).to_csv(
+        os.path.join(pasta, "historico.csv"), index=False, float_format="%.4f"
+    )
+
+    # Cena NDVI: último voo processado ou, com `simular`, a amostra da página NDVI
+    analise = None
+    origem = None
+    if cena_path is not None:
+        ndvi = np.load(cena_path, mmap_mode='r')
+        origem = f"voo de {data_voo}"
+    elif simular:
+        red, nir = sample_bands(50, seed=code)
+        ndvi = compute_ndvi(red, nir)
+        origem = "cena simulada"
+    if origem is not None:
+        analise = analyze_scene(ndvi, limiar=LIMIAR_ESTRESSE, min_pixels=FOCO_MIN_PIXELS)
+        _write_atomic(os.path.join(pasta, "ndvi.png"), encode_png(scene_image(ndvi, cena_path)), "wb")
+        analise["focos"].to_csv(os.path.join(pasta, "focos.csv"), index=False, float_format="%.6f")
+    else:
+        # Sem cena nesta execução: não deixa a imagem de uma execução anterior
+        for nome in ("ndvi.png", "focos.csv"):
+            try:
+                os.remove(os.path.join(pasta, nome))
+            except FileNotFoundError:
+                pass
+
+    resumo = {
+        "id": fazenda["id"],
+        "nome": fazenda["nome"],
+        "proprietario": fazenda["proprietario"],
+        "cultura": fazenda["cultura"],
+        "area": _plain(fazenda["area"]),
+        "ndvi_medio": _plain(fazenda["ndvi_medio"]),
+        "severidade": alerta["severidade"],
+        "motivos": alerta["motivos"],
+        "ndvi_atual": _plain(alerta["ndvi"]),
+        "queda": _plain(alerta["queda"]),
+        "observacoes": len(historico),
+        "voo": data_voo,
+        "origem_cena": origem,
+        "cena_ndvi_medio": _plain(analise["stats"]["mean"]) if analise else None,
+        "focos": len(analise["focos"]) if analise else None,
+        "area_estresse_ha": _plain(analise["focos"]["area_ha"].sum()) if analise else None,
+        "versao": versao,
+        "simular": simular,
+    }
+    _write_atomic(os.path.join(pasta, "relatorio.html"), _farm_html(resumo, analise))
+    resumo["duracao_s"] = time.perf_counter() - t0
+    _write_atomic(resumo_path, json.dumps(resumo, ensure_ascii=False, indent=2))
+    return {**resumo, "reaproveitado": False}
+
+
+def _fmt(value, spec=".3f"):
+    return "—" if value is None else format(value, spec)
+
+
+def _farm_html(resumo, analise):
+    e = html.escape
+    cor = CORES_SEVERIDADE.get(resumo["severidade"], "#666")
+    linhas = [
+        ("Proprietário", e(resumo["proprietario"])),
+        ("Cultura", e(resumo["cultura"])),
+        ("Área", f"{_fmt(resumo['area'], '.0f')} ha"),
+        ("NDVI atual", _fmt(resumo["ndvi_atual"])),
+        ("Queda recente", _fmt(resumo["queda"])),
+        ("Alerta", f'<span style="color: {cor};">{e(resumo["severidade"])}</span> · {e(resumo["motivos"])}'),
+        ("Observações", str(resumo["observacoes"])),
+    ]
+    corpo = "".join(f"<tr><th>{k}</th><td>{v}</td></tr>" for k, v in linhas)
+
+    cena = "<p>Sem voo processado para esta propriedade.</p>"
+    if analise is not None:
+        stats = analise["stats"]
+        focos = analise["focos"].head(FOCOS_NO_HTML)
+        cena = f"""
+        <h2>Análise NDVI ({e(resumo["origem_cena"])})</h2>
+        <img src="ndvi.png" alt="NDVI" style="width: 480px; max-width: 100%; image-rendering: pixelated;">
+        <p>Média {_fmt(stats["mean"])} · desvio {_fmt(stats["std"])} ·
+           mínimo {_fmt(stats["min"])} · máximo {_fmt(stats["max"])}</p>
+        <p>{resumo["focos"]} focos de estresse (NDVI &lt; {LIMIAR_ESTRESSE}),
+           {_fmt(resumo["area_estresse_ha"], ".4f")} ha</p>
+        {focos.to_html(index=False, float_format=lambda v: f"{v:.4f}") if len(focos) else ""}
+        """
+
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8">
+<title>{e(resumo["nome"])} - AgrovisãoTech</title>
+<style>body {{ font-family: sans-serif; margin: 2rem; }} th {{ text-align: left; padding-right: 1rem; }}
+table {{ border-collapse: collapse; }} td, th {{ border-bottom: 1px solid #ddd; padding: 4px 8px; }}</style>
+</head><body>
+<h1>🌱 {e(resumo["nome"])}</h1>
+<table>{corpo}</table>
+{cena}
+<p><a href="historico.csv">Série histórica (CSV)</a></p>
+</body></html>
+"""
+
+
+def run_batch(store_root, saida, voos=None, simular=False, workers=None, prazo_min=None,
+              forcar=False, log=print):
+    """
+    Gera os relatórios de todas as fazendas e o resumo da carteira.
+
+    Os alertas são calculados uma vez para a carteira inteira; as fazendas
+    são distribuídas ao pool em ordem de severidade (críticas primeiro) e,
+    com `prazo_min`, nenhuma fazenda nova é iniciada depois do prazo — as
+    restantes ficam listadas como pendentes no resumo.
+    """
+    inicio = time.perf_counter()
+    store_root = os.path.abspath(store_root)
+    store = _store(store_root)
+    fazendas = store.farms()
+    versao = store.version()
+    os.makedirs(saida, exist_ok=True)
+
+    engine = AlertEngine(fazendas)
+    _, fim = store.date_range()
+    if fim is not None:
+        engine.ingest(store.read(inicio=fim - pd.Timedelta(days=engine.k), fim=fim))
+    alertas = engine.alerts(fazendas)
+    cenas = latest_scenes(voos)
+
+    tarefas = [
+        (store_root, int(a.codigo),
+         {"severidade": a.severidade, "motivos": a.motivos, "ndvi": a.ndvi, "queda": a.queda},
+         cenas.get(fazendas.id[a.codigo]), saida, versao, simular, forcar)
+        for a in alertas.itertuples()
+    ]
+    prazo = inicio + prazo_min * 60 if prazo_min else None
+    workers = workers or os.cpu_count() or 1
+
+    resumos, erros = [], []
+    proxima = 0
+    passo_log = max(100, len(tarefas) // 10)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        em_andamento = {}
+        while proxima < len(tarefas) or em_andamento:
+            # Janela limitada de tarefas em voo, para respeitar o prazo
+            while proxima < len(tarefas) and len(em_andamento) < workers * 2 \
+                    and (prazo is None or time.perf_counter() < prazo):
+                em_andamento[pool.submit(farm_report, *tarefas[proxima])] = tarefas[proxima]
+                proxima += 1
+            if not em_andamento:
+                break
+            prontas, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for future in prontas:
+                tarefa = em_andamento.pop(future)
+                try:
+                    resumos.append(future.result())
+                except Exception as exc:
+                    erros.append({"id": fazendas.id[tarefa[1]], "erro": repr(exc)})
+                if log and len(resumos) % passo_log == 0:
+                    log(f"{len(resumos)}/{len(tarefas)} fazendas")
+
+    pendentes = [fazendas.id[t[1]] for t in tarefas[proxima:]]
+    carteira = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "versao": versao,
+        "fazendas": len(tarefas),
+        "gerados": sum(not r["reaproveitado"] for r in resumos),
+        "reaproveitados": sum(r["reaproveitado"] for r in resumos),
+        "erros": erros,
+        "pendentes": pendentes,
+        "alertas": engine.counts(fazendas),
+        "kpis": {k: _plain(v) if not isinstance(v, dict) else v
+                 for k, v in KpiRollup.from_farms(fazendas).summary().items()},
+        "duracao_s": time.perf_counter() - inicio,
+    }
+    write_portfolio(saida, resumos, carteira)
+    return carteira
+
+
+def write_portfolio(saida, resumos, carteira):
+    """Resumo da carteira: resumo.csv, resumo.json e index.html com links por fazenda"""
+    tabela = pd.DataFrame(resumos)
+    if len(tabela):
+        ordem = {s: i for i, s in enumerate(CORES_SEVERIDADE)}
+        tabela = tabela.sort_values(["severidade", "ndvi_atual"], key=lambda c: c.map(ordem)
+                                    if c.name == "severidade" else c, kind="stable")
+        tabela = tabela.drop(columns=["reaproveitado", "duracao_s"], errors="ignore")
+    tabela.to_csv(os.path.join(saida, "resumo.csv"), index=False, float_format="%.4f")
+    _write_atomic(os.path.join(saida, "resumo.json"), json.dumps(carteira, ensure_ascii=False, indent=2))
+
+    e = html.escape
+    kpis = carteira["kpis"]
+    linhas = "".join(
+        f'<tr><td><a href="{e(r.id)}/relatorio.html">{e(r.nome)}</a></td>'
+        f'<td>{e(str(r.cultura))}</td>'
+        f'<td style="color: {CORES_SEVERIDADE.get(r.severidade, "#666")};">{e(r.severidade)}</td>'
+        f'<td>{e(r.motivos)}</td><td>{_fmt(_plain(r.ndvi_atual))}</td>'
+        f'<td>{"—" if r.focos is None or pd.isna(r.focos) else int(r.focos)}</td></tr>'
+        for r in tabela.itertuples()
+    )
+    alertas = " · ".join(f"{n}: {q}" for n, q in carteira["alertas"].items())
+    _write_atomic(os.path.join(saida, "index.html"), f"""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>Carteira - AgrovisãoTech</title>
+<style>body {{ font-family: sans-serif; margin: 2rem; }} table {{ border-collapse: collapse; }}
+td, th {{ border-bottom: 1px solid #ddd; padding: 4px 8px; text-align: left; }}</style>
+</head><body>
+<h1>🌱 AgrovisãoTech - Resumo da Carteira</h1>
+<p>{carteira["fazendas"]} propriedades · {_fmt(kpis["total_area"], ".0f")} ha ·
+   NDVI médio {_fmt(kpis["ndvi_medio"], ".2f")} · produção estimada {_fmt(kpis["producao_estimada"], ".0f")} t</p>
+<p>Alertas — {e(alertas)}</p>
+<p>Gerado em {e(carteira["gerado_em"])} em {carteira["duracao_s"]:.1f} s
+   ({carteira["gerados"]} novos, {carteira["reaproveitados"]} reaproveitados,
+   {len(carteira["erros"])} erros, {len(carteira["pendentes"])} pendentes)</p>
+<table><tr><th>Propriedade</th><th>Cultura</th><th>Severidade</th><th>Motivos</th>
+<th>NDVI</th><th>Focos</th></tr>{linhas}</table>
+</body></html>
+""")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relatórios em lote do AgrovisãoTech")
+    parser.add_argument("--store", required=True, help="pasta do armazém da série histórica")
+    parser.add_argument("--saida", required=True, help="pasta dos relatórios")
+    parser.add_argument("--voos", help="pasta de voos processados (<fazenda>_<data>_ndvi.npy)")
+    parser.add_argument("--simular", action="store_true",
+                        help="usa a cena simulada nas fazendas sem voo processado")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--prazo-min", type=float, default=None,
+                        help="não inicia novas fazendas depois deste tempo (minutos)")
+    parser.add_argument("--forcar", action="store_true", help="refaz relatórios já atualizados")
+    args = parser.parse_args(argv)
+
+    if not TimeSeriesStore(args.store).exists():
+        parser.error(f"armazém não encontrado em {args.store}")
+
+    carteira = run_batch(args.store, args.saida, voos=args.voos, simular=args.simular,
+                         workers=args.workers, prazo_min=args.prazo_min, forcar=args.forcar)
+    print(f"{carteira['gerados']} relatórios gerados, {carteira['reaproveitados']} reaproveitados, "
+          f"{len(carteira['erros'])} erros, {len(carteira['pendentes'])} pendentes "
+          f"em {carteira['duracao_s']:.1f} s -> {os.path.join(args.saida, 'index.html')}")
+    for erro in carteira["erros"][:10]:
+        print(f"  {erro['id']}: {erro['erro']}", file=sys.stderr)
+    return 1 if carteira["erros"] or carteira["pendentes"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+AgrovisãoTech - Indicadores do dashboard
+Agregados de KPI mantidos incrementalmente por cultura e status
+"""
+
+import threading
+
+import numpy as np
+
+from agrovisao.data import CULTURAS, STATUS, FarmTable
+
+# Status que contam como alerta no dashboard
+STATUS_ATENCAO = ["Regular", "Crítica"]
+
+STATUS_CORES = {
+    "Excelente": "#2E7D32",
+    "Muito Boa": "#66BB6A",
+    "Regular": "#FF9800",
+    "Crítica": "#F44336"
+}
+
+# Limiares de NDVI das faixas de cor (Crítica < 0.3 <= Regular < 0.5 <= Muito Boa < 0.7 <= Excelente)
+NDVI_LIMIARES = [0.3, 0.5, 0.7]
+NDVI_CORES = np.array(["#F44336", "#FF9800", "#66BB6A", "#2E7D32"], dtype=object)
+
+# Produtividade média usada na estimativa de produção (t/ha)
+PRODUTIVIDADE_T_HA = 3.2
+
+
+def ndvi_colors(ndvi):
+    """Cor da faixa de NDVI de cada valor, sem laço Python"""
+    return NDVI_CORES[np.digitize(np.asarray(ndvi), NDVI_LIMIARES)]
+
+
+class KpiRollup:
+    """
+    Agregados de fazendas em um cubo cultura × status.
+
+    Guarda contagem, soma de área e soma de NDVI médio por célula; os totais e
+    os recortes por cultura saem do cubo em tempo constante. Novas análises
+    atualizam apenas as fazendas alteradas (subtrai a contribuição antiga e
+    soma a nova).
+    """
+
+    def __init__(self, area, ndvi_medio, cultura_codes, status_codes):
+        self.area = np.array(area, dtype=np.float64)
+        self.ndvi_medio = np.array(ndvi_medio, dtype=np.float64)
+        self.cultura = np.array(cultura_codes, dtype=np.int8)
+        self.status = np.array(status_codes, dtype=np.int8)
+
+        shape = (len(CULTURAS), len(STATUS))
+        cell = self._cells(slice(None))
+        size = shape[0] * shape[1]
+        self.count = np.bincount(cell, minlength=size).reshape(shape).astype(np.int64)
+        self.area_sum = np.bincount(cell, weights=self.area, minlength=size).reshape(shape)
+        self.ndvi_sum = np.bincount(cell, weights=self.ndvi_medio, minlength=size).reshape(shape)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # A trava não é serializável; cada cópia carregada ganha a sua
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_farms(cls, fazendas):
+        """Monta os agregados a partir de uma FarmTable (ou lista de registros)"""
+        if not isinstance(fazendas, FarmTable):
+            fazendas = FarmTable.from_records(fazendas)
+        return cls(fazendas.area, fazendas.ndvi_medio,
+                   fazendas.cultura.codes, fazendas.status.codes)
+
+    def __len__(self):
+        return len(self.area)
+
+    def _cells(self, idx):
+        return self.cultura[idx].astype(np.intp) * len(STATUS) + self.status[idx]
+
+    def _accumulate(self, idx, sign):
+        cell = np.unravel_index(self._cells(idx), self.count.shape)
+        np.add.at(self.count, cell, sign)
+        np.add.at(self.area_sum, cell, sign * self.area[idx])
+        np.add.at(self.ndvi_sum, cell, sign * self.ndvi_medio[idx])
+
+    def update(self, codes, ndvi_medio=None, status=None, area=None):
+        """
+        Aplica novas análises às fazendas `codes` (posições na FarmTable).
+
+        Custo O(len(codes)): só as contribuições dessas fazendas são refeitas.
+        `status` aceita nomes ou códigos de STATUS. Um código repetido fica
+        com o último valor, como em atribuições em sequência.
+        """
+        codes = np.atleast_1d(np.asarray(codes, dtype=np.intp))
+        _, ultimos = np.unique(codes[::-1], return_index=True)
+        if len(ultimos) < len(codes):
+            # Cada fazenda entra uma vez: subtrair/somar duas vezes corromperia o cubo
+            ultimos = len(codes) - 1 - ultimos
+            codes = codes[ultimos]
+            ndvi_medio, status, area = (
+                v if v is None or np.ndim(v) == 0 else np.asarray(v)[ultimos]
+                for v in (ndvi_medio, status, area)
+            )
+        with self._lock:
+            self._accumulate(codes, -1)
+            if ndvi_medio is not None:
+                self.ndvi_medio[codes] = ndvi_medio
+            if status is not None:
+                status = np.atleast_1d(status)
+                if status.dtype.kind in "OU":
+                    status = np.array([STATUS.index(s) for s in status])
+                self.status[codes] = status
+            if area is not None:
+                self.area[codes] = area
+            self._accumulate(codes, +1)
+
+    def summary(self, cultura=None):
+        """Indicadores dos cards e do gráfico de status (geral ou de uma cultura)"""
+        if cultura is None:
+            count, area, ndvi = self.count.sum(0), self.area_sum.sum(0), self.ndvi_sum.sum(0)
+        else:
+            c = CULTURAS.index(cultura)
+            count, area, ndvi = self.count[c], self.area_sum[c], self.ndvi_sum[c]
+
+        total = int(count.sum())
+        total_area = float(area.sum())
+        atencao = [STATUS.index(s) for s in STATUS_ATENCAO]
+        return {
+            "total_fazendas": total,
+            "total_area": total_area,
+            "ndvi_medio": float(ndvi.sum() / total) if total else float("nan"),
+            "fazendas_criticas": int(count[atencao].sum()),
+            "producao_estimada": total_area * PRODUTIVIDADE_T_HA,
+            "status_counts": {s: int(n) for s, n in zip(STATUS, count) if n}
+        }
+
+    def colors(self, codes=None):
+        """Cores das barras de NDVI por fazenda"""
+        values = self.ndvi_medio if codes is None else self.ndvi_medio[codes]
+        return ndvi_colors(values)
@@ -0,0 +1,175 @@
+"""
+AgrovisãoTech - Pré-cálculo em segundo plano
+Executor que calcula e renova resultados fora da execução da página; a
+interface lê o último resultado pronto e mostra sua idade
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+TTL_PADRAO_S = 300
+OCIOSO_TTLS = 3  # chaves sem pedido há mais que isso × TTL deixam de ser renovadas
+
+
+class Resultado:
+    """Último valor calculado para uma chave, com idade e versão dos dados"""
+
+    def __init__(self, valor=None, calculado_em=None, versao=None, erro=None):
+        self.valor = valor
+        self.calculado_em = calculado_em
+        self.versao = versao
+        self.erro = erro
+        self.falhou_em = time.time() if erro is not None else None
+        self.calculando = False
+
+    @property
+    def pronto(self):
+        return self.calculado_em is not None
+
+    @property
+    def idade_s(self):
+        return time.time() - self.calculado_em if self.pronto else None
+
+
+class Job:
+    def __init__(self, fn, args, kwargs, ttl_s, versao):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.ttl_s = ttl_s
+        self.versao = versao
+        self.pedido_em = time.time()  # último request() que registrou o job
+
+
+class Precomputer:
+    """
+    Pool de threads que mantém resultados pré-calculados por chave.
+
+    request() nunca recalcula na thread da página: devolve o último valor
+    pronto (mesmo que velho) e, se ele estiver vencido pelo TTL ou for de uma
+    versão anterior dos dados, agenda a renovação. Chamadas repetidas para a
+    mesma chave enquanto ela é calculada não criam tarefas duplicadas.
+
+    O job (função e argumentos) de uma chave sem pedidos há `ocioso_s`
+    segundos é descartado pela renovação periódica, com seus argumentos; o
+    último resultado continua disponível até sair do LRU.
+    """
+
+    def __init__(self, workers=2, ttl_s=TTL_PADRAO_S, max_entries=256, ocioso_s=None):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.ocioso_s = OCIOSO_TTLS * ttl_s if ocioso_s is None else ocioso_s
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agrovisao-pre")
+        self._results = OrderedDict()
+        self._jobs = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+        self.submitted = 0
+        self.served_ready = 0
+        self.served_pending = 0
+
+    def _stale(self, resultado, job):
+        if resultado.erro is not None and time.time() - resultado.falhou_em < job.ttl_s:
+            return False  # não insiste em cálculos que falharam antes do TTL
+        if not resultado.pronto:
+            return True
+        if job.versao is not None and resultado.versao != job.versao:
+            return True
+        return resultado.idade_s > job.ttl_s
+
+    def _schedule(self, key):
+        """Agenda o cálculo da chave se ainda não estiver em andamento (com o lock)"""
+        if key in self._futures:
+            return self._futures[key]
+        job = self._jobs[key]
+        resultado = self._results.setdefault(key, Resultado())
+        resultado.calculando = True
+        self.submitted += 1
+        future = self._pool.submit(self._run, key, job)
+        self._futures[key] = future
+        return future
+
+    def _run(self, key, job):
+        try:
+            valor, erro = job.fn(*job.args, **job.kwargs), None
+        except Exception as exc:  # o erro fica visível no resultado, sem derrubar o pool
+            valor, erro = None, repr(exc)
+        with self._lock:
+            anterior = self._results.get(key, Resultado())
+            if erro is None:
+                novo = Resultado(valor, time.time(), job.versao)
+            else:
+                novo = Resultado(anterior.valor, anterior.calculado_em, anterior.versao, erro)
+            self._results[key] = novo
+            self._results.move_to_end(key)
+            self._futures.pop(key, None)
+            while len(self._results) > self.max_entries:
+                velho, _ = self._results.popitem(last=False)
+                self._jobs.pop(velho, None)
+        return valor
+
+    def request(self, key, fn, *args, ttl_s=None, versao=None, wait_s=0.0, **kwargs):
+        """
+        Registra o cálculo `fn(*args, **kwargs)` sob `key` e devolve o Resultado atual.
+
+        `versao` identifica os dados de entrada: um resultado de outra versão é
+        servido como velho enquanto o novo é calculado. `wait_s` permite esperar
+        um pouco pelo primeiro valor antes de responder.
+        """
+        job = Job(fn, args, kwargs, self.ttl_s if ttl_s is None else ttl_s, versao)
+        with self._lock:
+            self._jobs[key] = job
+            resultado = self._results.get(key, Resultado())
+            future = self._schedule(key) if self._stale(resultado, job) else None
+
+        if future is not None and wait_s > 0:
+            try:
+                future.result(timeout=wait_s)
+            except Exception:
+                pass
+        resultado = self.get(key)
+        # Só pedidos contam para a taxa de acerto; consultas de get() não
+        with self._lock:
+            if resultado.pronto:
+                self.served_ready += 1
+            else:
+                self.served_pending += 1
+        return resultado
+
+    def get(self, key):
+        """Resultado atual da chave (pode ainda não estar pronto); não conta como pedido"""
+        with self._lock:
+            resultado = self._results.get(key, Resultado())
+            resultado.calculando = key in self._futures
+            return resultado
+
+    def refresh_stale(self):
+        """
+        Agenda a renovação das chaves registradas que venceram e descarta os
+        jobs sem pedido há mais de `ocioso_s` (voltam no próximo request()).
+        """
+        agora = time.time()
+        with self._lock:
+            for key, job in list(self._jobs.items()):
+                if agora - job.pedido_em > self.ocioso_s:
+                    if key not in self._futures:
+                        del self._jobs[key]
+                elif self._stale(self._results.get(key, Resultado()), job):
+                    self._schedule(key)
+
+    def start_refresher(self, interval_s=30.0):
+        """Thread que renova periodicamente os resultados vencidos"""
+        def loop():
+            while not self._stop.wait(interval_s):
+                self.refresh_stale()
+        self._refresher = threading.Thread(target=loop, daemon=True, name="agrovisao-pre-refresh")
+        self._refresher.start()
+        return self
+
+    def shutdown(self):
+        self._stop.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,147 @@
+"""
+AgrovisãoTech - Índice espacial das propriedades
+Grade regular em memória sobre as coordenadas das fazendas, com consultas por
+retângulo, raio e k vizinhos mais próximos, e agrupamento para o mapa
+"""
+
+import numpy as np
+import pandas as pd
+
+RAIO_TERRA_KM = 6371.0088
+KM_POR_GRAU = 111.32
+CELULA_GRAUS = 0.05
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distância em km entre pontos (vetorizado)"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """
+    Índice em grade: as fazendas são ordenadas pela célula que ocupam e cada
+    célula aponta para um intervalo contíguo (formato CSR). Consultas visitam
+    só as células que cruzam a região pedida.
+    """
+
+    def __init__(self, lat, lon, cell_size=CELULA_GRAUS):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell_size = cell_size
+
+        n = len(self.lat)
+        self.lat0 = self.lat.min() if n else 0.0
+        self.lon0 = self.lon.min() if n else 0.0
+        # Tamanho da grade pela mesma conta das consultas: `//` e floor(/)
+        # divergem no limite (0.5 // 0.05 == 9.0) e deixariam pontos de fora
+        row, col = self._row_col(self.lat, self.lon)
+        self.n_rows = int(row.max()) + 1 if n else 1
+        self.n_cols = int(col.max()) + 1 if n else 1
+
+        keys = row * self.n_cols + col
+        self.order = np.argsort(keys, kind="stable")
+        counts = np.bincount(keys, minlength=self.n_rows * self.n_cols)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    @classmethod
+    def from_farms(cls, fazendas, cell_size=CELULA_GRAUS):
+        """Índice sobre lat/lon de uma FarmTable; retorna posições na tabela"""
+        return cls(fazendas.lat, fazendas.lon, cell_size=cell_size)
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _row_col(self, lat, lon):
+        row = np.floor((np.asarray(lat) - self.lat0) / self.cell_size).astype(np.int64)
+        col = np.floor((np.asarray(lon) - self.lon0) / self.cell_size).astype(np.int64)
+        return row, col
+
+    def _candidates(self, r0, r1, c0, c1):
+        """Fazendas das células [r0, r1] × [c0, c1] (limitadas à grade)"""
+        r0, r1 = max(r0, 0), min(r1, self.n_rows - 1)
+        c0, c1 = max(c0, 0), min(c1, self.n_cols - 1)
+        if r0 > r1 or c0 > c1:
+            return np.empty(0, dtype=np.intp)
+        rows = np.arange(r0, r1 + 1)
+        starts = self.offsets[rows * self.n_cols + c0]
+        ends = self.offsets[rows * self.n_cols + c1 + 1]
+        # Em cada linha da grade as células c0..c1 são contíguas no CSR
+        sizes = ends - starts
+        idx = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+        return self.order[idx]
+
+    def bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Fazendas dentro do retângulo"""
+        r0, c0 = self._row_col(lat_min, lon_min)
+        r1, c1 = self._row_col(lat_max, lon_max)
+        cand = self._candidates(int(r0), int(r1), int(c0), int(c1))
+        inside = (self.lat[cand] >= lat_min) & (self.lat[cand] <= lat_max) & \
+                 (self.lon[cand] >= lon_min) & (self.lon[cand] <= lon_max)
+        return np.sort(cand[inside])
+
+    def radius(self, lat, lon, km):
+        """Fazendas a até `km` do ponto, ordenadas pela distância; retorna (índices, distâncias)"""
+        dlat = km / KM_POR_GRAU
+        dlon = km / (KM_POR_GRAU * max(np.cos(np.radians(lat)), 1e-6))
+        cand = self.bbox(lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        dist = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+        keep = dist <= km
+        order = np.argsort(dist[keep], kind="stable")
+        return cand[keep][order], dist[keep][order]
+
+    def nearest(self, lat, lon, k=5):
+        """
+        k fazendas mais próximas do ponto; retorna (índices, distâncias).
+
+        Busca em anéis de células crescentes até que o anel seguinte não possa
+        conter ninguém mais perto que o k-ésimo encontrado.
+        """
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        row, col = (int(v) for v in self._row_col(lat, lon))
+        max_ring = max(self.n_rows, self.n_cols) + abs(row) + abs(col)
+        cell_km = self.cell_size * KM_POR_GRAU * max(np.cos(np.radians(lat)), 1e-6)
+
+        ring = 0
+        while True:
+            cand = self._candidates(row - ring, row + ring, col - ring, col + ring)
+            if len(cand) >= k:
+                dist = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+                kth = np.partition(dist, k - 1)[k - 1]
+                # Qualquer ponto fora do bloco está a pelo menos `ring` células de distância
+                if kth <= ring * cell_km or ring >= max_ring:
+                    order = np.argsort(dist, kind="stable")[:k]
+                    return cand[order], dist[order]
+            elif ring >= max_ring:
+                dist = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+                order = np.argsort(dist, kind="stable")
+                return cand[order], dist[order]
+            ring += 1
+
+
+def viewport(lat, lon, zoom, width_px=1000, height_px=500):
+    """Retângulo (lat_min, lat_max, lon_min, lon_max) visível num mapa web no zoom dado"""
+    lon_span = 360.0 * width_px / 256 / 2 ** zoom
+    lat_span = lon_span * height_px / width_px * np.cos(np.radians(lat))
+    return lat - lat_span / 2, lat + lat_span / 2, lon - lon_span / 2, lon + lon_span / 2
+
+
+def cluster_points(lat, lon, values, bounds, grid=24):
+    """
+    Agrupa pontos do retângulo numa grade grid × grid (um grupo por célula
+    ocupada), com centróide, quantidade e média de `values`.
+    """
+    lat_min, lat_max, lon_min, lon_max = bounds
+    row = np.clip(((lat - lat_min) / (lat_max - lat_min) * grid).astype(np.int64), 0, grid - 1)
+    col = np.clip(((lon - lon_min) / (lon_max - lon_min) * grid).astype(np.int64), 0, grid - 1)
+    cells, inverse, count = np.unique(row * grid + col, return_inverse=True, return_counts=True)
+    return pd.DataFrame({
+        "lat": np.bincount(inverse, weights=lat) / count,
+        "lon": np.bincount(inverse, weights=lon) / count,
+        "quantidade": count,
+        "valor_medio": np.bincount(inverse, weights=values) / count
+    })
@@ -0,0 +1,425 @@
+"""
+AgrovisãoTech - Armazenamento da série temporal
+Armazém colunar local particionado por fazenda e mês (leituras filtradas) e
+por mês com todas as fazendas (leituras da carteira), com filtros empurrados
+para a leitura (só as partições necessárias são abertas)
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from agrovisao.data import CULTURAS, FarmTable, farm_codes
+
+MEDIDAS = ["ndvi", "temperatura", "umidade", "precipitacao"]
+COLUNAS = ["data"] + MEDIDAS
+COLUNAS_MES = ["fazenda"] + COLUNAS  # fazenda = código (posição no cadastro)
+PASTA_MESES = "_meses"
+CADASTRO_GRAVACAO_S = 30.0  # intervalo mínimo entre regravações do fazendas.json
+LEITURA_TENTATIVAS = 50     # releituras de uma partição trocada durante a leitura (10 ms cada)
+
+
+def _month_range(inicio, fim):
+    """Meses (datetime64[M]) entre duas datas, inclusive"""
+    return np.arange(np.datetime64(inicio, 'M'), np.datetime64(fim, 'M') + 1)
+
+
+class TimeSeriesStore:
+    """
+    Série histórica de NDVI e clima em disco.
+
+    Layout: <root>/fazendas.json com as propriedades,
+    <root>/<id da fazenda>/<AAAA-MM>/<coluna>.npy para cada partição, com as
+    linhas ordenadas por data, e <root>/_meses/<AAAA-MM>/<coluna>.npy com as
+    linhas de todas as fazendas no mês, ordenadas por (fazenda, data). A
+    mesma linha é gravada nos dois layouts: consultas de uma fazenda abrem
+    só as partições dela e as da carteira inteira abrem um arquivo por
+    coluna e mês, em vez de um por fazenda e mês.
+    """
+
+    def __init__(self, root, intervalo_gravacao=CADASTRO_GRAVACAO_S):
+        self.root = str(root)
+        self.intervalo_gravacao = intervalo_gravacao
+        self._fazendas = None
+        self._cadastro_pendente = False
+        self._gravado_em = 0.0
+        self._revisao_cadastro = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, root, fazendas, ndvi_df):
+        """
+        Cria o armazém se ainda não existir, gravando em um diretório
+        temporário e renomeando no fim; processos concorrentes não veem um
+        armazém pela metade.
+        """
+        store = cls(root)
+        if store.exists():
+            return store
+        tmp = cls(f"{root}.tmp-{os.getpid()}")
+        tmp.write(fazendas, ndvi_df)
+        try:
+            os.rename(tmp.root, store.root)
+        except OSError:
+            shutil.rmtree(tmp.root, ignore_errors=True)
+        return store
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.root, "fazendas.json"))
+
+    # Escrita
+
+    def write(self, fazendas, ndvi_df):
+        """Grava (substituindo) as propriedades e todo o histórico"""
+        if not isinstance(fazendas, FarmTable):
+            fazendas = FarmTable.from_records(fazendas)
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
+        self._write_farms(fazendas)
+        self._write_rows(fazendas, ndvi_df, merge=False)
+
+    def append(self, ndvi_df):
+        """Acrescenta linhas ao histórico, reescrevendo apenas as partições afetadas"""
+        self._write_rows(self.farms(), ndvi_df, merge=True)
+
+    def update_farms(self, codes, **colunas):
+        """
+        Atualiza atributos (ndvi_medio, status, ultima_analise, ...) de algumas fazendas.
+
+        A tabela em uso não é alterada: as colunas mudadas são copiadas e uma
+        tabela nova substitui a anterior, então quem já leu farms() em outra
+        thread continua com uma tabela consistente. O fazendas.json é
+        regravado no máximo a cada `intervalo_gravacao` segundos; flush()
+        grava as alterações pendentes.
+        """
+        with self._lock:
+            atual = self.farms()
+            novas = {c: getattr(atual, c) for c in FarmTable.COLUNAS}
+            for coluna, valores in colunas.items():
+                novas[coluna] = novas[coluna].copy()
+                novas[coluna][codes] = valores
+            self._fazendas = FarmTable(**novas)
+            self._cadastro_pendente = True
+            if time.monotonic() - self._gravado_em >= self.intervalo_gravacao:
+                self._write_farms(self._fazendas)
+
+    def flush(self):
+        """Grava as atualizações de cadastro ainda pendentes"""
+        with self._lock:
+            if self._cadastro_pendente:
+                self._write_farms(self._fazendas)
+
+    def _write_farms(self, fazendas):
+        path = os.path.join(self.root, "fazendas.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(list(fazendas), fh, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        self._fazendas = fazendas
+        self._cadastro_pendente = False
+        self._gravado_em = time.monotonic()
+        self._revisao_cadastro = os.stat(path).st_mtime_ns
+
+    def _write_rows(self, fazendas, ndvi_df, merge):
+        codes = farm_codes(fazendas, ndvi_df["fazenda"])
+        datas = ndvi_df["data"].values.astype('datetime64[D]')
+        meses = datas.astype('datetime64[M]')
+
+        order = np.lexsort((datas, codes))
+        codes, datas, meses = codes[order], datas[order], meses[order]
+        colunas = {c: ndvi_df[c].values.astype(np.float32)[order] for c in MEDIDAS}
+
+        # Fronteiras de cada partição (fazenda, mês) nas linhas ordenadas
+        quebra = np.flatnonzero((np.diff(codes) != 0) | (np.diff(meses) != np.timedelta64(0, 'M')))
+        inicios = np.concatenate(([0], quebra + 1))
+        fins = np.concatenate((quebra + 1, [len(codes)]))
+
+        for a, b in zip(inicios, fins):
+            if a == b:
+                continue
+            part = {"data": datas[a:b]}
+            part.update({c: colunas[c][a:b] for c in MEDIDAS})
+            path = self._partition_path(fazendas.id[codes[a]], meses[a])
+            antigo = self._read_partition(path) if merge else None
+            if antigo is not None:
+                part = self._merge(antigo, part)
+            self._write_partition(path, part)
+
+        self._write_months({"fazenda": codes, "data": datas, **colunas}, merge)
+
+        if len(datas):
+            self._update_meta(datas.min(), datas.max(), merge)
+
+    def _write_months(self, linhas, merge):
+        """Grava as linhas nas partições por mês (todas as fazendas), ordenadas por (fazenda, data)"""
+        meses = linhas["data"].astype('datetime64[M]')
+        order = np.lexsort((linhas["data"], linhas["fazenda"], meses))
+        meses = meses[order]
+        linhas = {c: np.asarray(linhas[c])[order] for c in COLUNAS_MES}
+
+        quebra = np.flatnonzero(np.diff(meses) != np.timedelta64(0, 'M'))
+        for a, b in zip(np.concatenate(([0], quebra + 1)), np.concatenate((quebra + 1, [len(meses)]))):
+            if a == b:
+                continue
+            part = {c: v[a:b] for c, v in linhas.items()}
+            path = self._month_path(meses[a])
+            antigo = self._read_partition(path, COLUNAS_MES) if merge else None
+            if antigo is not None:
+                part = self._merge(antigo, part)
+            self._write_partition(path, part)
+
+    @staticmethod
+    def _key(part):
+        """Chave de deduplicação e ordem: data ou, nas partições por mês, (fazenda, data)"""
+        dias = part["data"].astype(np.int64)
+        if "fazenda" not in part:
+            return dias
+        return part["fazenda"].astype(np.int64) * 2 ** 32 + dias
+
+    @classmethod
+    def _merge(cls, antigo, novo):
+        """Une partições; linhas repetidas ficam com o valor novo"""
+        chaves = np.concatenate((cls._key(novo), cls._key(antigo)))
+        _, idx = np.unique(chaves, return_index=True)
+        return {c: np.concatenate((novo[c], antigo[c]))[idx] for c in novo}
+
+    def _partition_path(self, farm_id, mes):
+        return os.path.join(self.root, str(farm_id), str(mes))
+
+    def _month_path(self, mes):
+        return os.path.join(self.root, PASTA_MESES, str(mes))
+
+    def _has_months(self):
+        return os.path.isdir(os.path.join(self.root, PASTA_MESES))
+
+    @staticmethod
+    def _write_partition(path, part):
+        tmp = path + ".tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for coluna, valores in part.items():
+            np.save(os.path.join(tmp, coluna + ".npy"), np.ascontiguousarray(valores))
+        # A partição antiga sai do caminho por rename e só é apagada depois que
+        # a nova está no lugar; a ausência dura só entre os dois renames, e o
+        # .tmp presente nesse intervalo avisa os leitores (_read_partition)
+        antigo = path + ".old"
+        if os.path.exists(antigo):
+            shutil.rmtree(antigo)
+        if os.path.exists(path):
+            os.rename(path, antigo)
+        os.replace(tmp, path)
+        shutil.rmtree(antigo, ignore_errors=True)
+
+    @staticmethod
+    def _read_partition(path, colunas=COLUNAS):
+        """
+        Colunas de uma partição, ou None se ela não existe.
+
+        Se a partição for trocada no meio da leitura (outra sessão ou processo
+        gravando), a leitura é repetida: todas as colunas precisam vir do
+        mesmo diretório, para não misturar versões.
+        """
+        for _ in range(LEITURA_TENTATIVAS):
+            try:
+                part = TimeSeriesStore._load_columns(path, colunas)
+                if part is not None:
+                    return part
+            except FileNotFoundError:
+                if not os.path.exists(path) and not os.path.exists(path + ".tmp"):
+                    return None  # não existe e não está sendo trocada
+            time.sleep(0.01)
+        if not os.path.exists(path):
+            return None  # partição nova ainda sendo gravada (ou .tmp abandonado)
+        raise OSError(f"Partição {path} trocada durante todas as tentativas de leitura")
+
+    @staticmethod
+    def _load_columns(path, colunas):
+        """Colunas lidas de uma única versão da partição, ou None se ela foi trocada no meio"""
+        # Partições mensais são pequenas: leitura direta em vez de memmap,
+        # que manteria um descritor aberto por coluna até o fim da consulta
+        if os.open not in os.supports_dir_fd:
+            # Sem dir_fd (Windows): o diretório precisa ser o mesmo antes e depois
+            antes = os.stat(path).st_ino
+            part = {c: np.load(os.path.join(path, c + ".npy")) for c in colunas}
+            return part if os.stat(path).st_ino == antes else None
+        # O descritor prende o diretório aberto: trocado e apagado no meio, a
+        # próxima coluna falha com FileNotFoundError em vez de vir da versão
+        # nova (o inode, reaproveitado pelo diretório seguinte, não basta)
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            part = {}
+            for c in colunas:
+                with open(c + ".npy", "rb", opener=lambda nome, flags: os.open(nome, flags, dir_fd=fd)) as fh:
+                    part[c] = np.load(fh)
+            return part
+        finally:
+            os.close(fd)
+
+    # Leitura
+
+    def farms(self):
+        """Cadastro de propriedades (FarmTable)"""
+        if self._fazendas is None:
+            path = os.path.join(self.root, "fazendas.json")
+            self._revisao_cadastro = os.stat(path).st_mtime_ns
+            with open(path, encoding="utf-8") as fh:
+                self._fazendas = FarmTable.from_records(json.load(fh))
+        return self._fazendas
+
+    def _meta(self):
+        path = os.path.join(self.root, "meta.json")
+        if not os.path.exists(path):
+            return {"versao": 0, "inicio": None, "fim": None}
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def _update_meta(self, inicio, fim, merge):
+        meta = self._meta() if merge else {"versao": 0, "inicio": None, "fim": None}
+        inicio, fim = str(inicio), str(fim)
+        meta["inicio"] = min(meta["inicio"] or inicio, inicio)
+        meta["fim"] = max(meta["fim"] or fim, fim)
+        meta["versao"] += 1
+        path = os.path.join(self.root, "meta.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(path + ".tmp", path)
+
+    def version(self):
+        """Contador incrementado a cada gravação (para invalidar caches de leitura)"""
+        return self._meta()["versao"]
+
+    def farms_version(self):
+        """
+        Revisão do fazendas.json de onde veio a tabela de farms().
+
+        O cadastro é regravado com atraso (ver update_farms), depois do
+        append que incrementou version(): caches derivados do cadastro
+        precisam das duas chaves para não guardar, sob a versão nova, uma
+        tabela lida antes da gravação.
+        """
+        self.farms()
+        return self._revisao_cadastro
+
+    def date_range(self):
+        """Primeira e última data gravadas"""
+        meta = self._meta()
+        if meta["inicio"] is None:
+            return None, None
+        return pd.Timestamp(meta["inicio"]), pd.Timestamp(meta["fim"])
+
+    def select_farms(self, fazenda=None, cultura=None):
+        """Códigos das fazendas que passam nos filtros de nome e cultura"""
+        fazendas = self.farms()
+        mask = np.ones(len(fazendas), dtype=bool)
+        if fazenda is not None:
+            nomes = [fazenda] if isinstance(fazenda, str) else list(fazenda)
+            mask &= np.isin(fazendas.nome, nomes)
+        if cultura is not None:
+            culturas = [cultura] if isinstance(cultura, str) else list(cultura)
+            mask &= np.isin(np.asarray(fazendas.cultura), culturas)
+        return np.flatnonzero(mask)
+
+    def read(self, fazenda=None, cultura=None, inicio=None, fim=None):
+        """
+        Lê o histórico filtrado, abrindo só as partições dos meses selecionados:
+        com filtro de fazenda, as partições de cada fazenda (intervalo de datas
+        cortado por busca binária); sem ele, as partições por mês da carteira,
+        com a cultura filtrada por máscara. Retorna o mesmo esquema compacto de
+        generate_ndvi_timeseries, com as linhas ordenadas por fazenda e data.
+        """
+        fazendas = self.farms()
+        codes = self.select_farms(fazenda, cultura)
+        inicio = np.datetime64(pd.Timestamp(inicio).date(), 'D') if inicio is not None else None
+        fim = np.datetime64(pd.Timestamp(fim).date(), 'D') if fim is not None else None
+
+        if fazenda is None and self._has_months():
+            return self._read_months(fazendas, codes if cultura is not None else None, inicio, fim)
+
+        partes, farm_codes = [], []
+        for code in codes:
+            farm_dir = os.path.join(self.root, fazendas.id[code])
+            if not os.path.isdir(farm_dir):
+                continue
+            for mes in self._months(farm_dir, inicio, fim):
+                part = self._read_partition(os.path.join(farm_dir, mes))
+                if part is None:
+                    continue
+                a = 0 if inicio is None else np.searchsorted(part["data"], inicio, 'left')
+                b = len(part["data"]) if fim is None else np.searchsorted(part["data"], fim, 'right')
+                if b > a:
+                    partes.append({c: v[a:b] for c, v in part.items()})
+                    farm_codes.append(np.full(b - a, code, dtype=np.int32))
+
+        return self._to_frame(fazendas, partes, farm_codes)
+
+    @staticmethod
+    def _months(folder, inicio, fim):
+        """Meses (AAAA-MM) de uma pasta de partições dentro do intervalo"""
+        if inicio is not None and fim is not None:
+            return [str(m) for m in _month_range(inicio, fim)]
+        # Só AAAA-MM: ignora as partições .tmp/.old de uma troca em andamento
+        meses = sorted(m for m in os.listdir(folder) if "." not in m)
+        if inicio is not None:
+            meses = [m for m in meses if np.datetime64(m, 'M') >= inicio.astype('datetime64[M]')]
+        if fim is not None:
+            meses = [m for m in meses if np.datetime64(m, 'M') <= fim.astype('datetime64[M]')]
+        return meses
+
+    def _read_months(self, fazendas, codes, inicio, fim):
+        """Leitura da carteira pelas partições por mês; `codes` None = todas as fazendas"""
+        selecionadas = None
+        if codes is not None:
+            selecionadas = np.zeros(len(fazendas), dtype=bool)
+            selecionadas[codes] = True
+
+        partes, farm_codes = [], []
+        for mes in self._months(os.path.join(self.root, PASTA_MESES), inicio, fim):
+            part = self._read_partition(self._month_path(mes), COLUNAS_MES)
+            if part is None:
+                continue
+            mask = np.ones(len(part["data"]), dtype=bool) if selecionadas is None \
+                else selecionadas[part["fazenda"]]
+            if inicio is not None:
+                mask &= part["data"] >= inicio
+            if fim is not None:
+                mask &= part["data"] <= fim
+            if not mask.all():
+                part = {c: v[mask] for c, v in part.items()}
+            if len(part["data"]):
+                farm_codes.append(part.pop("fazenda").astype(np.int32))
+                partes.append(part)
+
+        # Cada mês vem ordenado por (fazenda, data): a ordenação estável por
+        # fazenda deixa as linhas na mesma ordem da leitura por fazenda
+        return self._to_frame(fazendas, partes, farm_codes, por_fazenda=True)
+
+    @staticmethod
+    def _to_frame(fazendas, partes, farm_codes, por_fazenda=False):
+        if partes:
+            codigos = np.concatenate(farm_codes)
+            colunas = {c: np.concatenate([p[c] for p in partes]) for c in COLUNAS}
+            if por_fazenda:
+                order = np.argsort(codigos, kind="stable")
+                codigos = codigos[order]
+                colunas = {c: v[order] for c, v in colunas.items()}
+        else:
+            codigos = np.empty(0, dtype=np.int32)
+            colunas = {"data": np.empty(0, dtype='datetime64[D]')}
+            colunas.update({c: np.empty(0, dtype=np.float32) for c in MEDIDAS})
+
+        return pd.DataFrame({
+            "fazenda": pd.Categorical.from_codes(codigos, categories=fazendas.nome),
+            "data": colunas["data"].astype('datetime64[ns]'),
+            "ndvi": colunas["ndvi"],
+            "area": fazendas.area[codigos],
+            "cultura": pd.Categorical.from_codes(
+                fazendas.cultura.codes[codigos], categories=CULTURAS
+            ),
+            "temperatura": colunas["temperatura"],
+            "umidade": colunas["umidade"],
+            "precipitacao": colunas["precipitacao"]
+        })
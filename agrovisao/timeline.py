@@ -0,0 +1,133 @@
+"""
+AgrovisãoTech - Linha do tempo de NDVI
+Decimação por série no servidor e gráficos WebGL para milhões de pontos
+"""
+
+import numpy as np
+import pandas as pd
+
+TIMELINE_WIDTH_PX = 1200
+MAX_SERIES = 20
+PERCENTIS = (5, 25, 50, 75, 95)
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: escolhe n_out pontos que preservam a
+    forma de uma única série. Retorna os índices selecionados.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_decimate(df, x="data", y="ndvi", series="fazenda", max_points=TIMELINE_WIDTH_PX):
+    """
+    Reduz todas as séries de uma vez para no máximo ~max_points pontos cada,
+    mantendo mínimo e máximo de cada faixa de pixel (e as extremidades).
+
+    Vetorizado sobre o quadro inteiro: nenhuma iteração por série.
+    """
+    if len(df) == 0:
+        return df
+    codes = df[series].cat.codes.values if isinstance(df[series].dtype, pd.CategoricalDtype) \
+        else pd.factorize(df[series])[0]
+    order = np.lexsort((df[x].values, codes))
+    codes = codes[order]
+    yv = df[y].values[order]
+
+    # Posição de cada linha dentro da sua série e tamanho da série
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(codes)])
+    pos = np.arange(len(codes)) - np.repeat(starts, sizes)
+    size = np.repeat(sizes, sizes)
+
+    n_buckets = max(1, max_points // 2)
+    bucket = pos * n_buckets // size
+
+    # Ordenar por (série, faixa, valor): primeiro = mínimo, último = máximo
+    by_value = np.lexsort((yv, bucket, codes))
+    key = codes[by_value].astype(np.int64) * n_buckets + bucket[by_value]
+    first = np.r_[True, key[1:] != key[:-1]]
+    last = np.r_[key[1:] != key[:-1], True]
+    keep = np.zeros(len(codes), dtype=bool)
+    keep[by_value[first | last]] = True
+    keep[starts] = True
+    keep[starts + sizes - 1] = True
+
+    return df.iloc[order[keep]]
+
+
+def percentile_bands(df, x="data", y="ndvi", percentis=PERCENTIS):
+    """Percentis de y por data entre todas as séries (visão agregada)"""
+    grouped = df.groupby(x, observed=True)[y]
+    bands = pd.DataFrame({f"p{p}": grouped.quantile(p / 100) for p in percentis})
+    return bands.sort_index()
+
+
+def lowest_series(df, n, y="ndvi", series="fazenda"):
+    """Nomes das n séries com menor mediana de y (as que mais pedem atenção)"""
+    medianas = df.groupby(series, observed=True)[y].median()
+    return medianas.nsmallest(n).index
+
+
+def timeline_figure(df, title, width_px=TIMELINE_WIDTH_PX, max_series=MAX_SERIES, aggregate=None):
+    """
+    Monta o gráfico de evolução do NDVI com traços WebGL (Scattergl).
+
+    Com até max_series propriedades, cada série é decimada para a largura
+    em pixels; acima disso (ou com aggregate=True) mostra faixas de percentis.
+    Com aggregate=False e mais de max_series propriedades, só as max_series
+    de menor NDVI são desenhadas.
+    """
+    import plotly.graph_objects as go  # só quem monta o gráfico paga o import
+
+    n_series = df["fazenda"].nunique()
+    if aggregate is None:
+        aggregate = n_series > max_series
+
+    fig = go.Figure()
+    if aggregate:
+        bands = percentile_bands(df)
+        if len(bands) > width_px:
+            idx = lttb(bands.index.values.astype(np.int64), bands["p50"].values, width_px)
+            bands = bands.iloc[idx]
+        dates = bands.index
+        fill = [("p5", "p95", "rgba(46, 125, 50, 0.15)", "P5–P95"),
+                ("p25", "p75", "rgba(46, 125, 50, 0.30)", "P25–P75")]
+        for low, high, color, name in fill:
+            fig.add_trace(go.Scattergl(x=dates, y=bands[low], mode="lines",
+                                       line=dict(width=0), showlegend=False, hoverinfo="skip"))
+            fig.add_trace(go.Scattergl(x=dates, y=bands[high], mode="lines", line=dict(width=0),
+                                       fill="tonexty", fillcolor=color, name=name))
+        fig.add_trace(go.Scattergl(x=dates, y=bands["p50"], mode="lines",
+                                   line=dict(color="#2E7D32", width=2), name="Mediana"))
+        fig.update_layout(title=f"{title} · {n_series} propriedades (percentis)")
+    else:
+        if n_series > max_series:
+            df = df[df["fazenda"].isin(lowest_series(df, max_series))]
+            title = f"{title} · {max_series} de {n_series} propriedades (menor NDVI)"
+        reduced = minmax_decimate(df, max_points=width_px)
+        for nome, serie in reduced.groupby("fazenda", observed=True, sort=False):
+            fig.add_trace(go.Scattergl(x=serie["data"], y=serie["ndvi"], mode="lines", name=nome))
+        fig.update_layout(title=title)
+
+    fig.update_layout(xaxis_title="data", yaxis_title="ndvi", legend_title_text="fazenda")
+    return fig
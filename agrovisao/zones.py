@@ -0,0 +1,284 @@
+"""
+AgrovisãoTech - Análise espacial do NDVI
+Estatísticas da cena, focos de estresse (componentes conexas de NDVI baixo)
+e estatísticas por zona, em uma única passada por faixas de linhas
+"""
+
+import numpy as np
+import pandas as pd
+
+# Resolução do sensor multiespectral (5 cm/pixel)
+RESOLUCAO_M = 0.05
+LIMIAR_ESTRESSE = 0.3
+# Focos menores que isso (3×3 pixels) são tratados como ruído
+FOCO_MIN_PIXELS = 9
+STRIP_ROWS = 512
+
+
+def iter_strips(n_rows, strip_rows=STRIP_ROWS):
+    """Faixas de linhas [r0, r1) usadas na leitura sequencial da cena"""
+    for r0 in range(0, n_rows, strip_rows):
+        yield r0, min(r0 + strip_rows, n_rows)
+
+
+def pixel_area_ha(pixel_size_m=RESOLUCAO_M):
+    """Área de um pixel em hectares"""
+    return pixel_size_m ** 2 / 10000
+
+
+class RasterStats:
+    """Média, desvio, mínimo e máximo acumulados tile a tile (ignorando NaN)"""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        values = values.astype(np.float64)
+        self.count += values.size
+        self.sum += values.sum()
+        self.sumsq += np.dot(values, values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    def result(self):
+        if self.count == 0:
+            return {"mean": np.nan, "std": np.nan, "min": np.nan, "max": np.nan, "count": 0}
+        mean = float(self.sum / self.count)
+        var = max(float(self.sumsq / self.count) - mean ** 2, 0.0)
+        return {"mean": mean, "std": var ** 0.5, "min": float(self.min),
+                "max": float(self.max), "count": self.count}
+
+
+class ZoneStats:
+    """Estatísticas por zona acumuladas com reduções do tipo bincount"""
+
+    def __init__(self, n_zones):
+        self.n = n_zones + 1  # zona 0 = fora dos talhões
+        self.count = np.zeros(self.n, dtype=np.int64)
+        self.sum = np.zeros(self.n)
+        self.sumsq = np.zeros(self.n)
+        self.min = np.full(self.n, np.inf)
+        self.max = np.full(self.n, -np.inf)
+
+    def add(self, values, labels):
+        valid = ~np.isnan(values) & (labels > 0)
+        labels = labels[valid].astype(np.intp)
+        values = values[valid].astype(np.float64)
+        self.count += np.bincount(labels, minlength=self.n)
+        self.sum += np.bincount(labels, weights=values, minlength=self.n)
+        self.sumsq += np.bincount(labels, weights=values * values, minlength=self.n)
+        np.minimum.at(self.min, labels, values)
+        np.maximum.at(self.max, labels, values)
+
+    def result(self, pixel_size_m=RESOLUCAO_M):
+        zonas = np.arange(1, self.n)
+        count = self.count[1:]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.sum[1:] / count
+            std = np.sqrt(np.maximum(self.sumsq[1:] / count - mean ** 2, 0))
+        return pd.DataFrame({
+            "zona": zonas,
+            "pixels": count,
+            "area_ha": count * pixel_area_ha(pixel_size_m),
+            "ndvi_medio": mean,
+            "ndvi_std": std,
+            "ndvi_min": np.where(count > 0, self.min[1:], np.nan),
+            "ndvi_max": np.where(count > 0, self.max[1:], np.nan)
+        })
+
+
+def extract_runs(mask, row_offset=0):
+    """
+    Sequências horizontais de pixels True de uma faixa.
+
+    Retorna (linha, coluna inicial, coluna final exclusiva) de cada sequência,
+    ordenadas por linha e coluna.
+    """
+    h, w = mask.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    diff = np.diff(padded, axis=1)
+    start_r, start_c = np.nonzero(diff == 1)
+    _, end_c = np.nonzero(diff == -1)
+    return start_r + row_offset, start_c, end_c
+
+
+def connect_runs(rows, c0, c1, width):
+    """
+    Componentes conexas (vizinhança 4) das sequências: sequências em linhas
+    vizinhas que se sobrepõem são ligadas; os rótulos são propagados com
+    ligação ao menor rótulo e salto de ponteiros, sem laço por pixel.
+    """
+    n = len(rows)
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    # Chaves ordenadas (linha, coluna) para localizar sobreposições na linha de cima
+    stride = width + 1
+    start_key = rows * stride + c0
+    end_key = rows * stride + c1
+    prev = (rows - 1) * stride
+    lo = np.searchsorted(end_key, prev + c0, side="right")
+    hi = np.searchsorted(start_key, prev + c1, side="left")
+    n_edges = np.maximum(hi - lo, 0)
+
+    v = np.repeat(np.arange(n), n_edges)
+    u = np.repeat(lo, n_edges) + (np.arange(n_edges.sum()) - np.repeat(np.cumsum(n_edges) - n_edges, n_edges))
+
+    labels = np.arange(n)
+    while True:
+        lu, lv = labels[u], labels[v]
+        if np.array_equal(lu, lv):
+            break
+        m = np.minimum(lu, lv)
+        np.minimum.at(labels, lu, m)
+        np.minimum.at(labels, lv, m)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels
+
+
+def analyze_scene(ndvi, limiar=LIMIAR_ESTRESSE, zones=None, n_zones=None,
+                  pixel_size_m=RESOLUCAO_M, min_pixels=1, strip_rows=STRIP_ROWS,
+                  labels_out=None):
+    """
+    Analisa um raster NDVI (array ou memmap) em uma única leitura por faixas.
+
+    Calcula as estatísticas globais, localiza focos de estresse (regiões
+    conexas com NDVI < limiar) e, se `zones` (raster de rótulos de talhões,
+    0 = fora) for informado, as estatísticas por zona. Com `labels_out`
+    (array/memmap int32) grava o rótulo do foco de cada pixel.
+
+    Retorna {"stats": dict, "focos": DataFrame, "zonas": DataFrame ou None}.
+    """
+    n_rows, width = ndvi.shape
+    stats = RasterStats()
+    zone_stats = None
+    if zones is not None:
+        zone_stats = ZoneStats(int(n_zones) if n_zones is not None else int(np.max(zones)))
+
+    run_rows, run_c0, run_c1, run_sum = [], [], [], []
+    for r0, r1 in iter_strips(n_rows, strip_rows):
+        strip = np.asarray(ndvi[r0:r1], dtype=np.float32)
+        stats.add(strip)
+        if zone_stats is not None:
+            zone_stats.add(strip, np.asarray(zones[r0:r1]))
+
+        mask = strip < limiar  # NaN nunca é foco
+        rows, c0, c1 = extract_runs(mask, r0)
+        if len(rows):
+            # Soma de NDVI de cada sequência pela soma acumulada da linha
+            cs = np.zeros((r1 - r0, width + 1))
+            np.cumsum(np.where(mask, strip, 0), axis=1, out=cs[:, 1:])
+            local = rows - r0
+            run_sum.append(cs[local, c1] - cs[local, c0])
+            run_rows.append(rows)
+            run_c0.append(c0)
+            run_c1.append(c1)
+
+    focos = _summarize_components(run_rows, run_c0, run_c1, run_sum, width,
+                                  pixel_size_m, min_pixels, labels_out, n_rows, strip_rows)
+    return {
+        "stats": stats.result(),
+        "focos": focos,
+        "zonas": zone_stats.result(pixel_size_m) if zone_stats is not None else None
+    }
+
+
+def _summarize_components(run_rows, run_c0, run_c1, run_sum, width, pixel_size_m,
+                          min_pixels, labels_out, n_rows, strip_rows):
+    colunas = ["foco", "pixels", "area_ha", "ndvi_medio", "linha_min", "linha_max",
+               "coluna_min", "coluna_max", "centro_linha", "centro_coluna"]
+    if not run_rows:
+        return pd.DataFrame(columns=colunas)
+
+    rows = np.concatenate(run_rows)
+    c0 = np.concatenate(run_c0)
+    c1 = np.concatenate(run_c1)
+    sums = np.concatenate(run_sum)
+    lengths = c1 - c0
+
+    roots = connect_runs(rows, c0, c1, width)
+    comp_ids, comp = np.unique(roots, return_inverse=True)
+    n = len(comp_ids)
+
+    pixels = np.bincount(comp, weights=lengths, minlength=n)
+    ndvi_sum = np.bincount(comp, weights=sums, minlength=n)
+    row_sum = np.bincount(comp, weights=rows * lengths, minlength=n)
+    col_sum = np.bincount(comp, weights=(c0 + c1 - 1) * lengths / 2, minlength=n)
+    bbox = [np.full(n, np.iinfo(np.int64).max), np.full(n, -1),
+            np.full(n, np.iinfo(np.int64).max), np.full(n, -1)]
+    np.minimum.at(bbox[0], comp, rows)
+    np.maximum.at(bbox[1], comp, rows)
+    np.minimum.at(bbox[2], comp, c0)
+    np.maximum.at(bbox[3], comp, c1 - 1)
+
+    focos = pd.DataFrame({
+        "pixels": pixels.astype(np.int64),
+        "area_ha": pixels * pixel_area_ha(pixel_size_m),
+        "ndvi_medio": ndvi_sum / pixels,
+        "linha_min": bbox[0], "linha_max": bbox[1],
+        "coluna_min": bbox[2], "coluna_max": bbox[3],
+        "centro_linha": row_sum / pixels,
+        "centro_coluna": col_sum / pixels
+    })
+    focos = focos[focos["pixels"] >= min_pixels].sort_values("pixels", ascending=False, kind="stable")
+    focos.insert(0, "foco", np.arange(1, len(focos) + 1))
+
+    if labels_out is not None:
+        # Rótulos seguem a ordenação por tamanho; focos descartados ficam 0
+        rotulo = np.zeros(n, dtype=np.int32)
+        rotulo[focos.index.values] = focos["foco"].values
+        run_label = rotulo[comp]
+        for r0, r1 in iter_strips(n_rows, strip_rows):
+            a, b = np.searchsorted(rows, [r0, r1])
+            # Sequências de uma linha não se sobrepõem: marca início/fim e acumula
+            delta = np.zeros((r1 - r0, labels_out.shape[1] + 1), dtype=np.int64)
+            np.add.at(delta, (rows[a:b] - r0, c0[a:b]), run_label[a:b])
+            np.add.at(delta, (rows[a:b] - r0, c1[a:b]), -run_label[a:b])
+            labels_out[r0:r1] = np.cumsum(delta, axis=1)[:, :-1]
+
+    return focos.reset_index(drop=True)
+
+
+def rasterize_polygons(polygons, shape, out=None, strip_rows=STRIP_ROWS):
+    """
+    Rasteriza polígonos de talhões em um raster de rótulos (1..N, 0 = fora).
+
+    Cada polígono é uma sequência de vértices (coluna, linha) em coordenadas
+    de pixel; o teste par-ímpar é feito nos centros dos pixels, faixa a faixa.
+    """
+    if out is None:
+        out = np.zeros(shape, dtype=np.int32)
+    polygons = [np.asarray(p, dtype=np.float64) for p in polygons]
+    for r0, r1 in iter_strips(shape[0], strip_rows):
+        strip = np.zeros((r1 - r0, shape[1]), dtype=out.dtype)
+        for label, poly in enumerate(polygons, start=1):
+            x0, y0 = np.floor(poly.min(axis=0)).astype(int)
+            x1, y1 = np.ceil(poly.max(axis=0)).astype(int)
+            ra, rb = max(r0, y0), min(r1, y1 + 1)
+            ca, cb = max(0, x0), min(shape[1], x1 + 1)
+            if ra >= rb or ca >= cb:
+                continue
+            py, px = np.mgrid[ra:rb, ca:cb] + 0.5
+            inside = np.zeros(py.shape, dtype=bool)
+            xs, ys = poly[:, 0], poly[:, 1]
+            for (xa, ya), (xb, yb) in zip(zip(xs, ys), zip(np.roll(xs, -1), np.roll(ys, -1))):
+                if ya == yb:
+                    continue
+                crosses = (ya > py) != (yb > py)
+                x_cross = xa + (py - ya) * (xb - xa) / (yb - ya)
+                inside ^= crosses & (px < x_cross)
+            strip[ra - r0:rb - r0, ca:cb][inside] = label
+        out[r0:r1] = strip
+    return out
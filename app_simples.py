@@ -3,17 +3,63 @@ AgrovisãoTech - Versão Simplificada para Deploy
 Sistema de Monitoramento Agrícola em arquivo único
 """
 
+import time
+
+_INICIO_EXECUCAO = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')
-import io
-import base64
+from contextlib import nullcontext
+from datetime import datetime
+import json
+import logging
+import os
+import tempfile
+
+# Só módulos leves (NumPy) no topo; pandas, Plotly e os módulos que dependem
+# deles são importados pelas páginas que os usam
+from agrovisao.cache import CACHE_MAX_BYTES, DiskCache, code_version, default_cache_dir
+from agrovisao.ndvi import compute_ndvi, sample_bands, sample_ndvi
+from agrovisao.profiling import Profiler, cache_stats, profiled, section
+from agrovisao.pyramid import Pyramid, overview_path, up_to_date
+from agrovisao.render import (
+    RenderCache, apply_lut, colorbar, content_key, render_cache, render_ndvi_panels, upscale
+)
+from agrovisao.scheduler import Precomputer
+
+# Cena NDVI completa (.npy) exibida no visualizador com pirâmide
+CENA_NDVI = os.environ.get("AGROVISAO_CENA_NDVI")
+VIEWER_MAX_SIDE = 1024
+
+# Armazém local da série histórica (particionado por fazenda e mês)
+STORE_DIR = os.environ.get(
+    "AGROVISAO_STORE", os.path.join(tempfile.gettempdir(), "agrovisao_store")
+)
+
+# Pasta observada para novos voos (bandas <fazenda>_<AAAA-MM-DD>_<banda>.npy)
+PASTA_ENTRADA = os.environ.get("AGROVISAO_ENTRADA")
+INGESTAO_INTERVALO_S = 10
+
+# Cache em disco compartilhado por sessões e processos do usuário (arrays, imagens, KPIs)
+CACHE_DIR = os.environ.get("AGROVISAO_CACHE", default_cache_dir())
+CACHE_MAX_MB = int(os.environ.get("AGROVISAO_CACHE_MB", CACHE_MAX_BYTES // 2 ** 20))
+
+# Comparação entre voos: escala de cores da variação de NDVI e área de
+# estresse do voo anterior simulado (a amostra atual usa 0.4-0.7)
+DELTA_ESCALA = 0.5
+ESTRESSE_VOO_ANTERIOR = (0.5, 0.6)
+
+# Pré-cálculo em segundo plano
+PRECALCULO_WORKERS = 2
+RESPOSTA_MAX_S = 0.3  # espera máxima pelo primeiro cálculo antes de responder
+
+# Orçamento de tempo por execução do script; a primeira do processo inclui
+# os imports das bibliotecas da página (partida a frio). Os imports do topo
+# do script são medidos pelo caso app_import de agrovisao.bench
+ORCAMENTO_EXECUCAO_S = float(os.environ.get("AGROVISAO_ORCAMENTO_S", 3.0))
+PAGINAS_COM_DADOS = ("🏠 Dashboard Executivo", "🚨 Central de Alertas", "🗺️ Mapa das Propriedades")
+
+logger = logging.getLogger("agrovisao")
 
 # Configuração da página
 st.set_page_config(
@@ -73,272 +119,497 @@ st.markdown("""
 
 # Função para gerar dados de exemplo
 @st.cache_data
-def generate_sample_data():
+def generate_sample_data(seed=None):
     """Gera dados de exemplo para demonstração"""
-    
-    fazendas = [
-        {
-            "id": "fazenda_001",
-            "nome": "Fazenda São João",
-            "area": 520.5,
-            "cultura": "Soja",
-            "coordenadas": [-15.7801, -47.9292],
-            "ndvi_medio": 0.78,
-            "status": "Excelente",
-            "ultima_analise": "2024-01-15",
-            "proprietario": "João Silva",
-            "variedade": "Soja BRS 360"
-        },
-        {
-            "id": "fazenda_002", 
-            "nome": "Sítio Esperança",
-            "area": 280.3,
-            "cultura": "Milho",
-            "coordenadas": [-15.7901, -47.9392],
-            "ndvi_medio": 0.65,
-            "status": "Muito Boa",
-            "ultima_analise": "2024-01-14",
-            "proprietario": "Maria Santos",
-            "variedade": "Milho AG 7098"
-        },
-        {
-            "id": "fazenda_003",
-            "nome": "Fazenda Vista Verde",
-            "area": 750.0,
-            "cultura": "Soja",
-            "coordenadas": [-15.7701, -47.9192],
-            "ndvi_medio": 0.42,
-            "status": "Regular",
-            "ultima_analise": "2024-01-13",
-            "proprietario": "Carlos Oliveira",
-            "variedade": "Soja TMG 7262"
-        },
-        {
-            "id": "fazenda_004",
-            "nome": "Agro Futuro",
-            "area": 1200.0,
-            "cultura": "Milho",
-            "coordenadas": [-15.7601, -47.9092],
-            "ndvi_medio": 0.25,
-            "status": "Crítica",
-            "ultima_analise": "2024-01-12",
-            "proprietario": "José Ferreira",
-            "variedade": "Milho DKB 390"
-        }
-    ]
-    
-    # Dados históricos de NDVI
-    dates = pd.date_range(start='2024-01-01', end='2024-01-15', freq='D')
-    ndvi_data = []
-    
-    for fazenda in fazendas:
-        base_ndvi = fazenda["ndvi_medio"]
-        for i, date in enumerate(dates):
-            seasonal_effect = 0.1 * np.sin(2 * np.pi * i / len(dates))
-            random_variation = np.random.normal(0, 0.03)
-            ndvi_value = max(0, min(1, base_ndvi + seasonal_effect + random_variation))
-            
-            ndvi_data.append({
-                "fazenda": fazenda["nome"],
-                "data": date,
-                "ndvi": ndvi_value,
-                "area": fazenda["area"],
-                "cultura": fazenda["cultura"],
-                "temperatura": np.random.uniform(20, 35),
-                "umidade": np.random.uniform(40, 80),
-                "precipitacao": np.random.exponential(2) if np.random.random() > 0.7 else 0
-            })
-    
-    return fazendas, pd.DataFrame(ndvi_data)
+    from agrovisao.data import demo_data
+    return demo_data(seed)
+
+@st.cache_resource
+def get_store():
+    """Abre o armazém da série histórica, criando-o com os dados de exemplo na primeira vez"""
+    from agrovisao.store import TimeSeriesStore
+    store = TimeSeriesStore(STORE_DIR)
+    if not store.exists():
+        fazendas, ndvi_df = generate_sample_data()
+        store = TimeSeriesStore.create(STORE_DIR, fazendas, ndvi_df)
+    return store
+
+@st.cache_resource
+def get_disk_cache():
+    """Cache em disco; o conteúdo sobrevive a reinícios do servidor"""
+    # A versão inclui este arquivo, onde ficam os geradores das amostras em cache
+    return DiskCache(CACHE_DIR, max_bytes=CACHE_MAX_MB * 2 ** 20, versao=code_version(__file__))
+
+@st.cache_resource
+def get_render_cache():
+    """Imagens renderizadas: LRU em memória sobre o cache em disco"""
+    return RenderCache(disk=get_disk_cache())
+
+@profiled("load_history")
+@st.cache_data(max_entries=32)
+def load_history(versao, inicio, fim, fazenda=None, cultura=None):
+    """Leitura filtrada do armazém; `versao` invalida o cache a cada gravação"""
+    return get_store().read(fazenda=fazenda, cultura=cultura, inicio=inicio, fim=fim)
+
+@profiled("load_analytics")
+@st.cache_data(max_entries=32)
+def load_analytics(versao, inicio, fim, fazenda=None, cultura=None, metodo="savgol"):
+    """Suavização, anomalias e produção estimada do recorte, de todas as fazendas de uma vez"""
+    from agrovisao.analytics import analyze_series
+    store = get_store()
+    fazendas = store.farms().take(store.select_farms(fazenda=fazenda, cultura=cultura))
+    return analyze_series(load_history(versao, inicio, fim, fazenda=fazenda, cultura=cultura), fazendas,
+                          metodo=metodo)
+
+@st.cache_resource
+def get_rollup():
+    """Agregados de KPI da carteira, compartilhados entre sessões"""
+    from agrovisao.rollups import KpiRollup
+    store = get_store()
+    key = content_key(kind="kpi_rollup", store=STORE_DIR, versao=store.version(),
+                      cadastro=store.farms_version())
+    return get_disk_cache().get_or_compute(key, lambda: KpiRollup.from_farms(store.farms()))
+
+@st.cache_resource
+def get_alert_engine():
+    """Motor de alertas carregado com as observações recentes do armazém"""
+    import pandas as pd
+    from agrovisao.alerts import AlertEngine
+    store = get_store()
+
+    def build():
+        engine = AlertEngine(store.farms())
+        _, fim = store.date_range()
+        engine.ingest(store.read(inicio=fim - pd.Timedelta(days=engine.k), fim=fim))
+        return engine
+
+    key = content_key(kind="alert_engine", store=STORE_DIR, versao=store.version(),
+                      cadastro=store.farms_version())
+    return get_disk_cache().get_or_compute(key, build)
+
+@st.cache_resource
+def get_spatial_index():
+    """Índice espacial sobre as coordenadas de todas as propriedades"""
+    from agrovisao.spatial import GridIndex
+    return GridIndex.from_farms(get_store().farms())
+
+@st.cache_resource
+def get_ingest_pipeline():
+    """Pipeline de ingestão em segundo plano (um por processo)"""
+    from agrovisao.ingest import IngestPipeline, apply_to_views
+    store = get_store()
+    pipeline = IngestPipeline(
+        PASTA_ENTRADA,
+        store,
+        on_rows=apply_to_views(store, engine=get_alert_engine(), rollup=get_rollup())
+    )
+    return pipeline.start()
+
+@st.fragment(run_every=INGESTAO_INTERVALO_S)
+def show_ingest_status(versao_exibida):
+    """Status da ingestão; reexecuta a página quando chegam dados novos"""
+    pipeline = get_ingest_pipeline()
+    st.caption(
+        f"📥 {pipeline.processed} voos processados"
+        + (f" · último em {pipeline.last_ingest:%d/%m %H:%M}" if pipeline.last_ingest else "")
+    )
+    if pipeline.errors:
+        st.caption(f"⚠️ {len(pipeline.errors)} voos com erro")
+    if pipeline.rejected:
+        st.caption(f"🚫 {len(pipeline.rejected)} voos rejeitados (fazenda desconhecida ou sem dados)")
+    if get_store().version() != versao_exibida:
+        st.rerun()
+
+@st.cache_resource
+def get_precomputer():
+    """Executor de pré-cálculo compartilhado por todas as sessões do processo"""
+    pre = Precomputer(workers=PRECALCULO_WORKERS)
+    # Página NDVI pronta antes do primeiro acesso
+    pre.request(("ndvi_amostra",), compute_ndvi_view, disk=get_disk_cache(),
+                cache=get_render_cache())
+    return pre.start_refresher()
+
+@st.fragment(run_every=1)
+def wait_for_result(key):
+    """Reexecuta a página assim que o resultado em segundo plano ficar pronto"""
+    if get_precomputer().get(key).pronto:
+        st.rerun()
+
+def background_result(key, fn, *args, versao=None, **kwargs):
+    """Lê o último resultado pré-calculado, mostrando sua idade ou o cálculo em andamento"""
+    resultado = get_precomputer().request(
+        key, fn, *args, versao=versao, wait_s=RESPOSTA_MAX_S, **kwargs
+    )
+    if resultado.pronto:
+        idade = f"🕒 Atualizado há {resultado.idade_s:.0f} s"
+        if resultado.calculando:
+            idade += " · atualizando em segundo plano…"
+        st.caption(idade)
+    elif resultado.erro:
+        st.error(f"Falha no cálculo: {resultado.erro}")
+    else:
+        st.info("⏳ Calculando em segundo plano…")
+        wait_for_result(key)
+    return resultado
 
 # Função para criar imagem NDVI simulada
-def create_ndvi_sample():
-    """Cria amostra visual de NDVI"""
-    
-    # Gerar dados simulados
-    red_band = np.random.randint(40, 100, (50, 50), dtype=np.uint8)
-    nir_band = np.random.randint(150, 220, (50, 50), dtype=np.uint8)
-    
-    # Adicionar área com problema
-    red_band[20:35, 20:35] = np.random.randint(100, 140, (15, 15))
-    nir_band[20:35, 20:35] = np.random.randint(80, 120, (15, 15))
-    
-    # Calcular NDVI
-    ndvi = (nir_band.astype(float) - red_band.astype(float)) / (nir_band.astype(float) + red_band.astype(float))
-    ndvi = np.clip(ndvi, -1, 1)
-    
-    # Criar visualização
-    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
-    
-    # Banda Vermelha
-    im1 = axes[0].imshow(red_band, cmap='Reds', vmin=0, vmax=255)
-    axes[0].set_title('Banda Vermelha (Red)', fontweight='bold')
-    axes[0].axis('off')
-    plt.colorbar(im1, ax=axes[0], fraction=0.046)
-    
-    # Banda NIR
-    im2 = axes[1].imshow(nir_band, cmap='Greens', vmin=0, vmax=255)
-    axes[1].set_title('Banda Infravermelho (NIR)', fontweight='bold')
-    axes[1].axis('off')
-    plt.colorbar(im2, ax=axes[1], fraction=0.046)
-    
-    # NDVI
-    im3 = axes[2].imshow(ndvi, cmap='RdYlGn', vmin=-1, vmax=1)
-    axes[2].set_title('NDVI Calculado', fontweight='bold')
-    axes[2].axis('off')
-    plt.colorbar(im3, ax=axes[2], fraction=0.046)
-    
-    plt.suptitle('AgrovisãoTech - Análise Multiespectral', fontsize=16, fontweight='bold')
-    plt.tight_layout()
-    
-    # Converter para exibição no Streamlit
-    img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-    img_buffer.seek(0)
-    plt.close()
-    
-    return img_buffer, ndvi
-
-def show_dashboard(fazendas, ndvi_df):
+@profiled()
+def create_ndvi_sample(seed=42):
+    """Cria amostra de bandas multiespectrais e o NDVI calculado"""
+    return sample_ndvi(seed)
+
+DASHBOARD_MAX_BARRAS = 30
+# Opções de suavização da evolução temporal -> `metodo` de analyze_series
+SUAVIZACOES = {"Savitzky-Golay": "savgol", "Média móvel": "media", "Nenhuma": None}
+
+@profiled("dashboard")
+def show_dashboard(fazendas, ndvi_df, rollup=None, cultura=None, consulta=None, analise=None):
     """Exibe dashboard principal"""
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from agrovisao.analytics import analyze_series
+    from agrovisao.rollups import STATUS_CORES, KpiRollup, ndvi_colors
+    from agrovisao.timeline import MAX_SERIES, timeline_figure
+    
     st.header("📊 Dashboard Executivo - AgrovisãoTech")
     
     # Métricas principais
     col1, col2, col3, col4, col5 = st.columns(5)
     
-    total_fazendas = len(fazendas)
-    total_area = sum(f["area"] for f in fazendas)
-    ndvi_medio_geral = np.mean([f["ndvi_medio"] for f in fazendas])
-    fazendas_criticas = len([f for f in fazendas if f["status"] in ["Regular", "Crítica"]])
-    producao_estimada = total_area * 3.2
-    
-    with col1:
-        st.markdown(f"""
-        <div class="metric-card">
-            <h3 style="color: #2E7D32; margin: 0;">🏭 Propriedades</h3>
-            <h2 style="margin: 5px 0;">{total_fazendas}</h2>
-            <p style="color: #666; margin: 0;">Fazendas monitoradas</p>
-        </div>
-        """, unsafe_allow_html=True)
+    with section("kpis"):
+        if rollup is None:
+            rollup = KpiRollup.from_farms(fazendas)
+        kpis = rollup.summary(cultura=cultura)
     
-    with col2:
-        st.markdown(f"""
-        <div class="metric-card">
-            <h3 style="color: #2E7D32; margin: 0;">📏 Área Total</h3>
-            <h2 style="margin: 5px 0;">{total_area:.0f} ha</h2>
-            <p style="color: #666; margin: 0;">Hectares monitorados</p>
-        </div>
-        """, unsafe_allow_html=True)
+    with section("analise"):
+        if analise is None:
+            analise = analyze_series(ndvi_df, fazendas)
     
-    with col3:
-        st.markdown(f"""
-        <div class="metric-card">
-            <h3 style="color: #2E7D32; margin: 0;">🌿 NDVI Médio</h3>
-            <h2 style="margin: 5px 0;">{ndvi_medio_geral:.2f}</h2>
-            <p style="color: #666; margin: 0;">Índice de saúde</p>
-        </div>
-        """, unsafe_allow_html=True)
+    total_fazendas = kpis["total_fazendas"]
+    total_area = kpis["total_area"]
+    ndvi_medio_geral = kpis["ndvi_medio"]
+    fazendas_criticas = kpis["fazendas_criticas"]
+    producao_estimada = analise["producao_estimada"]
     
-    with col4:
-        alert_color = "#F44336" if fazendas_criticas > 0 else "#2E7D32"
-        st.markdown(f"""
-        <div class="metric-card">
-            <h3 style="color: {alert_color}; margin: 0;">⚠️ Alertas</h3>
-            <h2 style="margin: 5px 0; color: {alert_color};">{fazendas_criticas}</h2>
-            <p style="color: #666; margin: 0;">Áreas com atenção</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col5:
-        st.markdown(f"""
-        <div class="metric-card">
-            <h3 style="color: #2E7D32; margin: 0;">📈 Produção Est.</h3>
-            <h2 style="margin: 5px 0;">{producao_estimada:.0f} t</h2>
-            <p style="color: #666; margin: 0;">Toneladas estimadas</p>
-        </div>
-        """, unsafe_allow_html=True)
+    with section("cards"):
+        with col1:
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3 style="color: #2E7D32; margin: 0;">🏭 Propriedades</h3>
+                <h2 style="margin: 5px 0;">{total_fazendas}</h2>
+                <p style="color: #666; margin: 0;">Fazendas monitoradas</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col2:
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3 style="color: #2E7D32; margin: 0;">📏 Área Total</h3>
+                <h2 style="margin: 5px 0;">{total_area:.0f} ha</h2>
+                <p style="color: #666; margin: 0;">Hectares monitorados</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col3:
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3 style="color: #2E7D32; margin: 0;">🌿 NDVI Médio</h3>
+                <h2 style="margin: 5px 0;">{ndvi_medio_geral:.2f}</h2>
+                <p style="color: #666; margin: 0;">Índice de saúde</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col4:
+            alert_color = "#F44336" if fazendas_criticas > 0 else "#2E7D32"
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3 style="color: {alert_color}; margin: 0;">⚠️ Alertas</h3>
+                <h2 style="margin: 5px 0; color: {alert_color};">{fazendas_criticas}</h2>
+                <p style="color: #666; margin: 0;">Áreas com atenção · {analise["fazendas_anomalas"]} com anomalia recente</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col5:
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3 style="color: #2E7D32; margin: 0;">📈 Produção Est.</h3>
+                <h2 style="margin: 5px 0;">{producao_estimada:.0f} t</h2>
+                <p style="color: #666; margin: 0;">Pela integral do NDVI</p>
+            </div>
+            """, unsafe_allow_html=True)
     
     # Gráficos
     col1, col2 = st.columns(2)
     
     with col1:
         # Status das fazendas
-        status_counts = {}
-        for fazenda in fazendas:
-            status = fazenda["status"]
-            status_counts[status] = status_counts.get(status, 0) + 1
+        status_counts = kpis["status_counts"]
         
-        fig_pie = px.pie(
-            values=list(status_counts.values()),
-            names=list(status_counts.keys()),
-            title="📊 Distribuição de Status das Propriedades",
-            color_discrete_map={
-                "Excelente": "#2E7D32",
-                "Muito Boa": "#66BB6A",
-                "Regular": "#FF9800",
-                "Crítica": "#F44336"
-            }
-        )
-        st.plotly_chart(fig_pie, use_container_width=True)
+        with section("plotly"):
+            fig_pie = px.pie(
+                values=list(status_counts.values()),
+                names=list(status_counts.keys()),
+                title="📊 Distribuição de Status das Propriedades",
+                color_discrete_map=STATUS_CORES
+            )
+            # A serialização da figura acontece no plotly_chart
+            st.plotly_chart(fig_pie, use_container_width=True)
     
     with col2:
-        # NDVI por fazenda
-        fazenda_names = [f["nome"] for f in fazendas]
-        ndvi_values = [f["ndvi_medio"] for f in fazendas]
-        colors = []
-        for ndvi in ndvi_values:
-            if ndvi >= 0.7: colors.append("#2E7D32")
-            elif ndvi >= 0.5: colors.append("#66BB6A")
-            elif ndvi >= 0.3: colors.append("#FF9800")
-            else: colors.append("#F44336")
+        # NDVI por fazenda; em carteiras grandes, só as de menor NDVI
+        titulo_barras = "🌿 NDVI Médio por Propriedade"
+        fazenda_names = fazendas.nome
+        ndvi_values = fazendas.ndvi_medio
+        if len(fazendas) > DASHBOARD_MAX_BARRAS:
+            menores = np.argsort(ndvi_values, kind="stable")[:DASHBOARD_MAX_BARRAS]
+            fazenda_names, ndvi_values = fazenda_names[menores], ndvi_values[menores]
+            titulo_barras += f" · {DASHBOARD_MAX_BARRAS} de {len(fazendas)} (menor NDVI)"
+        colors = ndvi_colors(ndvi_values)
         
-        fig_bar = go.Figure(data=[
-            go.Bar(x=fazenda_names, y=ndvi_values, marker_color=colors)
-        ])
-        fig_bar.update_layout(
-            title="🌿 NDVI Médio por Propriedade",
-            xaxis_title="Propriedades",
-            yaxis_title="NDVI",
-            yaxis=dict(range=[0, 1])
-        )
-        st.plotly_chart(fig_bar, use_container_width=True)
+        with section("plotly"):
+            fig_bar = go.Figure(data=[
+                go.Bar(x=fazenda_names, y=ndvi_values, marker_color=colors)
+            ])
+            fig_bar.update_layout(
+                title=titulo_barras,
+                xaxis_title="Propriedades",
+                yaxis_title="NDVI",
+                yaxis=dict(range=[0, 1])
+            )
+            st.plotly_chart(fig_bar, use_container_width=True)
     
     # Evolução temporal
     st.subheader("📈 Evolução Temporal do NDVI")
-    fig_timeline = px.line(
-        ndvi_df, 
-        x='data', 
-        y='ndvi',
-        color='fazenda',
-        title="Monitoramento Contínuo - Últimos 15 dias"
+    modo = st.radio(
+        "Visualização:",
+        ["Automática", "Por propriedade", "Faixa de percentis"],
+        horizontal=True
     )
-    st.plotly_chart(fig_timeline, use_container_width=True)
+    aggregate = {"Automática": None, "Por propriedade": False, "Faixa de percentis": True}[modo]
+    if aggregate is False and len(fazendas) > MAX_SERIES:
+        st.caption(f"Mostrando as {MAX_SERIES} propriedades com menor NDVI de {len(fazendas)}; "
+                   "use a faixa de percentis para ver a carteira inteira.")
+    suavizacao = st.radio("Suavização:", list(SUAVIZACOES), horizontal=True)
+    metodo = SUAVIZACOES[suavizacao]
+    
+    if consulta is None:
+        if metodo is None:
+            serie = ndvi_df
+        else:
+            suave = analise if metodo == "savgol" else analyze_series(ndvi_df, fazendas, metodo=metodo)
+            serie = ndvi_df.assign(ndvi=suave["ndvi_suave"])
+        with section("timeline"):
+            fig_timeline = timeline_figure(serie, title="Monitoramento Contínuo", aggregate=aggregate)
+    else:
+        # Figura montada em segundo plano; a versão dos dados invalida a anterior.
+        # O job guarda só versão e filtros e relê a série, em vez de prender o quadro
+        versao, filtros = consulta
+        with section("timeline"):
+            resultado = background_result(
+                ("timeline", filtros, modo, metodo), compute_timeline,
+                versao, filtros, metodo, aggregate, versao=versao
+            )
+        if not resultado.pronto:
+            return
+        fig_timeline = resultado.valor
+    with section("plotly"):
+        st.plotly_chart(fig_timeline, use_container_width=True)
 
+def compute_timeline(versao, filtros, metodo, aggregate):
+    """
+    Figura da evolução temporal do recorte (fazenda, cultura, início, fim), lido do armazém.
+
+    `metodo` é o de analyze_series ("savgol" ou "media"); None mostra a série bruta.
+    """
+    from agrovisao.timeline import timeline_figure
+    
+    fazenda, cultura, inicio, fim = filtros
+    serie = load_history(versao, inicio, fim, fazenda=fazenda, cultura=cultura)
+    if metodo is not None:
+        analise = load_analytics(versao, inicio, fim, fazenda=fazenda, cultura=cultura, metodo=metodo)
+        serie = serie.assign(ndvi=analise["ndvi_suave"])
+    return timeline_figure(serie, title="Monitoramento Contínuo", aggregate=aggregate)
+
+@profiled()
+def compute_ndvi_view(seed=42, disk=None, cache=render_cache):
+    """
+    Amostra NDVI renderizada e analisada (estatísticas e focos em uma passada).
+
+    Com `disk`, bandas e NDVI voltam do disco mapeados em memória e a análise
+    só é refeita quando o conteúdo do NDVI muda.
+    """
+    from agrovisao.zones import FOCO_MIN_PIXELS, LIMIAR_ESTRESSE, analyze_scene
+    
+    if disk is None:
+        red_band, nir_band, ndvi = create_ndvi_sample(seed)
+        analise = analyze_scene(ndvi, limiar=LIMIAR_ESTRESSE, min_pixels=FOCO_MIN_PIXELS)
+    else:
+        bandas = disk.get_or_compute(
+            content_key(kind="ndvi_amostra", seed=seed),
+            lambda: dict(zip(("red", "nir", "ndvi"), create_ndvi_sample(seed)))
+        )
+        red_band, nir_band, ndvi = bandas["red"], bandas["nir"], bandas["ndvi"]
+        analise = disk.get_or_compute(
+            content_key(ndvi, kind="ndvi_analise", limiar=LIMIAR_ESTRESSE,
+                        min_pixels=FOCO_MIN_PIXELS),
+            lambda: analyze_scene(ndvi, limiar=LIMIAR_ESTRESSE, min_pixels=FOCO_MIN_PIXELS)
+        )
+    return {
+        "panels": render_ndvi_panels(red_band, nir_band, ndvi, cache=cache),
+        "analise": analise
+    }
+
+@profiled()
+def compute_change_view(seed=42, antes_path=None, depois_path=None, out_path=None):
+    """
+    Variação de NDVI entre dois voos: rasters em disco (últimos voos de uma
+    fazenda) ou, sem caminhos, a amostra atual contra um voo anterior simulado
+    dividido em quatro talhões. O raster de variação e seus overviews só são
+    regravados se algum dos voos for mais novo que eles.
+    """
+    from agrovisao.change import detect_change, detect_change_files
+    from agrovisao.zones import rasterize_polygons
+    
+    if antes_path is not None:
+        if up_to_date(out_path, antes_path, depois_path):
+            resultado = detect_change_files(antes_path, depois_path)  # só a análise
+        else:
+            resultado = detect_change_files(antes_path, depois_path, out_path)
+        ndvi_delta, _ = Pyramid.open_or_build(out_path).read(
+            (slice(None), slice(None)), max_side=VIEWER_MAX_SIDE
+        )
+    else:
+        antes = compute_ndvi(*sample_bands(50, seed=seed, estresse=ESTRESSE_VOO_ANTERIOR))
+        _, _, depois = create_ndvi_sample(seed)
+        talhoes = rasterize_polygons(
+            [[(0, 0), (25, 0), (25, 25), (0, 25)], [(25, 0), (50, 0), (50, 25), (25, 25)],
+             [(0, 25), (25, 25), (25, 50), (0, 50)], [(25, 25), (50, 25), (50, 50), (25, 50)]],
+            depois.shape
+        )
+        ndvi_delta = np.empty(depois.shape, dtype=np.float32)
+        resultado = detect_change(antes, depois, out=ndvi_delta, zones=talhoes, n_zones=4)
+    resultado["imagem"] = upscale(apply_lut(ndvi_delta, "RdYlGn", -DELTA_ESCALA, DELTA_ESCALA))
+    return resultado
+
+def show_change_detection():
+    """Variação de NDVI desde o voo anterior: imagem, talhões e regiões com maior perda"""
+    from agrovisao.change import LIMIAR_QUEDA, flight_history
+    from agrovisao.ingest import PASTA_PROCESSADOS
+    
+    st.markdown("### 📉 Mudança Desde o Voo Anterior")
+    
+    pasta_voos = os.path.join(PASTA_ENTRADA, PASTA_PROCESSADOS) if PASTA_ENTRADA else None
+    voos = {f: v for f, v in flight_history(pasta_voos).items() if len(v) >= 2}
+    if voos:
+        fazenda = st.selectbox("Propriedade com voos comparáveis:", sorted(voos))
+        (data_antes, antes_path), (data_depois, depois_path) = voos[fazenda][-2:]
+        out_path = os.path.join(pasta_voos, f"{fazenda}_{data_depois}_delta.npy")
+        legenda = f"{fazenda}: voo de {data_antes} → voo de {data_depois}"
+        # Voos processados não mudam: o resultado só é refeito se um deles for
+        # substituído (versão pelos mtimes), nunca por idade
+        versao = tuple(os.stat(p).st_mtime_ns for p in (antes_path, depois_path))
+        with section("mudanca"):
+            resultado = background_result(
+                ("mudanca", fazenda, data_antes, data_depois), compute_change_view,
+                versao=versao, ttl_s=float("inf"),
+                antes_path=antes_path, depois_path=depois_path, out_path=out_path
+            )
+    else:
+        legenda = "Amostra simulada: voo anterior → voo atual"
+        with section("mudanca"):
+            resultado = background_result(("mudanca_amostra",), compute_change_view)
+    if not resultado.pronto:
+        return
+    mudanca = resultado.valor
+    
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.image(mudanca["imagem"], caption=legenda, use_column_width=True)
+        st.image(colorbar("RdYlGn"), caption=f"-{DELTA_ESCALA} — +{DELTA_ESCALA} (variação de NDVI)",
+                 use_column_width=True)
+    with col2:
+        stats = mudanca["stats"]
+        regioes = mudanca["regioes"]
+        st.markdown(f"""
+        <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; border: 1px solid #dee2e6;">
+            <h4 style="color: #2E7D32;">📊 Variação do NDVI</h4>
+            <p><strong>Variação média:</strong> {stats["mean"]:+.3f}</p>
+            <p><strong>Maior queda:</strong> {stats["min"]:+.3f}</p>
+            <p><strong>Regiões em queda:</strong> {len(regioes)} (variação &lt; {LIMIAR_QUEDA})</p>
+        </div>
+        """, unsafe_allow_html=True)
+        if mudanca["zonas"] is not None:
+            st.dataframe(
+                mudanca["zonas"][["zona", "area_ha", "delta_medio", "delta_min", "delta_max"]],
+                hide_index=True,
+                use_container_width=True,
+                column_config={"area_ha": st.column_config.NumberColumn("área (ha)", format="%.6f")}
+            )
+    
+    if len(regioes):
+        st.markdown("#### 🔻 Regiões com Maior Perda")
+        st.dataframe(
+            regioes[["regiao", "pixels", "area_ha", "delta_medio", "linha_min", "linha_max",
+                     "coluna_min", "coluna_max"]],
+            hide_index=True,
+            use_container_width=True,
+            column_config={"area_ha": st.column_config.NumberColumn("área (ha)", format="%.6f")}
+        )
+
+@profiled("ndvi")
 def show_ndvi_analysis():
     """Exibe análise visual do NDVI"""
+    from agrovisao.zones import LIMIAR_ESTRESSE
+    
     st.header("🔬 Análise Visual NDVI")
     st.markdown("### Comparativo: Imagens Multiespectrais ↔️ Interpretação")
     
-    # Gerar imagem NDVI
-    img_buffer, ndvi = create_ndvi_sample()
+    # Imagem NDVI e análise pré-calculadas em segundo plano
+    with section("calculo"):
+        resultado = background_result(("ndvi_amostra",), compute_ndvi_view, disk=get_disk_cache(),
+                                      cache=get_render_cache())
+    if not resultado.pronto:
+        return
+    panels = resultado.valor["panels"]
+    analise = resultado.valor["analise"]
     
-    # Exibir imagem
-    st.image(img_buffer, use_column_width=True)
+    # Exibir imagens
+    st.markdown("#### AgrovisãoTech - Análise Multiespectral")
+    col_red, col_nir, col_ndvi = st.columns(3)
+    
+    with col_red:
+        st.markdown("**Banda Vermelha (Red)**")
+        st.image(panels["red"], use_column_width=True)
+        st.image(colorbar("Reds"), caption="0 — 255", use_column_width=True)
+    
+    with col_nir:
+        st.markdown("**Banda Infravermelho (NIR)**")
+        st.image(panels["nir"], use_column_width=True)
+        st.image(colorbar("Greens"), caption="0 — 255", use_column_width=True)
+    
+    with col_ndvi:
+        st.markdown("**NDVI Calculado**")
+        st.image(panels["ndvi"], use_column_width=True)
+        st.image(colorbar("RdYlGn"), caption="-1 — 1", use_column_width=True)
     
     # Interpretação
     col1, col2 = st.columns(2)
     
+    stats = analise["stats"]
+    focos = analise["focos"]
+    
     with col1:
-        ndvi_mean = np.mean(ndvi)
-        ndvi_std = np.std(ndvi)
+        ndvi_mean = stats["mean"]
+        ndvi_std = stats["std"]
         
         st.markdown(f"""
         <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; border: 1px solid #dee2e6;">
             <h4 style="color: #2E7D32;">📊 Análise Técnica</h4>
             <p><strong>NDVI Médio:</strong> {ndvi_mean:.3f}</p>
             <p><strong>Desvio Padrão:</strong> {ndvi_std:.3f}</p>
-            <p><strong>Mínimo:</strong> {np.min(ndvi):.3f}</p>
-            <p><strong>Máximo:</strong> {np.max(ndvi):.3f}</p>
+            <p><strong>Mínimo:</strong> {stats["min"]:.3f}</p>
+            <p><strong>Máximo:</strong> {stats["max"]:.3f}</p>
+            <p><strong>Focos de estresse:</strong> {len(focos)} (NDVI &lt; {LIMIAR_ESTRESSE})</p>
         </div>
         """, unsafe_allow_html=True)
     
@@ -370,63 +641,239 @@ def show_ndvi_analysis():
         
         for rec in recommendations:
             st.write(f"- {rec}")
+    
+    # Focos de estresse
+    if len(focos):
+        st.markdown("### 🎯 Focos de Estresse")
+        st.dataframe(
+            focos[["foco", "pixels", "area_ha", "ndvi_medio", "linha_min", "linha_max",
+                   "coluna_min", "coluna_max"]].head(20),
+            hide_index=True,
+            use_container_width=True,
+            column_config={"area_ha": st.column_config.NumberColumn("área (ha)", format="%.6f")}
+        )
+    
+    # Comparação com o voo anterior
+    show_change_detection()
+    
+    # Cena completa do voo (quando configurada)
+    if CENA_NDVI and os.path.exists(CENA_NDVI):
+        show_scene_viewer(CENA_NDVI)
 
-def show_alerts(fazendas):
-    """Exibe sistema de alertas"""
-    st.header("🚨 Central de Alertas")
+@st.cache_resource
+def load_scene_pyramid(path):
+    """Abre a pirâmide da cena, gerando os overviews na primeira vez"""
+    if not os.path.exists(overview_path(path, 1)):
+        return Pyramid.build(path)
+    return Pyramid.open(path)
+
+def show_scene_viewer(path):
+    """Exibe a cena NDVI completa no nível de zoom e janela selecionados"""
+    st.markdown("### 🗺️ Cena Completa do Voo")
     
-    # Categorizar alertas
-    alertas_criticos = []
-    alertas_atencao = []
-    alertas_info = []
+    pyramid = load_scene_pyramid(path)
+    rows, cols = pyramid.shape
     
-    for fazenda in fazendas:
-        if fazenda["status"] == "Crítica":
-            alertas_criticos.append(fazenda)
-        elif fazenda["status"] == "Regular":
-            alertas_atencao.append(fazenda)
-        else:
-            alertas_info.append(fazenda)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        zoom = st.select_slider("Zoom:", options=[2 ** k for k in range(len(pyramid.levels) + 3)])
+    with col2:
+        centro_x = st.slider("Posição horizontal (%)", 0, 100, 50)
+    with col3:
+        centro_y = st.slider("Posição vertical (%)", 0, 100, 50)
     
-    # Alertas críticos
-    if alertas_criticos:
-        st.markdown("### 🚨 Alertas Críticos")
-        for fazenda in alertas_criticos:
-            st.markdown(f"""
+    # Janela em coordenadas da resolução completa
+    altura, largura = max(1, rows // zoom), max(1, cols // zoom)
+    r0 = min(max(0, rows * centro_y // 100 - altura // 2), rows - altura)
+    c0 = min(max(0, cols * centro_x // 100 - largura // 2), cols - largura)
+    
+    ndvi, level = pyramid.read((slice(r0, r0 + altura), slice(c0, c0 + largura)), max_side=VIEWER_MAX_SIDE)
+    st.image(apply_lut(ndvi, "RdYlGn", -1, 1), use_column_width=True)
+    st.caption(
+        f"Nível {level} (1:{2 ** level}) · janela {altura}×{largura} px de {rows}×{cols} px"
+    )
+
+ALERTAS_POR_PAGINA = [10, 25, 50]
+
+def render_alert_card(alerta):
+    """Card HTML de um alerta"""
+    from agrovisao.alerts import ATENCAO, CRITICO
+    
+    if alerta.nivel == CRITICO:
+        return f"""
             <div class="alert-card" style="border-left-color: #F44336;">
-                <h4 style="color: #F44336; margin: 0;">⚠️ {fazenda['nome']}</h4>
-                <p><strong>Problema:</strong> NDVI crítico ({fazenda['ndvi_medio']:.2f})</p>
+                <h4 style="color: #F44336; margin: 0;">⚠️ {alerta.fazenda}</h4>
+                <p><strong>Problema:</strong> {alerta.motivos} (NDVI {alerta.ndvi:.2f})</p>
                 <p><strong>Ação:</strong> Intervenção imediata necessária</p>
-                <p><strong>Proprietário:</strong> {fazenda['proprietario']}</p>
+                <p><strong>Proprietário:</strong> {alerta.proprietario}</p>
             </div>
-            """, unsafe_allow_html=True)
-    
-    # Alertas de atenção
-    if alertas_atencao:
-        st.markdown("### ⚠️ Alertas de Atenção")
-        for fazenda in alertas_atencao:
-            st.markdown(f"""
+            """
+    if alerta.nivel == ATENCAO:
+        return f"""
             <div class="alert-card">
-                <h4 style="color: #FF9800; margin: 0;">⚡ {fazenda['nome']}</h4>
-                <p><strong>Problema:</strong> NDVI abaixo do ideal ({fazenda['ndvi_medio']:.2f})</p>
+                <h4 style="color: #FF9800; margin: 0;">⚡ {alerta.fazenda}</h4>
+                <p><strong>Problema:</strong> {alerta.motivos} (NDVI {alerta.ndvi:.2f})</p>
                 <p><strong>Ação:</strong> Monitoramento intensivo</p>
-                <p><strong>Proprietário:</strong> {fazenda['proprietario']}</p>
+                <p><strong>Proprietário:</strong> {alerta.proprietario}</p>
             </div>
-            """, unsafe_allow_html=True)
-    
-    # Status normal
-    if alertas_info:
-        st.markdown("### ✅ Status Normal")
-        for fazenda in alertas_info:
-            st.markdown(f"""
+            """
+    return f"""
             <div class="success-card">
-                <h4 style="color: #2E7D32; margin: 0;">✅ {fazenda['nome']}</h4>
+                <h4 style="color: #2E7D32; margin: 0;">✅ {alerta.fazenda}</h4>
                 <p><strong>Status:</strong> Condições adequadas</p>
-                <p><strong>NDVI:</strong> {fazenda['ndvi_medio']:.2f}</p>
-                <p><strong>Proprietário:</strong> {fazenda['proprietario']}</p>
+                <p><strong>NDVI:</strong> {alerta.ndvi:.2f}</p>
+                <p><strong>Proprietário:</strong> {alerta.proprietario}</p>
+            </div>
+            """
+
+@profiled("alertas")
+def show_alerts(fazendas, engine):
+    """Exibe sistema de alertas"""
+    from agrovisao.alerts import ATENCAO, CRITICO, NORMAL
+    
+    st.header("🚨 Central de Alertas")
+    
+    # Contagem por severidade (níveis calculados pelo motor de regras)
+    with section("contagem"):
+        contagem = engine.counts(fazendas)
+    col1, col2, col3 = st.columns(3)
+    for col, nivel, cor in zip(
+        (col1, col2, col3),
+        ("Crítico", "Atenção", "Normal"),
+        ("#F44336", "#FF9800", "#2E7D32")
+    ):
+        with col:
+            st.markdown(f"""
+            <div class="metric-card" style="border-left-color: {cor};">
+                <h3 style="color: {cor}; margin: 0;">{nivel}</h3>
+                <h2 style="margin: 5px 0;">{contagem[nivel]}</h2>
             </div>
             """, unsafe_allow_html=True)
+    
+    # Filtro e paginação
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        severidades = st.multiselect(
+            "Severidade:", ["Crítico", "Atenção", "Normal"], default=["Crítico", "Atenção", "Normal"]
+        )
+    with col2:
+        por_pagina = st.selectbox("Alertas por página:", ALERTAS_POR_PAGINA)
+    
+    with section("motor"):
+        alertas = engine.alerts(fazendas)
+        alertas = alertas[alertas["severidade"].isin(severidades)]
+    
+    total_paginas = max(1, -(-len(alertas) // por_pagina))
+    pagina = st.number_input(
+        "Página:", min_value=1, max_value=total_paginas, value=1, step=1,
+        key=f"pagina_alertas_{por_pagina}_{'_'.join(severidades)}"
+    )
+    st.caption(f"{len(alertas)} alertas · página {pagina} de {total_paginas}")
+    
+    # Só os cards da página visível são montados
+    inicio = (pagina - 1) * por_pagina
+    nivel_atual = None
+    with section("cards"):
+        for alerta in alertas.iloc[inicio:inicio + por_pagina].itertuples():
+            if alerta.nivel != nivel_atual:
+                nivel_atual = alerta.nivel
+                st.markdown({
+                    CRITICO: "### 🚨 Alertas Críticos",
+                    ATENCAO: "### ⚠️ Alertas de Atenção",
+                    NORMAL: "### ✅ Status Normal"
+                }[nivel_atual])
+            st.markdown(render_alert_card(alerta), unsafe_allow_html=True)
+    
+    # Tabela completa (rolagem virtualizada no navegador)
+    with st.expander("📋 Tabela de alertas"):
+        st.dataframe(
+            alertas[["fazenda", "severidade", "ndvi", "queda", "motivos", "proprietario"]],
+            hide_index=True,
+            use_container_width=True
+        )
 
+MAPA_MAX_PONTOS = 500
+
+@profiled("mapa")
+def show_map(fazendas, index):
+    """Exibe o mapa das propriedades visíveis, agrupadas quando são muitas"""
+    import pandas as pd
+    import plotly.graph_objects as go
+    from agrovisao.data import farm_codes
+    from agrovisao.rollups import ndvi_colors
+    from agrovisao.spatial import cluster_points, viewport
+    
+    st.header("🗺️ Mapa das Propriedades")
+    
+    todas = get_store().farms()
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        centro = st.selectbox("Centralizar em:", ["Todas as propriedades"] + list(fazendas.nome))
+    with col2:
+        zoom = st.slider("Zoom:", 4, 16, 10)
+    
+    if centro == "Todas as propriedades":
+        lat, lon = float(np.mean(fazendas.lat)), float(np.mean(fazendas.lon))
+    else:
+        i = fazendas.index_of(centro)
+        lat, lon = float(fazendas.lat[i]), float(fazendas.lon[i])
+    
+    # Só as propriedades dentro da área visível (e nos filtros) são consultadas
+    bounds = viewport(lat, lon, zoom)
+    visiveis = index.bbox(*bounds)
+    filtradas = farm_codes(todas, pd.Series(fazendas.nome))
+    visiveis = visiveis[np.isin(visiveis, filtradas)]
+    
+    if len(visiveis) > MAPA_MAX_PONTOS:
+        grupos = cluster_points(
+            todas.lat[visiveis].astype(float), todas.lon[visiveis].astype(float),
+            todas.ndvi_medio[visiveis].astype(float), bounds
+        )
+        trace = go.Scattermap(
+            lat=grupos["lat"], lon=grupos["lon"], mode="markers+text",
+            marker=dict(size=np.clip(8 + 4 * np.log2(grupos["quantidade"]), 8, 40),
+                        color=ndvi_colors(grupos["valor_medio"]), opacity=0.8),
+            text=grupos["quantidade"].astype(str),
+            hovertext=[f"{q} propriedades · NDVI médio {v:.2f}"
+                       for q, v in zip(grupos["quantidade"], grupos["valor_medio"])],
+            hoverinfo="text"
+        )
+        legenda = f"{len(visiveis)} propriedades visíveis em {len(grupos)} grupos"
+    else:
+        trace = go.Scattermap(
+            lat=todas.lat[visiveis], lon=todas.lon[visiveis], mode="markers",
+            marker=dict(size=12, color=ndvi_colors(todas.ndvi_medio[visiveis])),
+            hovertext=[f"{n} · NDVI {v:.2f}"
+                       for n, v in zip(todas.nome[visiveis], todas.ndvi_medio[visiveis])],
+            hoverinfo="text"
+        )
+        legenda = f"{len(visiveis)} propriedades visíveis"
+    
+    fig_map = go.Figure(trace)
+    fig_map.update_layout(
+        map=dict(style="open-street-map", center=dict(lat=lat, lon=lon), zoom=zoom),
+        height=500,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    st.plotly_chart(fig_map, use_container_width=True)
+    st.caption(legenda)
+    
+    # Vizinhança do ponto central
+    st.markdown("### 📍 Propriedades mais próximas do centro")
+    vizinhas, distancias = index.nearest(lat, lon, k=6)
+    st.dataframe(
+        pd.DataFrame({
+            "Propriedade": todas.nome[vizinhas],
+            "Cultura": np.asarray(todas.cultura)[vizinhas],
+            "NDVI": todas.ndvi_medio[vizinhas],
+            "Distância (km)": np.round(distancias, 2)
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+
+@profiled("drones")
 def show_drone_specs():
     """Exibe especificações dos drones"""
     st.header("🛰️ Especificações dos Drones")
@@ -472,6 +919,126 @@ def show_drone_specs():
     </div>
     """, unsafe_allow_html=True)
 
+def show_profile(perfil, pagina):
+    """Painel com as métricas da execução e exportação em JSON"""
+    pre = get_precomputer()
+    atendidos = pre.served_ready + pre.served_pending
+    relatorio = perfil.report(
+        pagina=pagina,
+        execucao_s=time.perf_counter() - _INICIO_EXECUCAO,
+        caches={
+            **cache_stats(render=get_render_cache(), disco=get_disk_cache()),
+            "precalculo": {
+                "submetidos": pre.submitted,
+                "prontos": pre.served_ready,
+                "pendentes": pre.served_pending,
+                "taxa_acerto": pre.served_ready / atendidos if atendidos else None
+            }
+        }
+    )
+    exportado = json.dumps(relatorio, ensure_ascii=False)
+    logger.info("perfil %s", exportado)
+    
+    with st.expander("⏱️ Perfil desta execução", expanded=True):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Página", f"{relatorio['duracao_s'] * 1e3:.0f} ms")
+        col2.metric("Script completo", f"{relatorio['execucao_s'] * 1e3:.0f} ms")
+        col3.metric("Pico de memória (processo)",
+                    "—" if relatorio["pico_mb"] is None else f"{relatorio['pico_mb']:.1f} MB")
+        
+        st.markdown("**Seções**")
+        st.dataframe(
+            [{"Seção": s["secao"], "Chamadas": s["chamadas"],
+              "Tempo (ms)": round(s["duracao_s"] * 1e3, 2),
+              "Pico do processo (MB)": None if s["pico_mb"] is None else round(s["pico_mb"], 2)}
+             for s in sorted(relatorio["secoes"], key=lambda s: -s["duracao_s"])],
+            hide_index=True,
+            use_container_width=True
+        )
+        
+        st.markdown("**Caches**")
+        st.dataframe(
+            [{"Cache": nome, "Acertos": c.get("hits", c.get("prontos")),
+              "Faltas": c.get("misses", c.get("pendentes")),
+              "Taxa de acerto": "—" if c["taxa_acerto"] is None else f"{c['taxa_acerto']:.0%}"}
+             for nome, c in relatorio["caches"].items()],
+            hide_index=True,
+            use_container_width=True
+        )
+        
+        st.download_button(
+            "📥 Exportar métricas (JSON)",
+            data=exportado,
+            file_name=f"perfil_{datetime.now():%Y%m%d_%H%M%S}.json",
+            mime="application/json"
+        )
+
+def show_data_page(selected_menu):
+    """Filtros da barra lateral e páginas que leem o armazém"""
+    with section("armazem"):
+        store = get_store()
+        todas_fazendas = store.farms()
+    
+    # Filtros
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🔍 Filtros")
+    
+    fazenda_selecionada = st.sidebar.selectbox(
+        "Propriedade:",
+        ["Todas"] + list(todas_fazendas.nome)
+    )
+    
+    cultura_selecionada = st.sidebar.selectbox(
+        "Cultura:", 
+        ["Todas", "Soja", "Milho"]
+    )
+    
+    data_min, data_max = store.date_range()
+    periodo = st.sidebar.date_input(
+        "Período:",
+        value=(data_min, data_max),
+        min_value=data_min,
+        max_value=data_max
+    )
+    inicio, fim = periodo if len(periodo) == 2 else (data_min, data_max)
+    
+    # Aplicar filtros na leitura (só as partições selecionadas são lidas)
+    filtros = dict(
+        fazenda=None if fazenda_selecionada == "Todas" else fazenda_selecionada,
+        cultura=None if cultura_selecionada == "Todas" else cultura_selecionada
+    )
+    with section("filtros"):
+        versao = store.version()
+        fazendas = todas_fazendas.take(store.select_farms(**filtros))
+    
+    # Ingestão contínua de voos
+    if PASTA_ENTRADA:
+        with st.sidebar:
+            show_ingest_status(versao)
+    
+    # Renderizar conteúdo baseado na seleção
+    if len(fazendas) == 0:
+        st.info("Nenhuma propriedade encontrada para os filtros selecionados.")
+    elif selected_menu == "🏠 Dashboard Executivo":
+        # Série histórica lida só pelo dashboard
+        ndvi_df = load_history(versao, inicio, fim, **filtros)
+        analise = load_analytics(versao, inicio, fim, **filtros)
+        consulta = (versao, (filtros["fazenda"], filtros["cultura"], inicio, fim))
+        if filtros["fazenda"] is None:
+            # Agregados mantidos para toda a carteira, recortados pela cultura
+            show_dashboard(fazendas, ndvi_df, rollup=get_rollup(), cultura=filtros["cultura"],
+                           consulta=consulta, analise=analise)
+        else:
+            show_dashboard(fazendas, ndvi_df, consulta=consulta, analise=analise)
+    elif selected_menu == "🚨 Central de Alertas":
+        with section("get_alert_engine"):
+            engine = get_alert_engine()
+        show_alerts(fazendas, engine)
+    elif selected_menu == "🗺️ Mapa das Propriedades":
+        with section("get_spatial_index"):
+            index = get_spatial_index()
+        show_map(fazendas, index)
+
 def main():
     """Função principal do aplicativo"""
     
@@ -493,9 +1060,6 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Gerar dados
-    fazendas, ndvi_df = generate_sample_data()
-    
     # Sidebar
     st.sidebar.title("🎛️ Painel de Controle AgrovisãoTech")
     st.sidebar.markdown("---")
@@ -504,24 +1068,27 @@ def main():
         "🏠 Dashboard Executivo",
         "🔬 Análise NDVI Visual",
         "🚨 Central de Alertas",
+        "🗺️ Mapa das Propriedades",
         "🛰️ Especificações Drones"
     ]
     
     selected_menu = st.sidebar.selectbox("Navegação:", menu_options)
     
-    # Filtros
-    st.sidebar.markdown("---")
-    st.sidebar.subheader("🔍 Filtros")
-    
-    fazenda_selecionada = st.sidebar.selectbox(
-        "Propriedade:",
-        ["Todas"] + [f["nome"] for f in fazendas]
+    # Perfil de desempenho desta execução (tempo por seção, caches, memória)
+    perfil_ativo = st.sidebar.toggle("⏱️ Perfil de desempenho")
+    medir_memoria = perfil_ativo and st.sidebar.checkbox(
+        "Medir pico de memória (processo; deixa a execução mais lenta)", value=False
     )
+    perfil = Profiler(memoria=medir_memoria) if perfil_ativo else nullcontext()
     
-    cultura_selecionada = st.sidebar.selectbox(
-        "Cultura:", 
-        ["Todas", "Soja", "Milho"]
-    )
+    with perfil:
+        # Armazém e filtros só nas páginas que exibem dados das propriedades
+        if selected_menu in PAGINAS_COM_DADOS:
+            show_data_page(selected_menu)
+        elif selected_menu == "🔬 Análise NDVI Visual":
+            show_ndvi_analysis()
+        elif selected_menu == "🛰️ Especificações Drones":
+            show_drone_specs()
     
     # Informações do sistema
     st.sidebar.markdown("---")
@@ -539,16 +1106,6 @@ def main():
     - Cases de sucesso validados
     """)
     
-    # Renderizar conteúdo baseado na seleção
-    if selected_menu == "🏠 Dashboard Executivo":
-        show_dashboard(fazendas, ndvi_df)
-    elif selected_menu == "🔬 Análise NDVI Visual":
-        show_ndvi_analysis()
-    elif selected_menu == "🚨 Central de Alertas":
-        show_alerts(fazendas)
-    elif selected_menu == "🛰️ Especificações Drones":
-        show_drone_specs()
-    
     # Footer
     st.markdown("---")
     st.markdown("""
@@ -557,6 +1114,14 @@ def main():
         <p>🤖 Desenvolvido com Memex AI | 🌱 Inteligência Artificial para o Agronegócio</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    if perfil_ativo:
+        show_profile(perfil, selected_menu)
+    
+    duracao = time.perf_counter() - _INICIO_EXECUCAO
+    if duracao > ORCAMENTO_EXECUCAO_S:
+        logger.warning("Página %s levou %.2f s (orçamento %.2f s)",
+                       selected_menu, duracao, ORCAMENTO_EXECUCAO_S)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from agrovisao.alerts import ATENCAO, CRITICO, NORMAL, AlertEngine
+from agrovisao.data import generate_bulk_data
+
+
+def _rows(fazendas, code, ndvi, data):
+    return pd.DataFrame({
+        "fazenda": pd.Categorical.from_codes([code], categories=fazendas.nome),
+        "data": pd.to_datetime([data]),
+        "ndvi": np.array([ndvi], dtype=np.float32),
+        "temperatura": np.full(1, np.nan, dtype=np.float32),
+        "umidade": np.full(1, np.nan, dtype=np.float32),
+        "precipitacao": np.full(1, np.nan, dtype=np.float32)
+    })
+
+
+def test_hysteresis_holds_level_near_threshold():
+    fazendas, _ = generate_bulk_data(3, 1, seed=0)
+    engine = AlertEngine(fazendas, regras={"janela_dias": 1})
+    niveis = []
+    for dia, ndvi in enumerate([0.25, 0.31, 0.34, 0.52, 0.54, 0.49]):
+        engine.ingest(_rows(fazendas, 1, ndvi, pd.Timestamp("2024-01-01") + pd.Timedelta(days=dia)))
+        niveis.append(int(engine.nivel[1]))
+
+    # 0.31 e 0.52 ficam dentro da histerese (0.03) do nível anterior
+    assert niveis == [CRITICO, CRITICO, ATENCAO, ATENCAO, NORMAL, ATENCAO]
+    assert engine.nivel[0] == NORMAL and engine.nivel[2] == NORMAL
+
+
+def test_ingest_returns_changed_farms_and_ignores_old_rows():
+    fazendas, _ = generate_bulk_data(3, 1, seed=0)
+    engine = AlertEngine(fazendas, regras={"janela_dias": 1})
+
+    assert list(engine.ingest(_rows(fazendas, 2, 0.2, "2024-01-02"))) == [2]
+    assert list(engine.ingest(_rows(fazendas, 2, 0.9, "2024-01-01"))) == []
+    assert engine.nivel[2] == CRITICO
+    assert list(engine.ingest(_rows(fazendas, 2, 0.9, "2024-01-03"))) == [2]
+
+
+def test_incremental_ingest_matches_single_batch():
+    fazendas, ndvi_df = generate_bulk_data(200, 40, seed=0)
+    ndvi_df = ndvi_df.sample(frac=0.8, random_state=0)
+    regras = {"histerese": 0.0}  # sem histerese o estado não depende do tamanho dos lotes
+
+    inteiro = AlertEngine(fazendas, regras=regras)
+    inteiro.ingest(ndvi_df)
+    incremental = AlertEngine(fazendas, regras=regras)
+    for _, lote in ndvi_df.groupby(ndvi_df["data"].dt.to_period("W"), sort=True):
+        incremental.ingest(lote.sample(frac=1.0, random_state=1))
+
+    for s in inteiro.buffers:
+        assert np.array_equal(inteiro.buffers[s], incremental.buffers[s], equal_nan=True)
+    assert np.array_equal(inteiro.ultima_data, incremental.ultima_data)
+    assert np.array_equal(inteiro.nivel, incremental.nivel)
+    assert np.array_equal(inteiro.motivos, incremental.motivos)
+    assert np.allclose(inteiro.ndvi, incremental.ndvi, equal_nan=True)
+    assert inteiro.counts() == incremental.counts()
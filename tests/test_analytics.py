@@ -0,0 +1,72 @@
+import numpy as np
+
+from agrovisao.analytics import analyze_series, rolling_mean, savgol, series_matrix
+from agrovisao.data import generate_bulk_data
+from agrovisao.rollups import PRODUTIVIDADE_T_HA
+
+
+def test_empty_frame():
+    fazendas, ndvi_df = generate_bulk_data(5, 10, seed=0)
+    vazio = ndvi_df.iloc[:0]
+
+    resultado = analyze_series(vazio, fazendas)
+
+    assert len(resultado["fazendas"]) == 5
+    assert len(resultado["ndvi_suave"]) == 0
+    assert len(resultado["anomalia"]) == 0
+    assert resultado["anomalias"] == 0
+    assert resultado["fazendas_anomalas"] == 0
+    assert resultado["fazendas"]["ndvi_atual"].isna().all()
+    assert resultado["fazendas"]["ultima_anomalia"].isna().all()
+    assert np.isclose(resultado["producao_estimada"], float(fazendas.area.astype(np.float64).sum()) * PRODUTIVIDADE_T_HA)
+
+
+def test_rows_align_with_frame():
+    fazendas, ndvi_df = generate_bulk_data(20, 60, seed=0)
+    ndvi_df = ndvi_df.sample(frac=0.8, random_state=0)
+
+    resultado = analyze_series(ndvi_df, fazendas)
+
+    assert len(resultado["ndvi_suave"]) == len(ndvi_df)
+    assert np.isfinite(resultado["ndvi_suave"]).all()
+    assert resultado["fazendas"]["produtividade_t_ha"].notna().all()
+
+
+def test_savgol_matches_polynomial_fit():
+    y = np.random.default_rng(0).normal(size=(3, 20)).astype(np.float32)
+
+    suave = savgol(y, janela=7, ordem=2)
+
+    esperado = np.empty_like(y)
+    for i in range(20):
+        inicio = min(max(i - 3, 0), 13)
+        x = np.arange(inicio, inicio + 7)
+        for linha in range(3):
+            esperado[linha, i] = np.polyval(np.polyfit(x, y[linha, inicio:inicio + 7], 2), i)
+    assert np.allclose(suave, esperado, atol=1e-5)
+
+
+def test_rolling_mean_matches_window_average():
+    y = np.random.default_rng(0).normal(size=(3, 20)).astype(np.float32)
+    y[0, 4] = y[1, :6] = np.nan
+
+    suave = rolling_mean(y, janela=5)
+
+    esperado = np.full_like(y, np.nan)
+    for i in range(20):
+        for linha in range(3):
+            janela = y[linha, max(i - 2, 0):i + 3]
+            if (~np.isnan(janela)).any():
+                esperado[linha, i] = np.nanmean(janela)
+    assert np.allclose(suave, esperado, atol=1e-5, equal_nan=True)
+
+
+def test_media_method_smooths_with_rolling_mean():
+    fazendas, ndvi_df = generate_bulk_data(10, 40, seed=0)
+    ndvi_df = ndvi_df.sample(frac=0.9, random_state=0)
+
+    resultado = analyze_series(ndvi_df, fazendas, janela=7, metodo="media")
+
+    matriz, _, codigos, dias = series_matrix(ndvi_df, fazendas)
+    assert np.allclose(resultado["ndvi_suave"], rolling_mean(matriz, 7)[codigos, dias], atol=1e-6)
+    assert not np.allclose(resultado["ndvi_suave"], analyze_series(ndvi_df, fazendas, janela=7)["ndvi_suave"])
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from agrovisao.cache import DiskCache
+
+
+def _entries(cache):
+    return sorted(e.name for e in os.scandir(cache.root) if not e.name.startswith("."))
+
+
+def test_round_trip_by_format(tmp_path):
+    cache = DiskCache(tmp_path, versao="t")
+    array = np.arange(10.0)
+    paineis = {"rgb": np.zeros((2, 2, 3), dtype=np.uint8), "ndvi": np.ones(4, dtype=np.float32)}
+
+    cache.put("a", array)
+    cache.put("b", paineis)
+    cache.put("c", {"total": 3})
+
+    lido = cache.get("a")
+    assert isinstance(lido, np.memmap) and not lido.flags.writeable
+    assert np.array_equal(lido, array)
+    assert {k: v.tolist() for k, v in cache.get("b").items()} == {k: v.tolist() for k, v in paineis.items()}
+    assert cache.get("c") == {"total": 3}
+    assert cache.get("d", "ausente") == "ausente"
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert cache.nbytes == cache._scan_total()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, versao="t", max_bytes=10 ** 9)
+    for i, key in enumerate("abc"):
+        cache.put(key, np.full(1000, i, dtype=np.float64))
+        os.utime(cache._path(key, ".npy"), (100 + i, 100 + i))
+    tamanho = cache.nbytes // 3
+
+    cache.max_bytes = int(3.5 * tamanho)
+    cache.get("a")  # acerto renova a entrada mais antiga
+    cache.put("d", np.full(1000, 3, dtype=np.float64))
+
+    assert cache.get("b") is None
+    assert all(cache.get(k) is not None for k in "acd")
+    assert cache.nbytes == cache._scan_total() <= cache.max_bytes
+
+
+def test_replacing_entry_keeps_total(tmp_path):
+    cache = DiskCache(tmp_path, versao="t")
+    cache.put("a", np.zeros(100))
+    cache.put("a", np.zeros(500))
+    cache.put("b", {"x": np.zeros(10)})
+    cache.put("b", {"x": np.ones(10)})  # pasta já existe: fica a primeira gravação
+
+    assert np.array_equal(cache.get("a"), np.zeros(500))
+    assert np.array_equal(cache.get("b")["x"], np.zeros(10))
+    assert cache.nbytes == cache._scan_total()
+    assert DiskCache(tmp_path, versao="t").nbytes == cache.nbytes
+
+
+def test_corrupted_entry_is_discarded(tmp_path):
+    cache = DiskCache(tmp_path, versao="t")
+    with open(cache._path("a", ".pkl"), "wb") as fh:
+        fh.write(b"\x80\x05pela metade")
+
+    assert cache.get("a") is None
+    assert _entries(cache) == []
+
+
+def test_put_is_atomic_for_concurrent_readers(tmp_path):
+    cache = DiskCache(tmp_path, versao="t")
+    valores = [np.full(200_000, i, dtype=np.float64) for i in range(2)]
+    parar = threading.Event()
+    erros = []
+
+    def gravar():
+        i = 0
+        while not parar.is_set():
+            DiskCache(tmp_path, versao="t").put("grande", valores[i % 2])
+            i += 1
+
+    def ler():
+        while not parar.is_set():
+            lido = cache.get("grande")
+            if lido is not None and not (len(lido) == 200_000 and lido[0] == lido[-1]):
+                erros.append(lido[:1])
+
+    threads = [threading.Thread(target=gravar) for _ in range(2)] + [threading.Thread(target=ler)]
+    for t in threads:
+        t.start()
+    time.sleep(1.0)
+    parar.set()
+    for t in threads:
+        t.join()
+
+    assert erros == []
+    assert _entries(cache) == [os.path.basename(cache._path("grande", ".npy"))]
@@ -0,0 +1,142 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agrovisao.alerts import AlertEngine
+from agrovisao.data import FAZENDAS_DEMO, FarmTable, generate_ndvi_timeseries
+from agrovisao.change import flight_history
+from agrovisao.ingest import Flight, IngestPipeline, apply_to_views, summarize_flight
+from agrovisao.rollups import KpiRollup
+from agrovisao.store import TimeSeriesStore
+
+
+def _store(tmp_path):
+    fazendas = FarmTable.from_records(FAZENDAS_DEMO)
+    dates = pd.date_range("2024-01-01", "2024-01-15", freq="D")
+    return TimeSeriesStore.create(tmp_path / "store", fazendas,
+                                  generate_ndvi_timeseries(fazendas, dates, seed=0))
+
+
+def _rows(store, nome, ndvi, data="2024-01-16"):
+    fazendas = store.farms()
+    code = fazendas.index_of(nome)
+    return pd.DataFrame({
+        "fazenda": pd.Categorical.from_codes([code], categories=fazendas.nome),
+        "data": pd.to_datetime([data]),
+        "ndvi": np.array([ndvi], dtype=np.float32),
+        "area": fazendas.area[[code]],
+        "cultura": fazendas.cultura[[code]],
+        "temperatura": np.full(1, np.nan, dtype=np.float32),
+        "umidade": np.full(1, np.nan, dtype=np.float32),
+        "precipitacao": np.full(1, np.nan, dtype=np.float32)
+    })
+
+
+def test_nan_flight_does_not_change_views(tmp_path):
+    store = _store(tmp_path)
+    rollup = KpiRollup.from_farms(store.farms())
+    engine = AlertEngine(store.farms())
+    antes = store.farms()[store.farms().index_of("Agro Futuro")]
+    resumo = rollup.summary()
+
+    apply_to_views(store, engine=engine, rollup=rollup)(_rows(store, "Agro Futuro", np.nan))
+
+    depois = store.farms()[store.farms().index_of("Agro Futuro")]
+    assert depois == antes
+    assert depois["status"] != "Excelente"
+    assert rollup.summary() == resumo
+    assert np.isnat(engine.ultima_data).all()
+
+
+def test_valid_flight_updates_views(tmp_path):
+    store = _store(tmp_path)
+    rollup = KpiRollup.from_farms(store.farms())
+
+    apply_to_views(store, rollup=rollup)(_rows(store, "Agro Futuro", 0.8))
+
+    fazenda = store.farms()[store.farms().index_of("Agro Futuro")]
+    assert fazenda["status"] == "Excelente"
+    assert fazenda["ultima_analise"] == "2024-01-16"
+    assert rollup.summary()["status_counts"]["Excelente"] >= 1
+
+
+def _flight(folder, farm_id, data, red, nir):
+    for banda, valores in (("red", red), ("nir", nir)):
+        np.save(folder / f"{farm_id}_{data}_{banda}.npy", np.full((8, 8), valores, dtype=np.float32))
+
+
+def test_pipeline_rejects_unknown_farms_and_empty_flights(tmp_path):
+    store = _store(tmp_path)
+    entrada = tmp_path / "entrada"
+    entrada.mkdir()
+    _flight(entrada, "fazenda_001", "2024-01-16", 0.1, 0.5)
+    _flight(entrada, "fazenda_999", "2024-01-16", 0.1, 0.5)
+    _flight(entrada, "fazenda_002", "2024-01-16", np.nan, np.nan)
+
+    pipeline = IngestPipeline(entrada, store)
+    rows = pipeline.run_once()
+
+    assert list(rows["fazenda"]) == ["Fazenda São João"]
+    assert pipeline.processed == 1
+    assert sorted(pipeline.rejected) == [
+        ("fazenda_002", "2024-01-16", "sem pixel válido"),
+        ("fazenda_999", "2024-01-16", "fazenda desconhecida"),
+    ]
+    assert len(store.read(inicio="2024-01-16")) == 1
+    assert list(flight_history(pipeline.done_dir)) == ["fazenda_001"]
+    assert sorted(os.listdir(pipeline.rejected_dir)) == [
+        f"{farm_id}_2024-01-16_{banda}.npy"
+        for farm_id in ("fazenda_002", "fazenda_999") for banda in ("ndvi", "nir", "red")
+    ]
+
+
+def _wait(condicao, timeout=10.0):
+    fim = time.monotonic() + timeout
+    while not condicao():
+        assert time.monotonic() < fim, "tempo esgotado"
+        time.sleep(0.05)
+
+
+def test_failed_flight_is_retried_when_replaced(tmp_path):
+    store = _store(tmp_path)
+    entrada = tmp_path / "entrada"
+    entrada.mkdir()
+    (entrada / "fazenda_001_2024-01-16_red.npy").write_bytes(b"corrompido")
+    (entrada / "fazenda_001_2024-01-16_nir.npy").write_bytes(b"corrompido")
+
+    pipeline = IngestPipeline(entrada, store, poll_s=0.05, settle_s=0).start()
+    try:
+        _wait(lambda: pipeline.errors)
+        time.sleep(0.3)
+        assert len(pipeline.errors) == 1  # arquivos iguais: não é retentado
+
+        _flight(entrada, "fazenda_001", "2024-01-16", 0.1, 0.5)
+        _wait(lambda: pipeline.processed == 1)
+    finally:
+        pipeline.stop()
+    assert len(store.read(inicio="2024-01-16")) == 1
+
+
+def test_multispectral_flight_records_every_index(tmp_path):
+    rng = np.random.default_rng(0)
+    bands, paths = {}, {}
+    for banda in ("red", "green", "red_edge", "nir"):
+        bands[banda] = rng.integers(1, 4000, (40, 30), dtype=np.uint16)
+        paths[banda] = tmp_path / f"fazenda_001_2024-01-16_{banda}.npy"
+        np.save(paths[banda], bands[banda])
+
+    resumo = summarize_flight(Flight("fazenda_001", "2024-01-16", paths), out_dir=tmp_path, tile_size=16)
+
+    for index, banda in (("ndvi", "red"), ("ndre", "red_edge"), ("gndvi", "green")):
+        a, b = bands["nir"].astype(np.float64), bands[banda].astype(np.float64)
+        esperado = ((a - b) / (a + b)).astype(np.float32)
+        assert resumo[index] == pytest.approx(esperado.mean(dtype=np.float64), rel=1e-6)
+        raster = np.load(tmp_path / f"fazenda_001_2024-01-16_{index}.npy")
+        np.testing.assert_allclose(raster, esperado, rtol=1e-6)
+
+    so_ndvi = summarize_flight(Flight("fazenda_001", "2024-01-16", {b: paths[b] for b in ("red", "nir")}))
+    assert so_ndvi["ndvi"] == pytest.approx(resumo["ndvi"], rel=1e-6)
+    assert np.isnan(so_ndvi["ndre"]) and np.isnan(so_ndvi["gndvi"])
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from agrovisao.ndvi import INDICES, available_indices, compute_indices, compute_indices_files
+
+
+def _bands(shape=(50, 37), seed=0):
+    rng = np.random.default_rng(seed)
+    bands = {name: rng.integers(0, 4000, shape, dtype=np.uint16) for name in ("red", "green", "red_edge", "nir")}
+    bands["red"][0, :5] = 0
+    bands["nir"][0, :5] = 0  # soma zero: sem dado
+    return bands
+
+
+def _expected(bands, index):
+    a, b = (bands[name].astype(np.float64) for name in INDICES[index])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return ((a - b) / (a + b)).astype(np.float32)
+
+
+def test_available_indices():
+    assert available_indices({"red": "", "nir": ""}) == ["ndvi"]
+    assert available_indices(["red", "nir", "green"]) == ["ndvi", "gndvi"]
+    assert available_indices(["red", "nir", "green", "red_edge"]) == list(INDICES)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_compute_indices_threads(workers):
+    bands = _bands()
+    outputs = compute_indices(bands, tile_size=16, workers=workers)
+    assert set(outputs) == set(INDICES)
+    for index, out in outputs.items():
+        np.testing.assert_allclose(out, _expected(bands, index), rtol=1e-6, equal_nan=True)
+    assert np.isnan(outputs["ndvi"][0, :5]).all()
+
+
+def test_compute_indices_files_processes(tmp_path):
+    bands = _bands(seed=1)
+    paths = {}
+    for name, band in bands.items():
+        paths[name] = tmp_path / f"{name}.npy"
+        np.save(paths[name], band)
+
+    outputs = compute_indices_files(paths, tmp_path / "saida", tile_size=16, workers=2)
+    for index, out in outputs.items():
+        np.testing.assert_allclose(out, _expected(bands, index), rtol=1e-6, equal_nan=True)
+        assert (tmp_path / "saida" / f"{index}.npy").exists()
@@ -0,0 +1,88 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from agrovisao.pyramid import Pyramid, build_overviews, downsample2x, overview_count, overview_path
+
+
+def _reference_downsample(a):
+    """Média 2×2 ignorando NaN, bloco a bloco"""
+    out = np.full(((a.shape[0] + 1) // 2, (a.shape[1] + 1) // 2), np.nan, dtype=np.float32)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # blocos só com NaN
+        for i in range(out.shape[0]):
+            for j in range(out.shape[1]):
+                out[i, j] = np.nanmean(a[2 * i:2 * i + 2, 2 * j:2 * j + 2])
+    return out
+
+
+def _raster(shape=(270, 170), seed=0):
+    rng = np.random.default_rng(seed)
+    raster = rng.uniform(-0.2, 0.9, size=shape).astype(np.float32)
+    raster[rng.random(shape) < 0.1] = np.nan
+    raster[:6, :6] = np.nan  # bloco inteiro sem valor válido
+    return raster
+
+
+def test_downsample_matches_reference():
+    bloco = _raster((9, 7))
+
+    assert np.allclose(downsample2x(bloco), _reference_downsample(bloco), equal_nan=True)
+
+
+@pytest.mark.parametrize("tile_size", [64, 101, 4096])
+def test_levels_match_whole_array_downsampling(tile_size):
+    raster = _raster()
+
+    levels = build_overviews(raster, min_side=20, tile_size=tile_size)
+
+    assert len(levels) == overview_count(raster.shape, 20) + 1 == 4
+    esperado = raster
+    for nivel in levels[1:]:
+        esperado = _reference_downsample(esperado)
+        assert np.allclose(nivel, esperado, atol=1e-6, equal_nan=True)
+    assert min(levels[-1].shape) < 2 * 20
+
+
+def test_read_picks_level_and_window():
+    raster = _raster()
+    piramide = Pyramid(build_overviews(raster, min_side=20))
+
+    dados, nivel = piramide.read()
+    assert nivel == 0 and np.array_equal(dados, raster, equal_nan=True)
+
+    dados, nivel = piramide.read(max_side=40)
+    assert nivel == 3 and dados.shape == piramide.levels[3].shape
+
+    janela = (slice(51, 151), slice(17, 49))
+    dados, nivel = piramide.read(janela, max_side=60)
+    assert nivel == 1
+    assert np.array_equal(dados, piramide.levels[1][25:76, 8:25], equal_nan=True)
+
+    dados, nivel = piramide.read(janela, max_side=100)
+    assert nivel == 0 and np.array_equal(dados, raster[janela], equal_nan=True)
+
+
+def test_open_or_build_reuses_overviews(tmp_path):
+    path = str(tmp_path / "cena.npy")
+    raster = _raster()
+    np.save(path, raster)
+
+    piramide = Pyramid.open_or_build(path, min_side=20)
+    em_memoria = build_overviews(raster, min_side=20)
+    assert len(piramide.levels) == len(em_memoria)
+    for lido, esperado in zip(piramide.levels, em_memoria):
+        assert np.array_equal(lido, esperado, equal_nan=True)
+
+    gravado = [os.stat(overview_path(path, n)).st_mtime_ns for n in range(1, 4)]
+    Pyramid.open_or_build(path, min_side=20)
+    assert [os.stat(overview_path(path, n)).st_mtime_ns for n in range(1, 4)] == gravado
+
+    # Raster regravado depois dos overviews: a pirâmide é refeita
+    np.save(path, raster[::-1].copy())
+    futuro = gravado[-1] + 10 ** 9
+    os.utime(path, ns=(futuro, futuro))
+    piramide = Pyramid.open_or_build(path, min_side=20)
+    assert np.allclose(piramide.levels[1], _reference_downsample(raster[::-1]), equal_nan=True)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from agrovisao.cache import DiskCache
+from agrovisao.render import LUTS, RenderCache, apply_lut
+
+
+def test_disk_hits_count_as_hits(tmp_path):
+    disk = DiskCache(tmp_path / "cache")
+    imagem = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+    RenderCache(disk=disk).put("k", imagem)
+
+    cache = RenderCache(disk=disk)  # outra sessão: memória vazia, disco com a imagem
+    np.testing.assert_array_equal(cache.get("k"), imagem)
+    np.testing.assert_array_equal(cache.get("k"), imagem)
+    assert cache.get("outra") is None
+    assert (cache.hits, cache.disk_hits, cache.misses) == (2, 1, 1)
+
+
+def test_apply_lut_constant_range():
+    valores = np.array([[0.5, 0.5], [0.7, np.nan]], dtype=np.float32)
+    with np.errstate(all="raise"):
+        rgb = apply_lut(valores, "RdYlGn", 0.5, 0.5)
+    lut = LUTS["RdYlGn"]
+    np.testing.assert_array_equal(rgb[0, 0], lut[0])
+    np.testing.assert_array_equal(rgb[1, 0], lut[-1])
@@ -0,0 +1,43 @@
+import numpy as np
+
+from agrovisao.data import generate_bulk_data
+from agrovisao.rollups import KpiRollup
+
+
+def _assert_same_cube(a, b):
+    np.testing.assert_array_equal(a.count, b.count)
+    np.testing.assert_allclose(a.area_sum, b.area_sum)
+    np.testing.assert_allclose(a.ndvi_sum, b.ndvi_sum)
+
+
+def test_incremental_update_matches_rebuild():
+    fazendas, _ = generate_bulk_data(200, 2, seed=0)
+    rollup = KpiRollup.from_farms(fazendas)
+
+    rng = np.random.default_rng(1)
+    codes = rng.choice(len(fazendas), 30, replace=False)
+    ndvi = rng.uniform(0, 1, 30)
+    status = rng.integers(0, 4, 30)
+    rollup.update(codes, ndvi_medio=ndvi, status=status)
+
+    ndvi_medio = np.array(fazendas.ndvi_medio, dtype=np.float64)
+    status_codes = np.array(fazendas.status.codes)
+    ndvi_medio[codes], status_codes[codes] = ndvi, status
+    _assert_same_cube(rollup, KpiRollup(fazendas.area, ndvi_medio, fazendas.cultura.codes, status_codes))
+
+
+def test_duplicate_codes_keep_the_last_value():
+    fazendas, _ = generate_bulk_data(50, 2, seed=0)
+    rollup = KpiRollup.from_farms(fazendas)
+    sequencial = KpiRollup.from_farms(fazendas)
+
+    codes = [3, 7, 3, 3]
+    ndvi = [0.1, 0.2, 0.3, 0.9]
+    status = ["Crítica", "Regular", "Regular", "Excelente"]
+    rollup.update(codes, ndvi_medio=ndvi, status=status)
+    for c, n, s in zip(codes, ndvi, status):
+        sequencial.update([c], ndvi_medio=[n], status=[s])
+
+    _assert_same_cube(rollup, sequencial)
+    assert rollup.summary()["total_fazendas"] == 50
+    assert rollup.ndvi_medio[3] == 0.9
@@ -0,0 +1,34 @@
+import time
+
+from agrovisao.scheduler import Precomputer
+
+
+def _wait(condicao, timeout=2.0):
+    fim = time.monotonic() + timeout
+    while not condicao():
+        assert time.monotonic() < fim, "tempo esgotado"
+        time.sleep(0.01)
+
+
+def test_idle_jobs_are_dropped_by_the_refresher():
+    chamadas = []
+    pre = Precomputer(workers=1, ttl_s=0.01, ocioso_s=0.2)
+    try:
+        pre.request("a", lambda x: chamadas.append(x) or x, [1, 2, 3], wait_s=1.0)
+        assert pre.get("a").valor == [1, 2, 3]
+
+        time.sleep(0.05)
+        pre.refresh_stale()  # vencido e pedido há pouco: renova
+        _wait(lambda: len(chamadas) == 2 and not pre.get("a").calculando)
+
+        time.sleep(0.25)
+        pre.refresh_stale()  # sem pedido há mais de ocioso_s: descarta o job
+        assert "a" not in pre._jobs
+        assert len(chamadas) == 2
+        assert pre.get("a").valor == [1, 2, 3]  # o último resultado continua servido
+
+        pre.request("a", lambda x: chamadas.append(x) or x, [4], wait_s=1.0)
+        assert pre.get("a").valor == [4]
+        assert pre.served_ready + pre.served_pending == 2
+    finally:
+        pre.shutdown()
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from agrovisao.spatial import GridIndex, haversine_km
+
+
+def _points(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-33.0, -3.0, n)
+    lon = rng.uniform(-62.0, -38.0, n)
+    # Aglomerados densos e células vazias, como nas regiões produtoras
+    lat[:n // 3] = rng.normal(-12.5, 0.2, n // 3)
+    lon[:n // 3] = rng.normal(-55.5, 0.2, n // 3)
+    return lat, lon
+
+
+def _queries(seed=1, n=60):
+    rng = np.random.default_rng(seed)
+    # Inclui pontos fora da grade (oceano, norte do país)
+    return zip(rng.uniform(-40.0, 5.0, n), rng.uniform(-70.0, -30.0, n))
+
+
+@pytest.mark.parametrize("cell_size", [0.05, 0.5, 3.0])
+def test_bbox_matches_brute_force(cell_size):
+    lat, lon = _points()
+    index = GridIndex(lat, lon, cell_size=cell_size)
+    rng = np.random.default_rng(2)
+
+    for _ in range(50):
+        lat_min, lat_max = np.sort(rng.uniform(-40.0, 5.0, 2))
+        lon_min, lon_max = np.sort(rng.uniform(-70.0, -30.0, 2))
+        esperado = np.flatnonzero((lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max))
+        assert np.array_equal(index.bbox(lat_min, lat_max, lon_min, lon_max), esperado)
+
+
+@pytest.mark.parametrize("cell_size", [0.05, 0.5, 3.0])
+@pytest.mark.parametrize("k", [1, 7])
+def test_nearest_matches_brute_force(cell_size, k):
+    lat, lon = _points()
+    index = GridIndex(lat, lon, cell_size=cell_size)
+
+    for q_lat, q_lon in _queries():
+        idx, dist = index.nearest(q_lat, q_lon, k=k)
+        todas = haversine_km(q_lat, q_lon, lat, lon)
+        assert np.allclose(dist, np.sort(todas)[:k])
+        assert np.allclose(todas[idx], dist)
+
+
+def test_radius_matches_brute_force():
+    lat, lon = _points()
+    index = GridIndex(lat, lon, cell_size=0.5)
+
+    for q_lat, q_lon in _queries():
+        idx, dist = index.radius(q_lat, q_lon, 150.0)
+        todas = haversine_km(q_lat, q_lon, lat, lon)
+        assert set(idx.tolist()) == set(np.flatnonzero(todas <= 150.0).tolist())
+        assert np.all(np.diff(dist) >= 0)
+
+
+def test_nearest_on_small_index():
+    index = GridIndex([-10.0, -10.5], [-50.0, -50.5])
+
+    idx, dist = index.nearest(-10.1, -50.1, k=5)
+
+    assert list(idx) == [0, 1]
+    assert len(GridIndex([], []).nearest(-10.0, -50.0)[0]) == 0
@@ -0,0 +1,78 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from agrovisao.zones import analyze_scene, connect_runs, extract_runs
+
+
+def _bfs_components(mask):
+    """Referência: rótulos (vizinhança 4) por busca em largura, pixel a pixel"""
+    h, w = mask.shape
+    labels = np.zeros((h, w), dtype=np.int64)
+    atual = 0
+    for i in range(h):
+        for j in range(w):
+            if not mask[i, j] or labels[i, j]:
+                continue
+            atual += 1
+            labels[i, j] = atual
+            fila = deque([(i, j)])
+            while fila:
+                a, b = fila.popleft()
+                for da, db in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                    x, y = a + da, b + db
+                    if 0 <= x < h and 0 <= y < w and mask[x, y] and not labels[x, y]:
+                        labels[x, y] = atual
+                        fila.append((x, y))
+    return labels
+
+
+def _partition(labels):
+    """Conjuntos de pixels de cada rótulo, independente da numeração"""
+    planos = labels.ravel()
+    ordem = np.argsort(planos, kind="stable")
+    grupos = np.split(ordem, np.flatnonzero(np.diff(planos[ordem])) + 1)
+    return {frozenset(g.tolist()) for g in grupos if planos[g[0]] != 0}
+
+
+@pytest.mark.parametrize("densidade", [0.3, 0.55, 0.7])
+def test_runs_match_bfs(densidade):
+    mask = np.random.default_rng(0).random((60, 70)) < densidade
+
+    rows, c0, c1 = extract_runs(mask)
+    roots = connect_runs(rows, c0, c1, mask.shape[1])
+
+    labels = np.zeros(mask.shape, dtype=np.int64)
+    for r, a, b, raiz in zip(rows, c0, c1, roots):
+        labels[r, a:b] = raiz + 1
+    assert _partition(labels) == _partition(_bfs_components(mask))
+
+
+@pytest.mark.parametrize("strip_rows", [1, 7, 512])
+def test_scene_foci_match_bfs(strip_rows):
+    rng = np.random.default_rng(1)
+    ndvi = rng.uniform(0.0, 0.9, size=(45, 50)).astype(np.float32)
+    ndvi[rng.random(ndvi.shape) < 0.05] = np.nan
+    mask = ndvi < 0.4
+    labels_out = np.zeros(ndvi.shape, dtype=np.int32)
+
+    focos = analyze_scene(ndvi, limiar=0.4, min_pixels=3, strip_rows=strip_rows, labels_out=labels_out)
+
+    referencia = _bfs_components(mask)
+    tamanhos = np.bincount(referencia.ravel())[1:]
+    grandes = np.flatnonzero(tamanhos >= 3) + 1
+    esperado = np.where(np.isin(referencia, grandes), referencia, 0)
+    assert _partition(labels_out) == _partition(esperado)
+
+    focos = focos["focos"]
+    assert sorted(focos["pixels"]) == sorted(tamanhos[tamanhos >= 3])
+    assert focos["pixels"].is_monotonic_decreasing
+    for foco in focos.itertuples():
+        linhas, colunas = np.nonzero(labels_out == foco.foco)
+        assert foco.pixels == len(linhas)
+        assert (foco.linha_min, foco.linha_max) == (linhas.min(), linhas.max())
+        assert (foco.coluna_min, foco.coluna_max) == (colunas.min(), colunas.max())
+        assert np.isclose(foco.ndvi_medio, ndvi[linhas, colunas].mean())
+        assert np.isclose(foco.centro_linha, linhas.mean())
+        assert np.isclose(foco.centro_coluna, colunas.mean())